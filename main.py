@@ -1,23 +1,307 @@
+import os
 import asyncio
+import argparse
+from pathlib import Path
+from playwright.async_api import async_playwright
 from utils.utilities.loader import emulator
-from spiders.product import ProductProcessorApp
+from spiders.product import ProductProcessorApp, DATA_DIR, DEFAULT_RECRAWL_HOURS
+from utils.browser.browser_pool import BrowserPool
+from utils.config.site import START_URL
+from spiders.pipeline import run_streaming_pipeline
 from spiders.base_url_spider import scrape_thomann_base_urls
+from spiders.category_tree import discover_category_tree, MAX_CATEGORY_DEPTH
+from spiders.sitemaps import collect_sitemap_endpoints
 from spiders.product_endpoints import collect_product_endpoints
+from utils.parsers.engines import PARSER_ENGINES, DEFAULT_ENGINE
+from utils.parsers.parse_pool import DEFAULT_PARSE_WORKERS
+from middlewares.metrics.metrics import metrics
+from middlewares.rate_limit.rate_limiter import rate_limiter
 from middlewares.DB_connector.connect import handle_db_connection
+from middlewares.work_queue.work_queue import (
+    build_work_queue,
+    DEFAULT_QUEUE_HOST,
+    DEFAULT_QUEUE_PORT,
+    QUEUE_TOKEN_ENV,
+)
 
 
-async def main():
-    prod_data = ProductProcessorApp()
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Thomann scraper")
+    parser.add_argument(
+        "command",
+        nargs="?",
+        choices=["crawl", "reparse"],
+        default="crawl",
+        help="'reparse' rebuilds the products file from the HTML archive, offline",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="feed product workers while category listings are still being crawled",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="number of product crawler processes, each with its own browser",
+    )
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=12,
+        help="upper bound for the adaptive number of product pages in flight per process",
+    )
+    parser.add_argument(
+        "--sitemaps",
+        action="store_true",
+        help="take product URLs from the sitemaps instead of crawling category listings",
+    )
+    parser.add_argument(
+        "--discover-categories",
+        action="store_true",
+        help="walk the category tree from the home page and crawl its leaf categories",
+    )
+    parser.add_argument(
+        "--category-depth",
+        type=int,
+        default=MAX_CATEGORY_DEPTH,
+        help="how many levels below the home page --discover-categories follows",
+    )
+    parser.add_argument(
+        "--category-concurrency",
+        type=int,
+        default=3,
+        help="number of category listings crawled at once, each in its own browser context",
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=2.0,
+        help="requests per second allowed per host (navigations, clicks and HTTP fetches)",
+    )
+    parser.add_argument(
+        "--burst",
+        type=int,
+        default=5,
+        help="requests per host that may go out back to back before --rate applies",
+    )
+    parser.add_argument(
+        "--ignore-robots",
+        action="store_true",
+        help="do not lower the rate to the robots.txt Crawl-delay",
+    )
+    parser.add_argument(
+        "--browser-only",
+        action="store_true",
+        help="always load product pages in Chromium instead of trying plain HTTP first",
+    )
+    parser.add_argument(
+        "--parser",
+        choices=sorted(PARSER_ENGINES),
+        default=DEFAULT_ENGINE,
+        help="HTML parser for product pages; 'soup' is the BeautifulSoup reference",
+    )
+    parser.add_argument(
+        "--structured-data",
+        action="store_true",
+        help="store the JSON-LD/microdata product record (name, sku, price, "
+        "currency, availability, rating) instead of the full page record",
+    )
+    parser.add_argument(
+        "--parse-workers",
+        type=int,
+        default=DEFAULT_PARSE_WORKERS,
+        help="processes that parse HTML off the event loop (0 parses in the loop)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="do not revalidate pages against the on-disk HTTP cache",
+    )
+    parser.add_argument(
+        "--no-archive",
+        action="store_true",
+        help="do not keep the raw HTML of fetched pages for later reparsing",
+    )
+    parser.add_argument(
+        "--no-block-resources",
+        action="store_true",
+        help="let the browser download images, fonts, media and tracker scripts",
+    )
+    parser.add_argument(
+        "--data-dir",
+        type=Path,
+        default=DATA_DIR,
+        help="directory of the frontier, HTTP cache, HTML archive and products file",
+    )
+    parser.add_argument(
+        "--recrawl-after",
+        type=float,
+        default=DEFAULT_RECRAWL_HOURS,
+        metavar="HOURS",
+        help="crawl categories and products finished more than HOURS ago again; "
+        "--sitemaps runs follow the sitemap lastmod instead",
+    )
+    parser.add_argument(
+        "--fresh",
+        action="store_true",
+        help="crawl every category and product again, however recently finished",
+    )
+    parser.add_argument(
+        "--queue",
+        metavar="SPEC",
+        help="worker mode: process product endpoints leased from 'sqlite' "
+        "(local frontier) or 'tcp://host:port' (a --serve-queue coordinator)",
+    )
+    parser.add_argument(
+        "--serve-queue",
+        metavar="[HOST:]PORT",
+        help="coordinator mode: collect endpoints, then serve them to worker nodes "
+        f"(listens on {DEFAULT_QUEUE_HOST} unless HOST is given)",
+    )
+    parser.add_argument(
+        "--queue-token",
+        default=os.getenv(QUEUE_TOKEN_ENV),
+        help="shared secret of the coordinator and its workers; required to serve "
+        f"the queue beyond localhost (default: ${QUEUE_TOKEN_ENV})",
+    )
+    return parser.parse_args(argv)
+
+
+def recrawl_hours(args):
+    if args.fresh:
+        return 0
+    # Sitemap runs requeue exactly the pages whose lastmod moved forward
+    if args.sitemaps:
+        return None
+    return args.recrawl_after
+
+
+def parse_address(address):
+    host, _, port = address.rpartition(":")
+    return (
+        host if host else DEFAULT_QUEUE_HOST,
+        int(port) if port else DEFAULT_QUEUE_PORT,
+    )
+
+
+def reparse(args):
+    prod_data = ProductProcessorApp(
+        data_dir=args.data_dir,
+        http_first=False,
+        http_cache=False,
+        archive=True,
+        parser_engine=args.parser,
+        structured_data=args.structured_data,
+    )
+    try:
+        if prod_data.reparse_archive():
+            print("All done!")
+    finally:
+        metrics.report()
+
+
+async def main(args):
+    rate_limiter.configure(rate=args.rate, burst=args.burst)
+    if not args.ignore_robots:
+        await rate_limiter.load_robots(START_URL)
+
+    # One browser pool serves every stage of the run
+    async with async_playwright() as p:
+        browser_pool = BrowserPool(p, block_resources=not args.no_block_resources)
+        prod_data = ProductProcessorApp(
+            data_dir=args.data_dir,
+            http_first=not args.browser_only,
+            browser_pool=browser_pool,
+            http_cache=not args.no_cache,
+            archive=not args.no_archive,
+            max_concurrency=args.max_concurrency,
+            parser_engine=args.parser,
+            parse_workers=args.parse_workers,
+            structured_data=args.structured_data,
+            recrawl_after=recrawl_hours(args),
+            block_resources=not args.no_block_resources,
+        )
+        try:
+            await run(args, prod_data, browser_pool)
+        finally:
+            await browser_pool.close()
+            prod_data.parse_pool.close()
+            metrics.report()
+            metrics.dump(args.data_dir / "metrics.json")
+
+
+async def process_endpoints(args, prod_data, prod_urls):
+    if prod_urls and args.serve_queue:
+        host, port = parse_address(args.serve_queue)
+        if await prod_data.serve_work_queue(host, port, token=args.queue_token):
+            print("All done!")
+    elif prod_urls:
+        is_data_ready = await prod_data.get_prod_data(
+            can_process=True, workers=args.workers
+        )
+        if is_data_ready:
+            print("All done!")
+
+
+async def run(args, prod_data, browser_pool):
     try:
         await handle_db_connection(connect=False)
 
-        base_urls = await scrape_thomann_base_urls(can_run=True)
+        if args.queue:
+            work_queue = build_work_queue(
+                args.queue, prod_data.frontier, token=args.queue_token
+            )
+            if args.queue == "sqlite":
+                await prod_data.seed_work_queue(work_queue)
+            if await prod_data.process_work_queue(work_queue):
+                print("All done!")
+            return
+
+        if args.sitemaps:
+            if args.stream:
+                print("--stream is ignored with --sitemaps.")
+            prod_urls = await collect_sitemap_endpoints(
+                can_run=True, frontier=prod_data.frontier
+            )
+            await process_endpoints(args, prod_data, prod_urls)
+            return
+
+        if args.discover_categories:
+            base_urls = await discover_category_tree(
+                can_run=True,
+                browser_pool=browser_pool,
+                http_fetcher=prod_data.http_fetcher,
+                max_depth=args.category_depth,
+            )
+        else:
+            base_urls = await scrape_thomann_base_urls(
+                can_run=True, browser_pool=browser_pool
+            )
         if base_urls:
-            prod_urls = await collect_product_endpoints(can_run=True)
-            if prod_urls:
-                is_data_ready = await prod_data.get_prod_data(can_process=True)
+            if args.stream:
+                if args.workers > 1:
+                    print("--workers is ignored in streaming mode.")
+                is_data_ready = await run_streaming_pipeline(
+                    prod_data,
+                    can_run=True,
+                    category_concurrency=args.category_concurrency,
+                )
                 if is_data_ready:
                     print("All done!")
+                return
+
+            prod_urls = await collect_product_endpoints(
+                can_run=True,
+                frontier=prod_data.frontier,
+                browser_pool=browser_pool,
+                http_fetcher=prod_data.http_fetcher,
+                category_concurrency=args.category_concurrency,
+                parse_pool=prod_data.parse_pool,
+                recrawl_after=prod_data.recrawl_after,
+                dead_letters=prod_data.dead_letters,
+            )
+            await process_endpoints(args, prod_data, prod_urls)
 
     except Exception as e:
         print(f"An error occurred during execution: {e}")
@@ -25,4 +309,8 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    args = parse_args()
+    if args.command == "reparse":
+        reparse(args)
+    else:
+        asyncio.run(main(args))
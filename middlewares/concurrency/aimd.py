@@ -0,0 +1,131 @@
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from middlewares.metrics.metrics import metrics
+from middlewares.logger.logger import custom_logger, initialize_logging
+
+initialize_logging()
+
+MAX_DECISIONS = 50
+
+
+class AimdController:
+    # Adaptive limit on in-flight pages (additive increase, multiplicative
+    # decrease). Every `window` completed pages the limit grows by
+    # `increase` while p95 latency and the error rate stay under target;
+    # timeouts, 403/429 responses and bot challenges cut it by `decrease`
+    # right away, at most once per `cooldown` seconds.
+    def __init__(
+        self,
+        name,
+        initial=3,
+        min_limit=1,
+        max_limit=12,
+        increase=1,
+        decrease=0.5,
+        target_p95=20.0,
+        max_error_rate=0.2,
+        window=10,
+        cooldown=10.0,
+        clock=time.monotonic,
+    ):
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max(min_limit, max_limit)
+        self.increase = increase
+        self.decrease = decrease
+        self.target_p95 = target_p95
+        self.max_error_rate = max_error_rate
+        self.window = window
+        self.cooldown = cooldown
+        self.clock = clock
+
+        self.limit = self.clamp(initial)
+        self.in_flight = 0
+        self.samples = []
+        self.decisions = []
+        self.last_decrease = None
+        self.changed = asyncio.Event()
+        self.publish()
+
+    def clamp(self, limit):
+        return max(self.min_limit, min(self.max_limit, int(limit)))
+
+    def start(self, initial):
+        self.limit = self.clamp(initial)
+        self.samples.clear()
+        self.publish()
+
+    def publish(self):
+        metrics.set_gauge(f"aimd.{self.name}.limit", self.limit)
+        metrics.set_gauge(f"aimd.{self.name}.in_flight", self.in_flight)
+
+    async def acquire(self):
+        # No await between the check and the increment, so a woken waiter
+        # cannot lose its slot to another one
+        while self.in_flight >= self.limit:
+            self.changed.clear()
+            await self.changed.wait()
+        self.in_flight += 1
+        self.publish()
+
+    def release(self):
+        self.in_flight -= 1
+        self.changed.set()
+        self.publish()
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def record(self, latency, ok=True):
+        metrics.observe(f"aimd.{self.name}.latency", latency)
+        self.samples.append((latency, ok))
+        if len(self.samples) >= self.window:
+            self.evaluate()
+
+    def record_throttle(self, reason):
+        metrics.incr(f"aimd.{self.name}.throttled")
+        now = self.clock()
+        if self.last_decrease is not None and now - self.last_decrease < self.cooldown:
+            # Pages started under the old limit are still reporting back
+            return
+        self.decide(self.limit * self.decrease, reason)
+
+    def evaluate(self):
+        latencies = sorted(latency for latency, _ in self.samples)
+        p95 = latencies[min(len(latencies) - 1, int(round(0.95 * (len(latencies) - 1))))]
+        error_rate = sum(1 for _, ok in self.samples if not ok) / len(self.samples)
+        self.samples.clear()
+
+        if error_rate > self.max_error_rate:
+            self.decide(self.limit * self.decrease, f"error rate {error_rate:.0%}")
+        elif p95 > self.target_p95:
+            self.decide(self.limit * self.decrease, f"p95 {p95:.1f}s")
+        elif self.limit < self.max_limit:
+            self.decide(self.limit + self.increase, f"p95 {p95:.1f}s")
+
+    def decide(self, limit, reason):
+        old_limit, self.limit = self.limit, self.clamp(limit)
+        if self.limit == old_limit:
+            return
+
+        direction = "increase" if self.limit > old_limit else "decrease"
+        if direction == "decrease":
+            self.last_decrease = self.clock()
+            self.samples.clear()
+        else:
+            self.changed.set()
+
+        metrics.incr(f"aimd.{self.name}.{direction}")
+        self.decisions.append((direction, old_limit, self.limit, reason))
+        del self.decisions[:-MAX_DECISIONS]
+        self.publish()
+        custom_logger(
+            f"[{self.name}] concurrency {old_limit} -> {self.limit} ({reason})",
+            log_type="info" if direction == "increase" else "warn",
+        )
@@ -1,3 +1,4 @@
+from functools import wraps
 from middlewares.logger.logger import initialize_logging, custom_logger
 
 # Initialize logging once
@@ -5,6 +6,9 @@ initialize_logging()
 
 
 def handle_exceptions(func):
+    # wraps keeps the name, so decorated functions can be pickled by
+    # reference and run in worker processes
+    @wraps(func)
     def wrapper(*args, **kwargs):
         try:
             return func(*args, **kwargs)
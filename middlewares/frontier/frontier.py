@@ -0,0 +1,245 @@
+import time
+import sqlite3
+from pathlib import Path
+from middlewares.logger.logger import custom_logger, initialize_logging
+
+initialize_logging()
+
+root_dir = Path(__file__).resolve().parent.parent.parent
+FRONTIER_PATH = root_dir / "data" / "frontier.db"
+
+PENDING = "pending"
+IN_FLIGHT = "in_flight"
+DONE = "done"
+FAILED = "failed"
+STATES = (PENDING, IN_FLIGHT, DONE, FAILED)
+
+
+class Frontier:
+    # Durable crawl state. Every URL is recorded as pending, in_flight, done
+    # or failed so an interrupted run can pick up where it stopped.
+    def __init__(self, db_path=FRONTIER_PATH):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS urls (
+                url TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                state TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                lease_owner TEXT,
+                lease_expires REAL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        # Frontiers created before leases existed lack the lease columns
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(urls)")}
+        for column, column_type in (("lease_owner", "TEXT"), ("lease_expires", "REAL")):
+            if column not in columns:
+                self.conn.execute(f"ALTER TABLE urls ADD COLUMN {column} {column_type}")
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_urls_kind_state ON urls (kind, state)"
+        )
+
+    def add(self, urls, kind="product"):
+        now = time.time()
+        before = self.conn.total_changes
+        self.conn.execute("BEGIN")
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO urls (url, kind, state, updated_at) VALUES (?, ?, ?, ?)",
+            [(url, kind, PENDING, now) for url in urls],
+        )
+        self.conn.execute("COMMIT")
+        return self.conn.total_changes - before
+
+    def admit(self, urls, kind="product"):
+        # Register urls and return the ones that still need processing
+        urls = list(urls)
+        self.add(urls, kind)
+        states = self.states(urls)
+        return [url for url in urls if states.get(url) == PENDING]
+
+    def states(self, urls):
+        urls = list(urls)
+        result = {}
+        for i in range(0, len(urls), 500):
+            chunk = urls[i : i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.conn.execute(
+                f"SELECT url, state FROM urls WHERE url IN ({placeholders})", chunk
+            )
+            result.update(dict(rows.fetchall()))
+        return result
+
+    def claim(self, limit, kind="product"):
+        return self.lease(limit, kind=kind)
+
+    def lease(self, limit, worker_id=None, lease_seconds=None, kind="product"):
+        # Hand out up to `limit` pending URLs. With lease_seconds set, a URL
+        # whose worker stops renewing the lease goes back to pending.
+        now = time.time()
+        lease_expires = now + lease_seconds if lease_seconds else None
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._reclaim_expired(kind, now)
+            rows = self.conn.execute(
+                "SELECT url FROM urls WHERE kind = ? AND state = ? ORDER BY rowid LIMIT ?",
+                (kind, PENDING, limit),
+            ).fetchall()
+            urls = [row[0] for row in rows]
+            self._set_in_flight(urls, worker_id, lease_expires)
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return urls
+
+    def extend_leases(self, urls, worker_id, lease_seconds):
+        now = time.time()
+        self.conn.execute("BEGIN")
+        self.conn.executemany(
+            "UPDATE urls SET lease_expires = ?, updated_at = ? "
+            "WHERE url = ? AND state = ? AND lease_owner = ?",
+            [(now + lease_seconds, now, url, IN_FLIGHT, worker_id) for url in urls],
+        )
+        self.conn.execute("COMMIT")
+
+    def reclaim_expired(self, kind="product"):
+        return self._reclaim_expired(kind, time.time())
+
+    def _reclaim_expired(self, kind, now):
+        cursor = self.conn.execute(
+            "UPDATE urls SET state = ?, lease_owner = NULL, lease_expires = NULL, "
+            "updated_at = ? WHERE kind = ? AND state = ? AND lease_expires < ?",
+            (PENDING, now, kind, IN_FLIGHT, now),
+        )
+        if cursor.rowcount:
+            custom_logger(
+                f"Reassigning {cursor.rowcount} {kind} URLs with expired leases.",
+                log_type="warn",
+            )
+        return cursor.rowcount
+
+    def mark_in_flight(self, urls):
+        self.conn.execute("BEGIN")
+        self._set_in_flight(list(urls))
+        self.conn.execute("COMMIT")
+
+    def _set_in_flight(self, urls, worker_id=None, lease_expires=None):
+        self.conn.executemany(
+            "UPDATE urls SET state = ?, attempts = attempts + 1, lease_owner = ?, "
+            "lease_expires = ?, updated_at = ? WHERE url = ?",
+            [(IN_FLIGHT, worker_id, lease_expires, time.time(), url) for url in urls],
+        )
+
+    def mark_done(self, url, worker_id=None):
+        return self._set_state(url, DONE, worker_id=worker_id)
+
+    def mark_failed(self, url, error=None, worker_id=None):
+        return self._set_state(url, FAILED, error, worker_id)
+
+    def _set_state(self, url, state, error=None, worker_id=None):
+        query = (
+            "UPDATE urls SET state = ?, last_error = ?, lease_owner = NULL, "
+            "lease_expires = NULL, updated_at = ? WHERE url = ?"
+        )
+        params = (state, error, time.time(), url)
+        if worker_id is not None:
+            # Only the holder of the lease may finish the URL. A worker whose
+            # lease expired, and was handed to another, is turned away.
+            # Unleased URLs in flight belong to the local run.
+            query += " AND state = ? AND (lease_owner = ? OR lease_owner IS NULL)"
+            params += (IN_FLIGHT, worker_id)
+        cursor = self.conn.execute(query, params)
+        if not cursor.rowcount and worker_id is not None:
+            custom_logger(
+                f"{worker_id} no longer holds the lease on {url}; "
+                f"its {state} result is ignored.",
+                log_type="warn",
+            )
+        return cursor.rowcount > 0
+
+    def set_states(self, states):
+        # Outcomes recorded elsewhere, such as in the frontier of a shard
+        now = time.time()
+        self.conn.execute("BEGIN")
+        self.conn.executemany(
+            "UPDATE urls SET state = ?, lease_owner = NULL, lease_expires = NULL, "
+            "updated_at = ? WHERE url = ?",
+            [(state, now, url) for url, state in states.items()],
+        )
+        self.conn.execute("COMMIT")
+
+    def requeue(self, urls):
+        # Finished or failed URLs whose page changed since they were fetched
+        urls = list(urls)
+        now = time.time()
+        self.conn.execute("BEGIN")
+        self.conn.executemany(
+            "UPDATE urls SET state = ?, attempts = 0, last_error = NULL, "
+            "updated_at = ? WHERE url = ? AND state IN (?, ?)",
+            [(PENDING, now, url, DONE, FAILED) for url in urls],
+        )
+        self.conn.execute("COMMIT")
+
+    def requeue_older_than(self, seconds, kind="product"):
+        # Finished or failed URLs last touched more than `seconds` ago go back
+        # to pending, so a scheduled run crawls them again
+        now = time.time()
+        cursor = self.conn.execute(
+            "UPDATE urls SET state = ?, attempts = 0, last_error = NULL, "
+            "updated_at = ? WHERE kind = ? AND state IN (?, ?) AND updated_at <= ?",
+            (PENDING, now, kind, DONE, FAILED, now - seconds),
+        )
+        if cursor.rowcount:
+            custom_logger(
+                f"Requeued {cursor.rowcount} {kind} URLs for a new crawl.",
+                log_type="info",
+            )
+        return cursor.rowcount
+
+    def resume(self, kind="product"):
+        # Unleased URLs still in flight belong to a run that never finished.
+        # Leased ones may be held by live workers and expire on their own.
+        cursor = self.conn.execute(
+            "UPDATE urls SET state = ?, updated_at = ? "
+            "WHERE kind = ? AND state = ? AND lease_expires IS NULL",
+            (PENDING, time.time(), kind, IN_FLIGHT),
+        )
+        if cursor.rowcount:
+            custom_logger(
+                f"Resuming {cursor.rowcount} interrupted {kind} URLs.", log_type="info"
+            )
+        return cursor.rowcount
+
+    def urls_in_state(self, state, kind="product"):
+        rows = self.conn.execute(
+            "SELECT url FROM urls WHERE kind = ? AND state = ? ORDER BY rowid",
+            (kind, state),
+        )
+        return [row[0] for row in rows.fetchall()]
+
+    def pending(self, kind="product"):
+        return self.urls_in_state(PENDING, kind)
+
+    def counts(self, kind="product"):
+        rows = self.conn.execute(
+            "SELECT state, COUNT(*) FROM urls WHERE kind = ? GROUP BY state", (kind,)
+        )
+        counts = dict.fromkeys(STATES, 0)
+        counts.update(dict(rows.fetchall()))
+        return counts
+
+    def checkpoint(self):
+        self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def close(self):
+        self.checkpoint()
+        self.conn.close()
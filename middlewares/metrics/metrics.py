@@ -0,0 +1,88 @@
+import json
+import time
+from pathlib import Path
+from middlewares.logger.logger import custom_logger, initialize_logging
+
+initialize_logging()
+
+root_dir = Path(__file__).resolve().parent.parent.parent
+METRICS_PATH = root_dir / "data" / "metrics.json"
+MAX_SAMPLES = 1000
+
+
+class MetricsRegistry:
+    # Process-wide counters, gauges and timing samples, reported at the end
+    # of a run and written to data/metrics.json
+    def __init__(self):
+        self.counters = {}
+        self.gauges = {}
+        self.samples = {}
+
+    def incr(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def set_gauge(self, name, value):
+        self.gauges[name] = value
+
+    def observe(self, name, value):
+        samples = self.samples.setdefault(name, [])
+        samples.append(value)
+        if len(samples) > MAX_SAMPLES:
+            del samples[0]
+
+    def percentile(self, name, percent):
+        samples = sorted(self.samples.get(name, []))
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(round(percent / 100 * (len(samples) - 1))))
+        return samples[index]
+
+    def merge(self, snapshot):
+        # Fold in the counters of another process (e.g. a shard)
+        for name, value in snapshot.get("counters", {}).items():
+            self.incr(name, value)
+
+    def snapshot(self):
+        timings = {}
+        for name, samples in self.samples.items():
+            if samples:
+                timings[name] = {
+                    "count": len(samples),
+                    "p50": self.percentile(name, 50),
+                    "p95": self.percentile(name, 95),
+                    "max": max(samples),
+                }
+        return {
+            "timestamp": time.time(),
+            "counters": dict(self.counters),
+            "gauges": dict(self.gauges),
+            "timings": timings,
+        }
+
+    def report(self):
+        snapshot = self.snapshot()
+        for name, value in sorted(snapshot["counters"].items()):
+            custom_logger(f"[metrics] {name}: {value}", log_type="info")
+        for name, value in sorted(snapshot["gauges"].items()):
+            custom_logger(f"[metrics] {name}: {value}", log_type="info")
+        for name, summary in sorted(snapshot["timings"].items()):
+            custom_logger(
+                f"[metrics] {name}: p50={summary['p50']:.3f} p95={summary['p95']:.3f} "
+                f"max={summary['max']:.3f} (n={summary['count']})",
+                log_type="info",
+            )
+        return snapshot
+
+    def dump(self, path=METRICS_PATH):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open(mode="w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, indent=2, sort_keys=True)
+
+    def reset(self):
+        self.counters.clear()
+        self.gauges.clear()
+        self.samples.clear()
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,138 @@
+import time
+import random
+import asyncio
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+import httpx
+from middlewares.metrics.metrics import metrics
+from middlewares.logger.logger import custom_logger, initialize_logging
+
+initialize_logging()
+
+DEFAULT_RATE = 2.0
+DEFAULT_BURST = 5
+DEFAULT_JITTER = 0.1
+ROBOTS_USER_AGENT = "*"
+
+
+class TokenBucket:
+    # Tokens refill at `rate` per second up to `burst`. Callers that find
+    # the bucket empty take a token on credit and are told how long to wait,
+    # so concurrent callers are spaced out in arrival order.
+    def __init__(self, rate, burst, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = burst
+        self.updated = clock()
+
+    def reserve(self):
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+
+class RateLimiter:
+    # Per-host politeness for every navigation, click and HTTP request.
+    # Requests run as fast as each host's bucket allows; there is no fixed
+    # sleep. A robots.txt Crawl-delay or Request-rate lowers a host's rate.
+    def __init__(
+        self,
+        rate=DEFAULT_RATE,
+        burst=DEFAULT_BURST,
+        jitter=DEFAULT_JITTER,
+        host_rates=None,
+        clock=time.monotonic,
+        sleep=asyncio.sleep,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.jitter = jitter
+        self.host_rates = dict(host_rates or {})
+        self.clock = clock
+        self.sleep = sleep
+        self.buckets = {}
+
+    def configure(self, rate=None, burst=None, jitter=None, host_rates=None):
+        if rate is not None:
+            self.rate = rate
+        if burst is not None:
+            self.burst = burst
+        if jitter is not None:
+            self.jitter = jitter
+        if host_rates is not None:
+            self.host_rates = dict(host_rates)
+        self.buckets.clear()
+
+    def settings(self, share=1):
+        # Settings for one of `share` processes splitting this budget
+        return {
+            "rate": self.rate / share,
+            "burst": max(1, self.burst // share),
+            "jitter": self.jitter,
+            "host_rates": {
+                host: rate / share for host, rate in self.host_rates.items()
+            },
+        }
+
+    def bucket(self, host):
+        bucket = self.buckets.get(host)
+        if bucket is None:
+            rate = self.host_rates.get(host, self.rate)
+            burst = 1 if host in self.host_rates else self.burst
+            bucket = self.buckets[host] = TokenBucket(rate, burst, self.clock)
+        return bucket
+
+    async def wait(self, url):
+        host = urlsplit(url).netloc.lower()
+        bucket = self.bucket(host)
+        delay = bucket.reserve()
+        if delay > 0 and self.jitter:
+            delay += random.uniform(0, self.jitter / bucket.rate)
+
+        metrics.incr("rate_limit.requests")
+        metrics.observe("rate_limit.wait", delay)
+        if delay > 0:
+            await self.sleep(delay)
+        return delay
+
+    def set_crawl_delay(self, host, delay):
+        host = host.lower()
+        rate = min(self.host_rates.get(host, self.rate), 1 / delay)
+        self.host_rates[host] = rate
+        self.buckets.pop(host, None)
+        custom_logger(f"Rate for {host} limited to {rate:.2f}/s by robots.txt", log_type="info")
+
+    def apply_robots(self, host, robots_txt):
+        parser = RobotFileParser()
+        parser.parse(robots_txt.splitlines())
+        delay = parser.crawl_delay(ROBOTS_USER_AGENT)
+        request_rate = parser.request_rate(ROBOTS_USER_AGENT)
+        if request_rate and request_rate.requests:
+            rate_delay = request_rate.seconds / request_rate.requests
+            delay = max(delay or 0, rate_delay)
+        if delay:
+            self.set_crawl_delay(host, float(delay))
+        return delay
+
+    async def load_robots(self, url, transport=None):
+        parts = urlsplit(url)
+        robots_url = f"{parts.scheme}://{parts.netloc}/robots.txt"
+        try:
+            async with httpx.AsyncClient(
+                timeout=15, follow_redirects=True, transport=transport
+            ) as client:
+                response = await client.get(robots_url)
+        except httpx.HTTPError as e:
+            custom_logger(f"Could not load {robots_url}: {e!r}", log_type="warn")
+            return None
+        if response.status_code != 200:
+            return None
+        return self.apply_robots(parts.netloc, response.text)
+
+
+rate_limiter = RateLimiter()
@@ -0,0 +1,100 @@
+import json
+import time
+import heapq
+import random
+from pathlib import Path
+from collections import namedtuple
+
+root_dir = Path(__file__).resolve().parent.parent.parent
+DEAD_LETTER_PATH = root_dir / "data" / "dead_letter.jsonl"
+
+TIMEOUT = "timeout"
+NAVIGATION_ERROR = "navigation_error"
+MISSING_CONTAINER = "missing_container"
+PARSE_MISS = "parse_miss"
+ERROR = "error"
+
+# A parse miss means the page loaded fine and the parser did not match it;
+# loading it again will not help (fix the parser and use `reparse`)
+RETRYABLE = {TIMEOUT, NAVIGATION_ERROR, MISSING_CONTAINER, ERROR}
+
+
+class Failure(namedtuple("Failure", ["reason", "detail"])):
+    # Falsy, so callers that only test `if not result` keep working
+    def __bool__(self):
+        return False
+
+
+class RetryPolicy:
+    def __init__(
+        self,
+        max_attempts=4,
+        base_delay=30.0,
+        max_delay=900.0,
+        jitter=0.5,
+        retryable=RETRYABLE,
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.retryable = set(retryable)
+
+    def should_retry(self, reason, attempts):
+        return reason in self.retryable and attempts < self.max_attempts
+
+    def delay(self, attempts):
+        # Exponential backoff; jitter spreads out pages that failed together
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+
+class RetryQueue:
+    # URLs waiting for their next attempt, ordered by due time
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.heap = []
+
+    def __len__(self):
+        return len(self.heap)
+
+    def schedule(self, url, delay):
+        heapq.heappush(self.heap, (self.clock() + delay, url))
+
+    def pop_due(self):
+        if self.heap and self.heap[0][0] <= self.clock():
+            return heapq.heappop(self.heap)[1]
+        return None
+
+    def seconds_until_next(self):
+        if not self.heap:
+            return None
+        return max(0.0, self.heap[0][0] - self.clock())
+
+    def urls(self):
+        return [url for _, url in self.heap]
+
+
+class DeadLetterLog:
+    # One JSON line per URL that ran out of attempts
+    def __init__(self, path=DEAD_LETTER_PATH):
+        self.path = Path(path)
+
+    def write(self, url, reason, attempts, detail=None, kind="product"):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        entry = {
+            "url": url,
+            "kind": kind,
+            "reason": reason,
+            "detail": detail,
+            "attempts": attempts,
+            "timestamp": time.time(),
+        }
+        with self.path.open(mode="a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+
+    def read(self):
+        if not self.path.exists():
+            return []
+        with self.path.open(mode="r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
@@ -0,0 +1,318 @@
+import os
+import abc
+import hmac
+import json
+import socket
+import asyncio
+import ipaddress
+from urllib.parse import urlparse
+from middlewares.frontier.frontier import Frontier, PENDING, IN_FLIGHT
+from middlewares.logger.logger import custom_logger, initialize_logging
+
+initialize_logging()
+
+DEFAULT_LEASE_SECONDS = 180
+DEFAULT_QUEUE_HOST = "127.0.0.1"
+DEFAULT_QUEUE_PORT = 8765
+QUEUE_TOKEN_ENV = "QUEUE_TOKEN"
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def is_loopback(host):
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return host == "localhost"
+
+
+class WorkQueue(abc.ABC):
+    # Where the product stage takes its URLs from. A leased URL belongs to
+    # one worker until it is acked, failed or the lease runs out.
+    lease_seconds = DEFAULT_LEASE_SECONDS
+
+    @abc.abstractmethod
+    async def add(self, urls):
+        pass
+
+    @abc.abstractmethod
+    async def lease(self, limit):
+        pass
+
+    @abc.abstractmethod
+    async def extend(self, urls):
+        pass
+
+    @abc.abstractmethod
+    async def ack(self, url):
+        pass
+
+    @abc.abstractmethod
+    async def fail(self, url, error=None):
+        pass
+
+    @abc.abstractmethod
+    async def counts(self):
+        pass
+
+    async def is_drained(self):
+        counts = await self.counts()
+        return counts[PENDING] == 0 and counts[IN_FLIGHT] == 0
+
+    async def close(self):
+        pass
+
+
+class SQLiteWorkQueue(WorkQueue):
+    # Single-host backend. Any number of processes can share one frontier
+    # file; SQLite's write lock makes each lease atomic.
+    def __init__(
+        self,
+        frontier=None,
+        worker_id=None,
+        lease_seconds=DEFAULT_LEASE_SECONDS,
+        kind="product",
+    ):
+        self.frontier = frontier if frontier else Frontier()
+        self.worker_id = worker_id if worker_id else default_worker_id()
+        self.lease_seconds = lease_seconds
+        self.kind = kind
+
+    async def add(self, urls):
+        return self.frontier.add(urls, kind=self.kind)
+
+    async def lease(self, limit):
+        return self.frontier.lease(
+            limit,
+            worker_id=self.worker_id,
+            lease_seconds=self.lease_seconds,
+            kind=self.kind,
+        )
+
+    async def extend(self, urls):
+        self.frontier.extend_leases(urls, self.worker_id, self.lease_seconds)
+
+    async def ack(self, url):
+        return self.frontier.mark_done(url, worker_id=self.worker_id)
+
+    async def fail(self, url, error=None):
+        return self.frontier.mark_failed(url, error, worker_id=self.worker_id)
+
+    async def counts(self):
+        self.frontier.reclaim_expired(kind=self.kind)
+        return self.frontier.counts(kind=self.kind)
+
+    async def close(self):
+        self.frontier.checkpoint()
+
+
+# ===================================================
+# Multi-node backend: one coordinator serves its frontier over a
+# newline-delimited JSON protocol, worker nodes lease from it remotely.
+# Every request carries the shared token; the server only listens beyond
+# the loopback interface when one is set.
+class WorkQueueServer:
+    def __init__(
+        self,
+        frontier=None,
+        host=DEFAULT_QUEUE_HOST,
+        port=DEFAULT_QUEUE_PORT,
+        kind="product",
+        token=None,
+    ):
+        self.frontier = frontier if frontier else Frontier()
+        self.host = host
+        self.port = port
+        self.kind = kind
+        self.token = token
+        self.server = None
+
+    async def start(self):
+        if not self.token and not is_loopback(self.host):
+            raise ValueError(
+                f"Serving the work queue on {self.host} needs a shared token "
+                f"(--queue-token or {QUEUE_TOKEN_ENV})"
+            )
+        self.server = await asyncio.start_server(
+            self.handle_client, self.host, self.port
+        )
+        # Resolve the real port when started with port=0
+        self.port = self.server.sockets[0].getsockname()[1]
+        custom_logger(
+            f"Work queue listening on {self.host}:{self.port}", log_type="info"
+        )
+        return self
+
+    async def handle_client(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    response = {"ok": True, "result": self.dispatch(json.loads(line))}
+                except Exception as e:
+                    response = {"ok": False, "error": str(e)}
+                writer.write(json.dumps(response).encode("utf-8") + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def dispatch(self, request):
+        if self.token and not hmac.compare_digest(
+            str(request.get("token", "")).encode("utf-8"), self.token.encode("utf-8")
+        ):
+            raise PermissionError("invalid work queue token")
+        op = request.get("op")
+        if op == "add":
+            return self.frontier.add(request["urls"], kind=self.kind)
+        if op == "lease":
+            return self.frontier.lease(
+                request["limit"],
+                worker_id=request["worker"],
+                lease_seconds=request["lease_seconds"],
+                kind=self.kind,
+            )
+        if op == "extend":
+            self.frontier.extend_leases(
+                request["urls"], request["worker"], request["lease_seconds"]
+            )
+            return None
+        if op == "ack":
+            return self.frontier.mark_done(request["url"], worker_id=request["worker"])
+        if op == "fail":
+            return self.frontier.mark_failed(
+                request["url"], request.get("error"), worker_id=request["worker"]
+            )
+        if op == "counts":
+            self.frontier.reclaim_expired(kind=self.kind)
+            return self.frontier.counts(kind=self.kind)
+        raise ValueError(f"Unknown operation: {op}")
+
+    async def serve_until_drained(self, poll_interval=5):
+        while True:
+            await asyncio.sleep(poll_interval)
+            self.frontier.reclaim_expired(kind=self.kind)
+            counts = self.frontier.counts(kind=self.kind)
+            custom_logger(f"Work queue status: {counts}", log_type="info")
+            if counts[PENDING] == 0 and counts[IN_FLIGHT] == 0:
+                return counts
+
+    async def close(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+        self.frontier.checkpoint()
+
+
+class RemoteWorkQueue(WorkQueue):
+    def __init__(
+        self,
+        host,
+        port=DEFAULT_QUEUE_PORT,
+        worker_id=None,
+        lease_seconds=DEFAULT_LEASE_SECONDS,
+        max_attempts=3,
+        token=None,
+    ):
+        self.host = host
+        self.port = port
+        self.token = token
+        self.worker_id = worker_id if worker_id else default_worker_id()
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.reader = None
+        self.writer = None
+        self.lock = asyncio.Lock()
+
+    async def _call(self, op, **params):
+        if self.token:
+            params["token"] = self.token
+        request = json.dumps({"op": op, **params}).encode("utf-8") + b"\n"
+        async with self.lock:
+            for attempt in range(1, self.max_attempts + 1):
+                try:
+                    if self.writer is None:
+                        self.reader, self.writer = await asyncio.open_connection(
+                            self.host, self.port
+                        )
+                    self.writer.write(request)
+                    await self.writer.drain()
+                    line = await self.reader.readline()
+                    if not line:
+                        raise ConnectionError("work queue server closed the connection")
+                    response = json.loads(line)
+                    break
+                except (ConnectionError, OSError) as e:
+                    self._reset()
+                    if attempt == self.max_attempts:
+                        raise
+                    custom_logger(
+                        f"Work queue unreachable ({e}), retrying...", log_type="warn"
+                    )
+                    await asyncio.sleep(attempt)
+
+        if not response["ok"]:
+            raise RuntimeError(f"Work queue error: {response['error']}")
+        return response["result"]
+
+    def _reset(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = None
+        self.writer = None
+
+    async def add(self, urls):
+        return await self._call("add", urls=list(urls))
+
+    async def lease(self, limit):
+        return await self._call(
+            "lease",
+            limit=limit,
+            worker=self.worker_id,
+            lease_seconds=self.lease_seconds,
+        )
+
+    async def extend(self, urls):
+        await self._call(
+            "extend",
+            urls=list(urls),
+            worker=self.worker_id,
+            lease_seconds=self.lease_seconds,
+        )
+
+    async def ack(self, url):
+        return await self._call("ack", url=url, worker=self.worker_id)
+
+    async def fail(self, url, error=None):
+        return await self._call("fail", url=url, error=error, worker=self.worker_id)
+
+    async def counts(self):
+        return await self._call("counts")
+
+    async def close(self):
+        self._reset()
+
+
+# ===================================================
+def build_work_queue(
+    spec, frontier=None, lease_seconds=DEFAULT_LEASE_SECONDS, token=None
+):
+    # "sqlite" for the local frontier file, "tcp://host:port" for a queue server
+    if spec == "sqlite":
+        return SQLiteWorkQueue(frontier, lease_seconds=lease_seconds)
+
+    parsed = urlparse(spec)
+    if parsed.scheme == "tcp" and parsed.hostname:
+        return RemoteWorkQueue(
+            parsed.hostname,
+            parsed.port if parsed.port else DEFAULT_QUEUE_PORT,
+            lease_seconds=lease_seconds,
+            token=token,
+        )
+
+    raise ValueError(f"Unsupported work queue: {spec}")
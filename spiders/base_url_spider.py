@@ -2,8 +2,11 @@ from pathlib import Path
 from bs4 import BeautifulSoup
 from urllib.parse import urlparse
 from utils.utilities.loader import emulator
-from utils.utilities.utilities import click_consent_button
+from utils.utilities.utilities import ensure_consent
 from playwright.async_api import async_playwright
+from utils.browser.browser_pool import use_browser_pool
+from utils.config.site import START_URL
+from middlewares.rate_limit.rate_limiter import rate_limiter
 from middlewares.errors.error_handler import handle_exceptions
 from middlewares.logger.logger import custom_logger, initialize_logging
 
@@ -18,29 +21,30 @@ def is_valid_url(url):
 
 # ===================================================
 @handle_exceptions
-async def scrape_thomann_base_urls(can_run=False):
+async def scrape_thomann_base_urls(can_run=False, browser_pool=None):
     if not can_run:
         custom_logger("BaseURL collection disabled!", log_type="info")
         return False
 
-    base_url = "https://www.thomann.de/gb/index.html"
+    base_url = START_URL
     base_urls_file = Path("base_urls/base_urls.txt")
     base_urls_file.parent.mkdir(parents=True, exist_ok=True)
 
     emulator(message="Starting URL scraping process...", is_in_progress=True)
 
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        page = await browser.new_page()
+    async with use_browser_pool(browser_pool, async_playwright) as pool:
+        context = await pool.new_context()
+        page = await context.new_page()
 
         try:
             custom_logger(f"Navigating to {base_url}", log_type="info")
+            await rate_limiter.wait(base_url)
             await page.goto(base_url, timeout=30000)
             await page.wait_for_selector(
                 ".thomann-page-content-wrapper", state="visible", timeout=30000
             )
             # wait for cookie/consent btn and click it
-            await click_consent_button(page)
+            await ensure_consent(page)
 
             content = await page.content()
             soup = BeautifulSoup(content, "html.parser")
@@ -64,15 +68,13 @@ async def scrape_thomann_base_urls(can_run=False):
             else:
                 custom_logger("No valid URLs found.", log_type="warn")
                 emulator(is_in_progress=False)
-                await browser.close()
                 return False
 
         except Exception as e:
             custom_logger(f"Error occurred: {str(e)}", log_type="error")
             emulator(is_in_progress=False)
-            await browser.close()
             return False
 
         finally:
-            await browser.close()
+            await pool.release(context)
             emulator(is_in_progress=False)
@@ -0,0 +1,237 @@
+import re
+import csv
+import time
+import asyncio
+from pathlib import Path
+from collections import namedtuple
+from bs4 import BeautifulSoup
+from urllib.parse import urljoin, urlsplit, urlunsplit
+from playwright.async_api import async_playwright, Error as PlaywrightError
+from utils.utilities.loader import emulator
+from utils.utilities.utilities import randomize_timeout, ensure_consent
+from utils.browser.browser_pool import use_browser_pool
+from utils.config.site import START_URL, CATEGORY_PATH_PATTERN
+from utils.fetchers.http_fetcher import HttpFetcher
+from spiders.pagination import LISTING_ITEM_PATTERN
+from middlewares.metrics.metrics import metrics
+from middlewares.concurrency.aimd import AimdController
+from middlewares.rate_limit.rate_limiter import rate_limiter
+from middlewares.errors.error_handler import handle_exceptions
+from middlewares.logger.logger import custom_logger, initialize_logging
+
+initialize_logging()
+
+root_dir = Path(__file__).resolve().parent.parent
+BASE_URLS_FILE = root_dir / "base_urls" / "base_urls.txt"
+CATEGORY_TREE_FILE = root_dir / "base_urls" / "category_tree.csv"
+
+CONTENT_SELECTOR = ".thomann-page-content-wrapper"
+# Pages that match CATEGORY_PATH_PATTERN but are not part of the catalogue
+EXCLUDED_PAGES = {
+    "index.html",
+    "blowouts.html",
+    "hotdeals.html",
+    "prodnews.html",
+    "topseller.html",
+    "cart.html",
+    "wishlist.html",
+    "compare.html",
+    "helpdesk.html",
+    "newsletter.html",
+}
+# Links in these parts of a page point all over the shop (or back up the
+# tree), not to the page's own subcategories
+SITE_CHROME_SELECTOR = (
+    "header, nav, footer, [class*='breadcrumb'], [class*='mega-menu']"
+)
+MAX_CATEGORY_DEPTH = 4
+MAX_CATEGORY_PAGES = 5000
+
+CategoryPage = namedtuple(
+    "CategoryPage", ["url", "depth", "parent", "children", "listing"]
+)
+CategoryTree = namedtuple("CategoryTree", ["pages", "leaves"])
+
+
+def canonicalize_url(url, page_url=START_URL):
+    # One spelling per category: absolute, lower-case host, no query or
+    # fragment (filters and sort orders are views of the same category)
+    parts = urlsplit(urljoin(page_url, url.strip()))
+    base = urlsplit(page_url)
+    if parts.scheme not in ("http", "https"):
+        return None
+    if parts.netloc.lower() != base.netloc.lower():
+        return None
+    path = re.sub(r"/{2,}", "/", parts.path)
+    if not CATEGORY_PATH_PATTERN.match(path):
+        return None
+    if path.rsplit("/", 1)[-1] in EXCLUDED_PAGES:
+        return None
+    return urlunsplit(("https", parts.netloc.lower(), path, "", ""))
+
+
+def parse_category_page(html, page_url):
+    # Returns the category links in the page content and whether the page
+    # lists products itself
+    soup = BeautifulSoup(html, "html.parser")
+    for element in soup.select(SITE_CHROME_SELECTOR):
+        element.decompose()
+    content = soup.select_one(CONTENT_SELECTOR) or soup
+
+    links = set()
+    for link in content.select("a[href]"):
+        url = canonicalize_url(link["href"], page_url)
+        if url and url != page_url:
+            links.add(url)
+    return links, bool(LISTING_ITEM_PATTERN.search(html))
+
+
+async def discover_categories(
+    start_urls,
+    fetch_page,
+    controller,
+    max_depth=MAX_CATEGORY_DEPTH,
+    max_pages=MAX_CATEGORY_PAGES,
+):
+    # Breadth-first, one level at a time. A link is a page's child only if
+    # no earlier level or sibling reached it first, so sidebar links to
+    # siblings and parents don't count. Leaves are listing pages without
+    # children, plus listing pages at max_depth.
+    pages = {}
+    visited = set(start_urls)
+    level = [(url, None) for url in start_urls]
+    depth = 0
+
+    async def visit(url):
+        async with controller.slot():
+            started = time.monotonic()
+            html = await fetch_page(url)
+            controller.record(time.monotonic() - started, ok=html is not None)
+        metrics.incr("categories.pages" if html is not None else "categories.failed")
+        return parse_category_page(html, url) if html is not None else None
+
+    while level:
+        results = await asyncio.gather(*[visit(url) for url, _ in level])
+        next_level = []
+        for (url, parent), result in zip(level, results):
+            if result is None:
+                custom_logger(f"Category page {url} failed.", log_type="warn")
+                continue
+            links, listing = result
+            children = set()
+            if depth < max_depth:
+                for link in sorted(links - visited):
+                    if len(visited) >= max_pages:
+                        break
+                    visited.add(link)
+                    children.add(link)
+                    next_level.append((link, url))
+            pages[url] = CategoryPage(url, depth, parent, children, listing)
+
+        custom_logger(
+            f"Category level {depth}: {len(level)} pages, "
+            f"{len(next_level)} new subcategories.",
+            log_type="info",
+        )
+        level = next_level
+        depth += 1
+
+    leaves = sorted(
+        page.url for page in pages.values() if page.listing and not page.children
+    )
+    metrics.set_gauge("categories.leaves", len(leaves))
+    return CategoryTree(pages, leaves)
+
+
+async def fetch_category_page(url, http_fetcher, pool, controller):
+    # HTTP first; the browser only when plain HTTP is refused
+    await rate_limiter.wait(url)
+    result = await http_fetcher.fetch(url, required_pattern=None)
+    if result.reason in ("timeout", "bot challenge"):
+        controller.record_throttle(result.reason)
+    if result.content is not None:
+        return result.content
+
+    context = await pool.new_context()
+    try:
+        page = await context.new_page()
+        await rate_limiter.wait(url)
+        await page.goto(url, timeout=randomize_timeout(60000, 80000))
+        await ensure_consent(page)
+        await page.wait_for_selector(
+            CONTENT_SELECTOR, state="visible", timeout=randomize_timeout(30000, 50000)
+        )
+        return await page.content()
+    except PlaywrightError as e:
+        custom_logger(f"Category page {url} failed: {e}", log_type="warn")
+        return None
+    finally:
+        await pool.release(context)
+
+
+@handle_exceptions
+def save_category_tree(
+    tree, base_urls_file=BASE_URLS_FILE, tree_file=CATEGORY_TREE_FILE
+):
+    base_urls_file.parent.mkdir(parents=True, exist_ok=True)
+    with base_urls_file.open("w", encoding="utf-8") as f:
+        for url in tree.leaves:
+            f.write(f"{url}\n")
+
+    with tree_file.open("w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["url", "depth", "parent", "children", "listing"])
+        pages = sorted(tree.pages.values(), key=lambda page: (page.depth, page.url))
+        for page in pages:
+            writer.writerow(
+                [
+                    page.url,
+                    page.depth,
+                    page.parent or "",
+                    len(page.children),
+                    page.listing,
+                ]
+            )
+
+
+# ===================================================
+@handle_exceptions
+async def discover_category_tree(
+    can_run=False,
+    browser_pool=None,
+    http_fetcher=None,
+    max_depth=MAX_CATEGORY_DEPTH,
+    start_url=START_URL,
+):
+    if not can_run:
+        custom_logger("Category discovery disabled!", log_type="info")
+        return False
+
+    emulator(message="Discovering category tree...", is_in_progress=True)
+    controller = AimdController("categories", initial=4)
+    fetcher = http_fetcher if http_fetcher else HttpFetcher()
+    try:
+        async with use_browser_pool(browser_pool, async_playwright) as pool:
+
+            async def fetch_page(url):
+                return await fetch_category_page(url, fetcher, pool, controller)
+
+            tree = await discover_categories(
+                [start_url], fetch_page, controller, max_depth=max_depth
+            )
+    finally:
+        emulator(is_in_progress=False)
+        if not http_fetcher:
+            await fetcher.close()
+
+    if not tree.leaves:
+        custom_logger("No leaf categories found.", log_type="warn")
+        return False
+
+    save_category_tree(tree)
+    custom_logger(
+        f"{len(tree.leaves)} leaf categories of {len(tree.pages)} pages saved "
+        f"to {BASE_URLS_FILE}.",
+        log_type="info",
+    )
+    return True
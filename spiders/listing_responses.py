@@ -0,0 +1,123 @@
+import re
+import asyncio
+from bs4 import BeautifulSoup
+from urllib.parse import urljoin, urlsplit
+from middlewares.metrics.metrics import metrics
+from middlewares.logger.logger import custom_logger, initialize_logging
+
+initialize_logging()
+
+GRID_RESOURCE_TYPES = ("xhr", "fetch")
+PRODUCT_PATH_PATTERN = re.compile(r"\.htm(?:[?#]|$)")
+PRODUCT_URL_KEYS = ("url", "href", "link", "productUrl", "product_url", "relativeLink")
+FRAGMENT_MARKER = "js-item"
+
+
+def scalar_fields(node):
+    return {
+        key: value
+        for key, value in node.items()
+        if value is None or isinstance(value, (str, int, float, bool))
+    }
+
+
+def items_from_html(html, base_url):
+    items = {}
+    soup = BeautifulSoup(html, "html.parser")
+    for link in soup.select("a.js-item"):
+        href = link.get("href")
+        if not href:
+            continue
+        fields = {
+            key: value
+            for key, value in link.attrs.items()
+            if key.startswith("data-") and isinstance(value, str)
+        }
+        title = link.get("title") or link.get_text(" ", strip=True)
+        if title:
+            fields["title"] = title
+        items[urljoin(base_url, href)] = fields
+    return items
+
+
+def items_from_json(data, base_url):
+    # Product entries are any objects carrying a product page URL; HTML
+    # fragments embedded as strings are parsed like fragment responses
+    items = {}
+
+    def visit(node):
+        if isinstance(node, dict):
+            for key in PRODUCT_URL_KEYS:
+                url = node.get(key)
+                if isinstance(url, str) and PRODUCT_PATH_PATTERN.search(url):
+                    items[urljoin(base_url, url)] = scalar_fields(node)
+                    break
+            for value in node.values():
+                visit(value)
+        elif isinstance(node, list):
+            for value in node:
+                visit(value)
+        elif isinstance(node, str) and FRAGMENT_MARKER in node:
+            items.update(items_from_html(node, base_url))
+
+    visit(data)
+    return items
+
+
+class ListingResponseCollector:
+    # Listens to the grid's background requests and keeps the products they
+    # return, so "load more" results don't have to be read back from the DOM
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.host = urlsplit(base_url).netloc
+        self.items = {}
+        self.new_items = {}
+        self.responses_seen = 0
+        self.pending = set()
+
+    def attach(self, page):
+        page.on("response", self.on_response)
+
+    def on_response(self, response):
+        task = asyncio.ensure_future(self.handle_response(response))
+        self.pending.add(task)
+        task.add_done_callback(self.pending.discard)
+
+    async def handle_response(self, response):
+        try:
+            if response.request.resource_type not in GRID_RESOURCE_TYPES:
+                return
+            if response.status != 200 or urlsplit(response.url).netloc != self.host:
+                return
+
+            content_type = response.headers.get("content-type", "")
+            if "json" in content_type:
+                items = items_from_json(await response.json(), self.base_url)
+            elif "html" in content_type:
+                text = await response.text()
+                if FRAGMENT_MARKER not in text:
+                    return
+                items = items_from_html(text, self.base_url)
+            else:
+                return
+        except ValueError:
+            return
+        except Exception as e:
+            custom_logger(f"Could not read grid response: {e}", log_type="warn")
+            return
+
+        if items:
+            self.responses_seen += 1
+            metrics.incr("listing.grid_responses")
+            for url, fields in items.items():
+                if url not in self.items:
+                    self.new_items[url] = fields
+                self.items[url] = fields
+
+    async def drain(self):
+        if self.pending:
+            await asyncio.gather(*list(self.pending), return_exceptions=True)
+
+    def take_new(self):
+        new_items, self.new_items = self.new_items, {}
+        return new_items
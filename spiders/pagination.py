@@ -0,0 +1,151 @@
+import re
+import time
+import asyncio
+from collections import namedtuple
+from bs4 import BeautifulSoup
+from urllib.parse import urljoin, urlsplit, urlunsplit, parse_qsl, urlencode
+from middlewares.errors.error_handler import handle_exceptions
+from middlewares.logger.logger import custom_logger, initialize_logging
+
+initialize_logging()
+
+PAGE_PARAMS = ("pg", "page", "p")
+OFFSET_PARAMS = ("offset", "start")
+URL_ATTRIBUTES = (
+    "href",
+    "data-url",
+    "data-href",
+    "data-next-url",
+    "data-load-more-url",
+)
+PAGINATION_SELECTOR = ", ".join(f"[{attribute}]" for attribute in URL_ATTRIBUTES)
+LISTING_ITEM_PATTERN = re.compile(r"class=[\"'][^\"']*\bjs-item\b")
+MAX_LISTING_PAGES = 500
+
+# `last_page` is the highest page linked from the first page. Pagination
+# bars often show a window ("1 2 3 ... 12"), so it is a lower bound only.
+Pagination = namedtuple("Pagination", ["param", "step", "last_page", "query"])
+
+
+def linked_urls(html, page_url):
+    soup = BeautifulSoup(html, "html.parser")
+    for element in soup.select(PAGINATION_SELECTOR):
+        for attribute in URL_ATTRIBUTES:
+            value = element.get(attribute)
+            if value and not value.startswith(("#", "javascript:")):
+                yield urljoin(page_url, value)
+
+
+@handle_exceptions
+def detect_pagination(html, page_url):
+    # Find links back to the same listing that differ by a page or offset
+    # parameter (the "load more" button and the pagination bar)
+    base = urlsplit(page_url)
+    seen = {}
+    for url in linked_urls(html, page_url):
+        parts = urlsplit(url)
+        if parts.netloc != base.netloc or parts.path != base.path:
+            continue
+        query = dict(parse_qsl(parts.query))
+        for param in PAGE_PARAMS + OFFSET_PARAMS:
+            value = query.get(param, "")
+            if value.isdigit() and int(value) > 0:
+                seen.setdefault(param, {})[int(value)] = query
+
+    if not seen:
+        return None
+
+    param = max(seen, key=lambda name: len(seen[name]))
+    values = sorted(seen[param])
+    query = dict(seen[param][values[-1]])
+    query.pop(param)
+
+    if param in OFFSET_PARAMS:
+        gaps = [b - a for a, b in zip(values, values[1:])]
+        step = min(gaps + [values[0]])
+        last_page = values[-1] // step + 1
+    else:
+        step = 1
+        last_page = values[-1]
+    return Pagination(param, step, last_page, query)
+
+
+def page_url(pagination, base_url, page_number):
+    # page_number 1 is the listing as first loaded
+    parts = urlsplit(base_url)
+    query = dict(parse_qsl(parts.query))
+    query.update(pagination.query)
+    if pagination.param in OFFSET_PARAMS:
+        query[pagination.param] = str((page_number - 1) * pagination.step)
+    else:
+        query[pagination.param] = str(page_number)
+    return urlunsplit(
+        (parts.scheme, parts.netloc, parts.path, urlencode(query), parts.fragment)
+    )
+
+
+async def fetch_listing_pages(
+    pagination,
+    base_url,
+    fetch_page,
+    parse_page,
+    on_new_endpoints,
+    seen,
+    controller,
+    max_pages=MAX_LISTING_PAGES,
+):
+    # Every page up to the last linked one is fetched at once (within the
+    # controller's limit). Past that, pages go in waves of the current limit
+    # until a page adds nothing new. Returns None if no page could be
+    # fetched, so the caller can fall back to clicking. parse_page is a
+    # coroutine so pages can be parsed off the event loop.
+    fetched = 0
+
+    async def load(page_number):
+        nonlocal fetched
+        async with controller.slot():
+            started = time.monotonic()
+            content = await fetch_page(page_url(pagination, base_url, page_number))
+            controller.record(time.monotonic() - started, ok=content is not None)
+        if content is None:
+            return None
+        fetched += 1
+        return await parse_page(content)
+
+    async def collect(page_numbers):
+        exhausted = False
+        results = await asyncio.gather(*[load(number) for number in page_numbers])
+        for number, found in zip(page_numbers, results):
+            if found is None:
+                custom_logger(
+                    f"Listing page {number} of {base_url} failed.", log_type="warn"
+                )
+                continue
+            new_endpoints = found - seen
+            if new_endpoints:
+                seen.update(new_endpoints)
+                await on_new_endpoints(new_endpoints)
+            else:
+                exhausted = True
+        return exhausted
+
+    last_page = min(pagination.last_page, max_pages)
+    exhausted = False
+    if last_page >= 2:
+        exhausted = await collect(list(range(2, last_page + 1)))
+        if not fetched:
+            return None
+
+    next_page = max(last_page, 1) + 1
+    while not exhausted and next_page <= max_pages:
+        wave = list(range(next_page, min(next_page + controller.limit, max_pages + 1)))
+        exhausted = await collect(wave)
+        next_page += len(wave)
+        if not fetched:
+            break
+
+    custom_logger(
+        f"Fetched {fetched} listing pages of {base_url} by URL ({pagination.param}).",
+        log_type="info",
+    )
+    return fetched if fetched else None
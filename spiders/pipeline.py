@@ -0,0 +1,62 @@
+import asyncio
+from spiders.product_endpoints import collect_product_endpoints
+from middlewares.errors.error_handler import handle_exceptions
+from middlewares.logger.logger import custom_logger, initialize_logging
+
+initialize_logging()
+
+ENDPOINT_QUEUE_SIZE = 500
+
+
+# ===================================================
+@handle_exceptions
+async def run_streaming_pipeline(
+    prod_data,
+    can_run=False,
+    queue_size=ENDPOINT_QUEUE_SIZE,
+    concurrency=3,
+    category_concurrency=3,
+):
+    if not can_run:
+        custom_logger("Streaming pipeline disabled!", log_type="info")
+        return False
+
+    endpoint_queue = asyncio.Queue(maxsize=queue_size)
+
+    async def produce():
+        try:
+            return await collect_product_endpoints(
+                can_run=True,
+                endpoint_queue=endpoint_queue,
+                frontier=getattr(prod_data, "frontier", None),
+                browser_pool=getattr(prod_data, "browser_pool", None),
+                http_fetcher=getattr(prod_data, "http_fetcher", None),
+                category_concurrency=category_concurrency,
+                parse_pool=getattr(prod_data, "parse_pool", None),
+                recrawl_after=getattr(prod_data, "recrawl_after", None),
+                dead_letters=getattr(prod_data, "dead_letters", None),
+            )
+        finally:
+            # Always close the stream so the product workers can finish
+            await endpoint_queue.put(None)
+
+    producer = asyncio.create_task(produce())
+    try:
+        is_data_ready = await prod_data.consume_endpoint_queue(
+            endpoint_queue, concurrency=concurrency
+        )
+    finally:
+        # A failed consumer would leave the producer blocked on a full queue
+        if not producer.done():
+            producer.cancel()
+
+    try:
+        endpoints_collected = await producer
+    except asyncio.CancelledError:
+        endpoints_collected = False
+
+    custom_logger(
+        f"Streaming pipeline finished (endpoints collected: {bool(endpoints_collected)}).",
+        log_type="info",
+    )
+    return bool(is_data_ready)
@@ -1,35 +1,231 @@
 import re
 import csv
+import os
 import json
+import time
+import signal
 import asyncio
+import multiprocessing
+from collections import deque
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
 from utils.utilities.loader import emulator
-from auth_creds.headers import Headers
-from utils.utilities.utilities import randomize_timeout, click_consent_button
-from playwright.async_api import async_playwright, Error as PlaywrightError
+from utils.headers.headers_handler import Headers
+from utils.utilities.utilities import randomize_timeout, ensure_consent
+from playwright.async_api import (
+    async_playwright,
+    TimeoutError as PlaywrightTimeoutError,
+    Error as PlaywrightError,
+)
 from utils.parsers.parse_products import extract_product_data
+from utils.parsers.schema import PRODUCT_PLAN
+from utils.parsers.structured_data import FALLBACK_PLAN
+from utils.parsers.parse_pool import ParsePool, DEFAULT_PARSE_WORKERS
+from utils.fetchers.http_fetcher import (
+    HttpFetcher,
+    BOT_CHALLENGE_STATUSES,
+    PRODUCT_CONTAINER_PATTERN,
+)
+from utils.cache.http_cache import HttpCache
+from utils.archive.html_archive import HtmlArchive
+from utils.browser.browser_pool import use_browser_pool
+from spiders.sharding import shard_endpoints, merge_shard_outputs
+from middlewares.frontier.frontier import Frontier, DONE, FAILED
+from middlewares.work_queue.work_queue import SQLiteWorkQueue, WorkQueueServer
+from middlewares.metrics.metrics import metrics
+from middlewares.concurrency.aimd import AimdController
+from middlewares.rate_limit.rate_limiter import rate_limiter
+from middlewares.retry.retry import (
+    Failure,
+    RetryPolicy,
+    RetryQueue,
+    DeadLetterLog,
+    TIMEOUT,
+    NAVIGATION_ERROR,
+    MISSING_CONTAINER,
+    PARSE_MISS,
+    ERROR,
+)
 from middlewares.errors.error_handler import handle_exceptions
 from middlewares.logger.logger import custom_logger, initialize_logging
 
 initialize_logging()
 
 DATA_DIR = Path(__file__).resolve().parent.parent / "data"
-
-if not DATA_DIR.exists():
-    DATA_DIR.mkdir()
+ENDPOINTS_DIR = DATA_DIR.parent / "product_endpoints"
+# Files of the run's stores, all kept under its data_dir
+FRONTIER_FILE = "frontier.db"
+HTTP_CACHE_FILE = "http_cache.db"
+ARCHIVE_DIR = "archive"
+DEAD_LETTER_FILE = "dead_letter.jsonl"
+
+CHECKPOINT_EVERY = 50
+DEFAULT_RECRAWL_HOURS = 12
+QUEUE_POLL_INTERVAL = 5
+PRODUCTS_FILE = "products_data.txt"
+
+
+def run_product_shard(
+    shard_index, endpoints, data_dir, concurrency=3, app_options=None, rate_limit=None
+):
+    # Entry point of a shard process: its own event loop, its own browser and
+    # its own frontier and HTTP cache under data_dir, so shards never wait on
+    # each other's SQLite writes
+    if rate_limit:
+        rate_limiter.configure(**rate_limit)
+    app = ProductProcessorApp(data_dir=data_dir, **(app_options or {}))
+    # Outcomes of an earlier run of this shard must not leak into this one
+    app.frontier.add(endpoints)
+    app.frontier.requeue(endpoints)
+    try:
+        asyncio.run(app.process_product_endpoints(endpoints, concurrency=concurrency))
+    finally:
+        app.parse_pool.close()
+        app.frontier.close()
+    return {
+        "shard": shard_index,
+        "success_count": app.success_count,
+        "retries": app.retries,
+        "fetch_stats": app.fetch_stats,
+        "metrics": metrics.snapshot(),
+    }
 
 
 class ProductProcessorApp:
-    def __init__(self):
-        self.data_dir = DATA_DIR
+    def __init__(
+        self,
+        data_dir=DATA_DIR,
+        frontier=None,
+        http_first=True,
+        browser_pool=None,
+        http_cache=True,
+        archive=True,
+        max_concurrency=12,
+        parser_engine=None,
+        parse_workers=DEFAULT_PARSE_WORKERS,
+        structured_data=False,
+        recrawl_after=None,
+        block_resources=True,
+        archive_dir=None,
+        dead_letter_path=None,
+    ):
+        self.data_dir = Path(data_dir)
+        self.products_file = PRODUCTS_FILE
         self.unique_products = set()
         self.success_count = 0
         self.retries = []
+        # The stores are opened on first use, under data_dir unless the
+        # archive or dead-letter paths are given (shards share the parent's)
+        self._frontier = frontier
+        self._work_queue = None
+        self.use_http_cache = http_cache
+        self._http_cache = None
+        self._http_fetcher = None
+        self.use_archive = archive
+        self.archive_dir = Path(archive_dir or self.data_dir / ARCHIVE_DIR)
+        self._archive = None
+        self.dead_letter_path = Path(
+            dead_letter_path or self.data_dir / DEAD_LETTER_FILE
+        )
+        self._dead_letters = None
+        self.http_first = http_first
+        self.browser_pool = browser_pool
+        # Used when the app has to start its own browser pool
+        self.block_resources = block_resources
+        self.parser_engine = parser_engine
+        self.structured_data = structured_data
+        # Hours after which finished URLs are crawled again; None never does
+        self.recrawl_after = recrawl_after
+        self.parse_pool = ParsePool(parse_workers)
+        self.concurrency = AimdController("product", max_limit=max_concurrency)
+        self.retry_policy = RetryPolicy()
+        self.retry_queue = RetryQueue()
+        self.attempts = {}
+        self.fetch_stats = {"http": 0, "not_modified": 0, "browser": 0}
+        self.shutdown_requested = False
+        self.shutdown_event = asyncio.Event()
+        self.pages_since_checkpoint = 0
+        self.leased_urls = set()
+
+    @property
+    def frontier(self):
+        if self._frontier is None:
+            self._frontier = Frontier(self.data_dir / FRONTIER_FILE)
+        return self._frontier
+
+    @frontier.setter
+    def frontier(self, frontier):
+        self._frontier = frontier
+
+    @property
+    def work_queue(self):
+        if self._work_queue is None:
+            self._work_queue = SQLiteWorkQueue(self.frontier)
+        return self._work_queue
+
+    @property
+    def http_cache(self):
+        if self._http_cache is None and self.use_http_cache:
+            self._http_cache = HttpCache(self.data_dir / HTTP_CACHE_FILE)
+        return self._http_cache
+
+    @property
+    def http_fetcher(self):
+        if self._http_fetcher is None:
+            self._http_fetcher = HttpFetcher(cache=self.http_cache)
+        return self._http_fetcher
+
+    @http_fetcher.setter
+    def http_fetcher(self, http_fetcher):
+        self._http_fetcher = http_fetcher
+
+    @property
+    def archive(self):
+        if self._archive is None and self.use_archive:
+            self._archive = HtmlArchive(self.archive_dir)
+        return self._archive
+
+    @property
+    def dead_letters(self):
+        if self._dead_letters is None:
+            self._dead_letters = DeadLetterLog(self.dead_letter_path)
+        return self._dead_letters
+
+    @dead_letters.setter
+    def dead_letters(self, dead_letters):
+        self._dead_letters = dead_letters
+
+    def requeue_finished(self, kind="product"):
+        if self.recrawl_after is None:
+            return 0
+        return self.frontier.requeue_older_than(self.recrawl_after * 3600, kind)
+
+    def request_shutdown(self):
+        if not self.shutdown_requested:
+            custom_logger(
+                "Shutdown requested, draining in-flight pages...", log_type="warn"
+            )
+        self.shutdown_requested = True
+        self.shutdown_event.set()
+
+    def install_shutdown_handler(self):
+        try:
+            asyncio.get_running_loop().add_signal_handler(
+                signal.SIGINT, self.request_shutdown
+            )
+            return True
+        except (NotImplementedError, RuntimeError):
+            # Signal handlers are unavailable on Windows event loops
+            return False
+
+    def remove_shutdown_handler(self):
+        try:
+            asyncio.get_running_loop().remove_signal_handler(signal.SIGINT)
+        except (NotImplementedError, RuntimeError):
+            pass
 
     @handle_exceptions
-    async def load_products_endpoints_csv_files(self):
-        project_root = Path(__file__).resolve().parent.parent
-        base_dir = project_root / "product_endpoints"
+    async def load_products_endpoints_csv_files(self, base_dir=ENDPOINTS_DIR):
 
         if not base_dir.exists() or not base_dir.is_dir():
             custom_logger(
@@ -64,78 +260,435 @@ class ProductProcessorApp:
         # ===================================================
         # ===================================================
 
+    async def fetch_over_http(self, url):
+        # Product pages are server-rendered; only fall back to the browser
+        # on errors, bot challenges or a missing product container
+        if not self.http_first:
+            return None
+
+        await rate_limiter.wait(url)
+        result = await self.http_fetcher.fetch(url)
+        if result.reason in ("timeout", "bot challenge"):
+            self.concurrency.record_throttle(result.reason)
+        if result.content is None:
+            custom_logger(
+                f"HTTP fetch failed for {url} ({result.reason}), using the browser.",
+                log_type="warn",
+            )
+            return None
+
+        self.fetch_stats["not_modified" if result.not_modified else "http"] += 1
+        return result
+
     @handle_exceptions
-    async def download_and_process_page(self, page, url):
+    async def download_and_process_page(self, open_page, url):
+        # open_page() returns the worker's browser page; it is only called
+        # when the page cannot be fetched over plain HTTP
         try:
             emulator(message="Downloading page...", is_in_progress=True)
 
-            await page.goto(url, timeout=randomize_timeout(40000, 60000))
-
-            # Look for consent button
-            await click_consent_button(page)
-
-            await page.wait_for_selector(".thomann-page-content-wrapper")
-            content = await page.content()
-            product_data = extract_product_data(content)
+            result = await self.fetch_over_http(url)
+            if result and result.record and not self.structured_data:
+                # Unchanged since the last crawl: reuse the parsed record
+                emulator(is_in_progress=False)
+                return result.record
+
+            content = result.content if result else None
+            if content is None:
+                page = await open_page()
+                await rate_limiter.wait(url)
+                response = await page.goto(url, timeout=randomize_timeout(40000, 60000))
+                if response and response.status in BOT_CHALLENGE_STATUSES:
+                    self.concurrency.record_throttle(f"status {response.status}")
+
+                # Look for consent button
+                await ensure_consent(page)
+
+                await page.wait_for_selector(".thomann-page-content-wrapper")
+                content = await page.content()
+                self.fetch_stats["browser"] += 1
+            if self.archive:
+                # Compressing and committing the page stays off the event loop
+                await asyncio.to_thread(self.archive.put, url, content)
+            product_data = await self.parse_pool.run(
+                extract_product_data, content, self.parser_engine, self.structured_data
+            )
             if product_data:
+                # Cached records are full records; structured ones are rescanned
+                if result and self.http_cache and not self.structured_data:
+                    self.http_cache.store_record(url, product_data)
                 emulator(message="Page data downloaded...", is_in_progress=False)
                 return product_data
             else:
                 emulator(is_in_progress=False)
-                return False
+                if not PRODUCT_CONTAINER_PATTERN.search(content):
+                    return Failure(MISSING_CONTAINER, "product container not in page")
+                return Failure(PARSE_MISS, "parser returned no data")
+        except PlaywrightTimeoutError as e:
+            self.concurrency.record_throttle("timeout")
+            custom_logger(f"Timeout fetching {url}: {e}", log_type="error")
+            return Failure(TIMEOUT, str(e))
         except PlaywrightError as e:
             custom_logger(f"Error fetching {url}: {e}", log_type="error")
-            return False
+            return Failure(NAVIGATION_ERROR, str(e))
         except Exception as e:
             custom_logger(f"Exception processing {url}: {e}", log_type="error")
-            return False
+            return Failure(ERROR, repr(e))
+
+    async def record_result(self, url, result, work_queue=None):
+        work_queue = work_queue if work_queue else self.work_queue
+        if isinstance(result, dict):
+            self.save_product_data(result)
+            await work_queue.ack(url)
+            self.success_count += 1
+            self.attempts.pop(url, None)
+        else:
+            failure = result if isinstance(result, Failure) else Failure(ERROR, None)
+            attempts = self.attempts[url] = self.attempts.get(url, 0) + 1
+            metrics.incr(f"retry.failure.{failure.reason}")
+            if self.retry_policy.should_retry(failure.reason, attempts):
+                # The URL stays leased/in flight until its next attempt
+                delay = self.retry_policy.delay(attempts)
+                self.retry_queue.schedule(url, delay)
+                metrics.incr("retry.scheduled")
+                custom_logger(
+                    f"Retrying {url} in {delay:.0f}s ({failure.reason}, attempt {attempts}).",
+                    log_type="warn",
+                )
+                return
+
+            await work_queue.fail(url, f"{failure.reason}: {failure.detail}")
+            self.dead_letters.write(url, failure.reason, attempts, failure.detail)
+            metrics.incr("retry.dead_lettered")
+            self.retries.append(url)
+            self.attempts.pop(url, None)
+        self.leased_urls.discard(url)
+
+        self.pages_since_checkpoint += 1
+        if self.pages_since_checkpoint >= CHECKPOINT_EVERY:
+            self.frontier.checkpoint()
+            self.pages_since_checkpoint = 0
+
+    async def page_worker(self, pool, next_url, work_queue=None):
+        # A long-lived worker that pulls the next URL as soon as it is free,
+        # so one slow page never holds up the others. Only workers inside
+        # the controller's current limit are fetching at any time.
+        product_headers = Headers().get_product_headers()
+        context = None
+        page = None
+
+        async def open_page():
+            # The context and page are opened the first time a URL has to
+            # fall back to the browser, not for pages fetched over HTTP
+            nonlocal context, page
+            if context is None:
+                context = await pool.new_context(extra_http_headers=product_headers)
+            renewed = await pool.renew(context)
+            if renewed is not context:
+                context, page = renewed, None
+            if page is None or page.is_closed():
+                page = await context.new_page()
+            return page
+
+        try:
+            while not self.shutdown_requested:
+                async with self.concurrency.slot():
+                    url = await next_url()
+                    if url is None:
+                        break
+
+                    started = time.monotonic()
+                    result = await self.download_and_process_page(open_page, url)
+                    self.concurrency.record(
+                        time.monotonic() - started, ok=isinstance(result, dict)
+                    )
+                    await self.record_result(url, result, work_queue)
+        finally:
+            if context is not None:
+                await pool.release(context)
+
+    def with_retries(self, next_url):
+        # Due retries go first, interleaved with fresh work. Once fresh work
+        # runs out, wait for the remaining retries instead of exiting.
+        async def next_url_or_retry():
+            while not self.shutdown_requested:
+                url = self.retry_queue.pop_due()
+                if url is not None:
+                    return url
+                url = await next_url()
+                if url is not None or not self.retry_queue:
+                    return url
+                await self.wait_unless_shutdown(
+                    asyncio.sleep(self.retry_queue.seconds_until_next())
+                )
+            return None
+
+        return next_url_or_retry
+
+    async def run_page_workers(self, next_url, concurrency=3, work_queue=None):
+        # `concurrency` is the starting limit; the controller adapts it
+        # between 1 and its max_limit as the run goes on
+        self.concurrency.start(concurrency)
+        next_url = self.with_retries(next_url)
+        async with use_browser_pool(
+            self.browser_pool, async_playwright, block_resources=self.block_resources
+        ) as pool:
+            self.install_shutdown_handler()
+            try:
+                await asyncio.gather(
+                    *[
+                        self.page_worker(pool, next_url, work_queue)
+                        for _ in range(self.concurrency.max_limit)
+                    ]
+                )
+            finally:
+                self.remove_shutdown_handler()
+                self.frontier.checkpoint()
+                if self._http_fetcher is not None:
+                    await self._http_fetcher.close()
+
+        self.log_run_summary()
+        return self.success_count > 0
+
+    async def wait_unless_shutdown(self, awaitable):
+        task = asyncio.ensure_future(awaitable)
+        stop = asyncio.ensure_future(self.shutdown_event.wait())
+        done, _ = await asyncio.wait({task, stop}, return_when=asyncio.FIRST_COMPLETED)
+        stop.cancel()
+        if task in done:
+            return task.result()
+        task.cancel()
+        return None
 
     @handle_exceptions
     async def process_product_endpoints(self, endpoints, concurrency=3):
-        async with async_playwright() as p:
-            products_headers_obj = Headers()
-            browser = await p.chromium.launch(headless=True)
-            context = await browser.new_context(
-                extra_http_headers=products_headers_obj.get_product_headers()
-            )
+        remaining = iter(endpoints)
 
-            try:
+        async def next_url():
+            url = next(remaining, None)
+            if url is not None:
+                self.frontier.mark_in_flight([url])
+            return url
 
-                async def process_batch(batch_urls):
-                    tasks = []
-                    pages = []
+        return await self.run_page_workers(next_url, concurrency)
 
-                    for url in batch_urls:
-                        page = await context.new_page()
-                        pages.append(page)
-                        tasks.append(self.download_and_process_page(page, url))
+    @handle_exceptions
+    async def consume_endpoint_queue(self, endpoint_queue, concurrency=3):
+        # Endpoints are taken from the queue as soon as the listing stage
+        # publishes them; a None item marks the end of the stream.
+        self.requeue_finished()
+        self.frontier.resume()
+
+        async def next_url():
+            while not self.shutdown_requested:
+                url = await self.wait_unless_shutdown(endpoint_queue.get())
+                if url is None:
+                    if not self.shutdown_requested:
+                        # Leave the end marker for the other workers
+                        endpoint_queue.put_nowait(None)
+                    return None
+
+                # Skip endpoints finished by an earlier run
+                if self.frontier.admit([url]):
+                    self.frontier.mark_in_flight([url])
+                    return url
+            return None
+
+        return await self.run_page_workers(next_url, concurrency)
+
+    async def keep_leases(self, work_queue):
+        # Renew leases while pages are still loading so no other node
+        # picks them up; a dead worker simply stops renewing
+        while True:
+            await asyncio.sleep(work_queue.lease_seconds / 3)
+            if self.leased_urls:
+                await work_queue.extend(list(self.leased_urls))
 
-                    results = await asyncio.gather(*tasks, return_exceptions=True)
+    @handle_exceptions
+    async def process_work_queue(self, work_queue, concurrency=3):
+        # URLs are leased a batch at a time into a local buffer; the
+        # heartbeat renews them while they wait there
+        lease_lock = asyncio.Lock()
+        buffered = deque()
+        drained = False
+
+        async def next_url():
+            nonlocal drained
+            while not self.shutdown_requested:
+                if buffered:
+                    return buffered.popleft()
+                async with lease_lock:
+                    if buffered:
+                        # Another worker refilled the buffer meanwhile
+                        continue
+                    if drained:
+                        return None
+                    leased = await work_queue.lease(max(1, self.concurrency.limit))
+                    if leased:
+                        self.leased_urls.update(leased)
+                        buffered.extend(leased)
+                        continue
+                    if await work_queue.is_drained():
+                        drained = True
+                        return None
+                # Our own retries count as in flight, so hand them out
+                # here or the queue would never drain
+                retry = self.retry_queue.pop_due()
+                if retry is not None:
+                    return retry
+                # Other workers still hold leases that may expire
+                poll = QUEUE_POLL_INTERVAL
+                if self.retry_queue:
+                    poll = min(poll, self.retry_queue.seconds_until_next())
+                await self.wait_unless_shutdown(asyncio.sleep(poll))
+            return None
+
+        heartbeat = asyncio.create_task(self.keep_leases(work_queue))
+        try:
+            return await self.run_page_workers(next_url, concurrency, work_queue)
+        finally:
+            heartbeat.cancel()
+            # Leases of URLs never started run out and go to other workers
+            self.leased_urls.difference_update(buffered)
+            await work_queue.close()
 
-                    for page in pages:
-                        await page.close()
+    @handle_exceptions
+    async def seed_work_queue(self, work_queue):
+        self.requeue_finished()
+        endpoints = await self.load_products_endpoints_csv_files()
+        if endpoints:
+            added = await work_queue.add(endpoints)
+            custom_logger(f"Queued {added} new product endpoints.", log_type="info")
 
-                    for idx, result in enumerate(results):
-                        url = batch_urls[idx]
-                        if isinstance(result, dict):
-                            self.save_product_data(result)
-                            self.success_count += 1
-                        else:
-                            self.retries.append(url)
+    @handle_exceptions
+    async def serve_work_queue(self, host, port, token=None):
+        await self.seed_work_queue(self.work_queue)
+        server = await WorkQueueServer(self.frontier, host, port, token=token).start()
+        try:
+            counts = await server.serve_until_drained()
+        finally:
+            await server.close()
+        custom_logger(f"Work queue drained: {counts}", log_type="info")
+        return counts["done"] > 0
 
-                # Process in batches
-                batch_size = concurrency
-                for i in range(0, len(endpoints), batch_size):
-                    current_batch = endpoints[i : i + batch_size]
-                    await process_batch(current_batch)
+    @handle_exceptions
+    async def process_sharded_endpoints(self, endpoints, workers, concurrency=3):
+        shards = [shard for shard in shard_endpoints(endpoints, workers) if shard]
+        shard_dirs = [self.data_dir / "shards" / f"shard-{i}" for i in range(len(shards))]
+        custom_logger(
+            f"Processing {len(endpoints)} endpoints in {len(shards)} shard processes.",
+            log_type="info",
+        )
 
-            finally:
-                await context.close()
-                await browser.close()
+        loop = asyncio.get_running_loop()
+        # Ctrl-C reaches every shard process; they drain themselves, so the
+        # parent only has to keep waiting for their results
+        try:
+            loop.add_signal_handler(
+                signal.SIGINT,
+                lambda: custom_logger("Waiting for shards to drain...", log_type="warn"),
+            )
+        except (NotImplementedError, RuntimeError):
+            pass
+
+        # Every run option reaches the shards. The frontier and HTTP cache
+        # are per shard; the archive and the dead-letter log take concurrent
+        # appends and are shared explicitly.
+        app_options = {
+            "http_first": self.http_first,
+            "http_cache": self.use_http_cache,
+            "archive": self.use_archive,
+            "archive_dir": str(self.archive_dir),
+            "dead_letter_path": str(self.dead_letter_path),
+            "max_concurrency": self.concurrency.max_limit,
+            "parser_engine": self.parser_engine,
+            "parse_workers": self.parse_pool.workers,
+            "structured_data": self.structured_data,
+            "block_resources": self.block_resources,
+        }
+        # The shards share the per-host request budget of this process
+        rate_limit = rate_limiter.settings(share=len(shards))
+        mp_context = multiprocessing.get_context("spawn")
+        try:
+            with ProcessPoolExecutor(
+                max_workers=len(shards), mp_context=mp_context
+            ) as pool:
+                results = await asyncio.gather(
+                    *[
+                        loop.run_in_executor(
+                            pool,
+                            run_product_shard,
+                            i,
+                            shard,
+                            str(shard_dirs[i]),
+                            concurrency,
+                            app_options,
+                            rate_limit,
+                        )
+                        for i, shard in enumerate(shards)
+                    ],
+                    return_exceptions=True,
+                )
+        finally:
+            self.remove_shutdown_handler()
+
+        for i, result in enumerate(results):
+            # What the shard finished, even if it crashed later, is recorded
+            # in the run's frontier
+            states = self.merge_shard_frontier(shard_dirs[i], shards[i])
+            if isinstance(result, dict):
+                self.success_count += result["success_count"]
+                self.retries.extend(result["retries"])
+                for key, value in result["fetch_stats"].items():
+                    self.fetch_stats[key] += value
+                metrics.merge(result["metrics"])
+            else:
+                custom_logger(f"Shard {i} failed: {result}", log_type="error")
+                self.retries.extend(
+                    url for url in shards[i] if states.get(url) != DONE
+                )
+
+        merge_shard_outputs(
+            [shard_dir / PRODUCTS_FILE for shard_dir in shard_dirs],
+            self.data_dir / PRODUCTS_FILE,
+            self.unique_products,
+        )
 
-        custom_logger(f"Successfully processed {self.success_count} endpoints.")
+        self.log_run_summary()
         return self.success_count > 0
 
+    def merge_shard_frontier(self, shard_dir, urls):
+        shard_frontier_path = Path(shard_dir) / FRONTIER_FILE
+        if not shard_frontier_path.exists():
+            return {}
+        shard_frontier = Frontier(shard_frontier_path)
+        try:
+            states = shard_frontier.states(urls)
+        finally:
+            shard_frontier.close()
+        self.frontier.set_states(
+            {url: state for url, state in states.items() if state in (DONE, FAILED)}
+        )
+        return states
+
+    def log_run_summary(self):
+        custom_logger(f"Successfully processed {self.success_count} endpoints.")
+        custom_logger(
+            f"Pages fetched over HTTP: {self.fetch_stats['http']}, "
+            f"unchanged (304): {self.fetch_stats['not_modified']}, "
+            f"with the browser: {self.fetch_stats['browser']}.",
+            log_type="info",
+        )
+        if self.retries:
+            custom_logger(
+                f"{len(self.retries)} endpoints failed for good, "
+                f"see {self.dead_letters.path}.",
+                log_type="warn",
+            )
+        PRODUCT_PLAN.report()
+        if self.structured_data:
+            FALLBACK_PLAN.report()
+
     # ===================================================
 
     @handle_exceptions
@@ -153,50 +706,59 @@ class ProductProcessorApp:
             if isinstance(data, list):
                 return [re.sub(r"\s+", " ", item).strip() for item in data]
             elif isinstance(data, dict):
-                return {k: re.sub(r"\s+", " ", v).strip() for k, v in data.items()}
+                return {k: clean_data(v) for k, v in data.items()}
             else:
                 return re.sub(r"\s+", " ", data).strip()
 
-        # Clean the data
-        product_title = clean_data(product_data.get("product_title", "null"))
-        review_count = clean_data(product_data.get("review_count", "null"))
-        product_text_title = clean_data(product_data.get("description_title", "null"))
-        main_description_text = clean_data(product_data.get("description_text", "null"))
-        important_note_text = clean_data(product_data.get("product_note", "null"))
-        product_url = clean_data(product_data.get("product_url", "null"))
-        product_note = clean_data(product_data.get("badges_list", "null"))
-        key_features = clean_data(product_data.get("key_features", "null"))
-        price = clean_data(product_data.get("price", "null"))
-        disclaimer = clean_data(product_data.get("disclaimer", "null"))
-        shipping = clean_data(product_data.get("shipping", "null"))
-        reviews_url = clean_data(product_data.get("reviews_url", "null"))
-        prediction = clean_data(product_data.get("shipping_prediction", "null"))
-        rank_details = clean_data(product_data.get("rank_details", {}))
-
-        product_data_cleaned = {
-            "product_title": product_title,
-            "review_count": review_count,
-            "description_title": product_text_title,
-            "description_text": main_description_text,
-            "good_to_know": important_note_text,
-            "budges": product_note,
-            "features": key_features,
-            "price": price,
-            "product_url": product_url,
-            "disclaimer": disclaimer,
-            "shipping": shipping,
-            "prediction": prediction,
-            "ranking": rank_details,
-            "reviews_url": reviews_url,
-        }
+        if self.structured_data:
+            # Structured records are flat and already use the output keys
+            product_data_cleaned = {k: clean_data(v) for k, v in product_data.items()}
+        else:
+            # Clean the data
+            product_title = clean_data(product_data.get("product_title", "null"))
+            review_count = clean_data(product_data.get("review_count", "null"))
+            product_text_title = clean_data(
+                product_data.get("description_title", "null")
+            )
+            main_description_text = clean_data(
+                product_data.get("description_text", "null")
+            )
+            important_note_text = clean_data(product_data.get("product_note", "null"))
+            product_url = clean_data(product_data.get("product_url", "null"))
+            product_note = clean_data(product_data.get("badges_list", "null"))
+            key_features = clean_data(product_data.get("key_features", "null"))
+            price = clean_data(product_data.get("price", "null"))
+            disclaimer = clean_data(product_data.get("disclaimer", "null"))
+            shipping = clean_data(product_data.get("shipping", "null"))
+            reviews_url = clean_data(product_data.get("reviews_url", "null"))
+            prediction = clean_data(product_data.get("shipping_prediction", "null"))
+            rank_details = clean_data(product_data.get("rank_details", {}))
+
+            product_data_cleaned = {
+                "product_title": product_title,
+                "review_count": review_count,
+                "description_title": product_text_title,
+                "description_text": main_description_text,
+                "good_to_know": important_note_text,
+                "budges": product_note,
+                "features": key_features,
+                "price": price,
+                "product_url": product_url,
+                "disclaimer": disclaimer,
+                "shipping": shipping,
+                "prediction": prediction,
+                "ranking": rank_details,
+                "reviews_url": reviews_url,
+            }
 
         # Convert to JSON string to ensure uniqueness
         product_data_json = json.dumps(product_data_cleaned, sort_keys=True)
 
         if product_data_json not in self.unique_products:
             self.unique_products.add(product_data_json)
-            json_file_path = self.data_dir / "products_data.txt"
+            json_file_path = self.data_dir / self.products_file
 
+            self.data_dir.mkdir(parents=True, exist_ok=True)
             with json_file_path.open(mode="a", encoding="utf-8") as f:
                 f.write(product_data_json + "\n")
             emulator(is_in_progress=False)
@@ -208,17 +770,74 @@ class ProductProcessorApp:
             # ===================================================
 
     @handle_exceptions
-    async def get_prod_data(self, can_process=True):
+    def reparse_archive(self, archive=None):
+        # Rebuild the products file from archived HTML, without the network
+        if archive is None:
+            archive = self.archive or HtmlArchive(self.archive_dir)
+        target = self.data_dir / PRODUCTS_FILE
+        rebuilt = self.data_dir / f"{PRODUCTS_FILE}.reparse"
+        rebuilt.unlink(missing_ok=True)
+
+        self.products_file = rebuilt.name
+        self.unique_products = set()
+        parsed, failed = 0, []
+        try:
+            for url, content in archive.iter_latest():
+                product_data = extract_product_data(
+                    content, self.parser_engine, self.structured_data
+                )
+                if product_data:
+                    self.save_product_data(product_data)
+                    parsed += 1
+                else:
+                    failed.append(url)
+        finally:
+            self.products_file = PRODUCTS_FILE
+
+        if not parsed:
+            rebuilt.unlink(missing_ok=True)
+            custom_logger("Reparse found no parsable pages in the archive.", log_type="warn")
+            return False
+
+        os.replace(rebuilt, target)
+        custom_logger(
+            f"Reparsed {parsed} archived pages into {target.name} "
+            f"({len(failed)} failed to parse).",
+            log_type="info",
+        )
+        for url in failed[:20]:
+            custom_logger(f"Reparse failed for {url}", log_type="warn")
+        return True
+
+    @handle_exceptions
+    async def get_prod_data(self, can_process=True, workers=1):
         if not can_process:
             custom_logger("Product processing is disabled.", log_type="info")
             return False
 
         endpoints = await self.load_products_endpoints_csv_files()
+        if endpoints:
+            self.frontier.add(endpoints)
+        self.requeue_finished()
+
+        # Pick up after an interrupted run: in-flight pages go back to pending
+        # and earlier failures are restored into self.retries
+        self.frontier.resume()
+        self.retries = self.frontier.urls_in_state(FAILED)
+        endpoints = self.frontier.pending()
         if not endpoints:
             custom_logger("No product endpoints to process.", log_type="info")
             return False
 
-        await self.process_product_endpoints(endpoints)
+        counts = self.frontier.counts()
+        custom_logger(
+            f"Frontier: {counts['pending']} pending, {counts['done']} done, "
+            f"{counts['failed']} failed.",
+            log_type="info",
+        )
+        if workers > 1:
+            return await self.process_sharded_endpoints(endpoints, workers)
+        return await self.process_product_endpoints(endpoints)
 
         # ===================================================
         # ===================================================
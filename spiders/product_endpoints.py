@@ -1,11 +1,9 @@
+import time
+import json
 import asyncio
 from pathlib import Path
 from bs4 import BeautifulSoup
-from utils.utilities.utilities import (
-    randomize_timeout,
-    random_small_timeout,
-    click_consent_button,
-)
+from utils.utilities.utilities import randomize_timeout, ensure_consent
 from urllib.parse import urljoin, urlparse
 from playwright.async_api import (
     async_playwright,
@@ -14,6 +12,28 @@ from playwright.async_api import (
 )
 from middlewares.errors.error_handler import handle_exceptions
 from middlewares.logger.logger import custom_logger
+from middlewares.frontier.frontier import DONE
+from middlewares.concurrency.aimd import AimdController
+from middlewares.rate_limit.rate_limiter import rate_limiter
+from middlewares.retry.retry import (
+    Failure,
+    RetryPolicy,
+    DeadLetterLog,
+    TIMEOUT,
+    NAVIGATION_ERROR,
+    MISSING_CONTAINER,
+)
+from utils.browser.browser_pool import use_browser_pool
+from utils.config.site import SITE_BASE_URL
+from utils.fetchers.http_fetcher import HttpFetcher, BOT_CHALLENGE_STATUSES
+from utils.parsers.parse_pool import ParsePool
+from spiders.pagination import (
+    detect_pagination,
+    fetch_listing_pages,
+    LISTING_ITEM_PATTERN,
+)
+from spiders.listing_responses import ListingResponseCollector
+from middlewares.metrics.metrics import metrics
 import csv
 
 
@@ -50,7 +70,7 @@ def parse_endpoints(page_content, endpoints_set):
     for link in article_links:
         url = link.get("href")
         if url:
-            endpoints_set.add(urljoin("https://www.thomann.de/gb/", url))
+            endpoints_set.add(urljoin(ENDPOINT_BASE_URL, url))
 
 
 # *******************************************
@@ -61,59 +81,142 @@ def extract_endpoint_name(url):
     return path_parts[-1] if path_parts else "unknown"
 
 
+# *******************************************
+class CsvEndpointWriter:
+    # Appends a category's endpoints to its CSV file. Existing rows are read
+    # once; later saves write only endpoints not in the file yet. The lock
+    # keeps concurrent saves to the same file from interleaving.
+    def __init__(self, csv_file_path):
+        self.csv_file_path = Path(csv_file_path)
+        self.lock = asyncio.Lock()
+        self.written = None
+
+    def _read_existing(self):
+        if not self.csv_file_path.exists():
+            return set()
+        with self.csv_file_path.open(mode="r", newline="", encoding="utf-8") as file:
+            return {row[0] for row in csv.reader(file) if row and row[0] != "endpoint"}
+
+    def _append(self, new_endpoints):
+        self.csv_file_path.parent.mkdir(parents=True, exist_ok=True)
+        is_new_file = (
+            not self.csv_file_path.exists() or self.csv_file_path.stat().st_size == 0
+        )
+        with self.csv_file_path.open(mode="a", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            if is_new_file:  # Write header if file is new
+                writer.writerow(["endpoint"])
+            for endpoint in new_endpoints:
+                writer.writerow([endpoint])
+
+    async def save(self, endpoints):
+        async with self.lock:
+            if self.written is None:
+                self.written = await asyncio.to_thread(self._read_existing)
+            new_endpoints = sorted(endpoints - self.written)
+            if not new_endpoints:
+                return 0
+            await asyncio.to_thread(self._append, new_endpoints)
+            self.written.update(new_endpoints)
+        custom_logger(
+            f"{len(new_endpoints)} new endpoints saved to {self.csv_file_path}",
+            log_type="info",
+        )
+        return len(new_endpoints)
+
+
 # *******************************************
 @handle_exceptions
-def save_endpoints_to_csv(endpoints, output_dir, file_name):
+def save_listing_items(items, output_dir, file_name):
+    # Extra fields the grid returned for each product (name, price, ...)
     output_dir.mkdir(parents=True, exist_ok=True)
+    items_file_path = output_dir / f"{file_name}_items.jsonl"
+    with items_file_path.open(mode="w", encoding="utf-8") as file:
+        for url in sorted(items):
+            file.write(json.dumps({"url": url, **items[url]}, sort_keys=True) + "\n")
+    custom_logger(
+        f"Listing fields for {len(items)} products saved to {items_file_path}",
+        log_type="info",
+    )
+
+
+# *******************************************
+@handle_exceptions
+def load_saved_endpoints(output_dir, file_name):
     csv_file_path = output_dir / f"{file_name}.csv"
+    if not csv_file_path.exists():
+        return set()
 
-    existing_endpoints = set()
-    if csv_file_path.exists():
-        with csv_file_path.open(mode="r", newline="", encoding="utf-8") as file:
-            reader = csv.reader(file)
-            existing_endpoints = {row[0] for row in reader}
+    with csv_file_path.open(mode="r", newline="", encoding="utf-8") as file:
+        reader = csv.DictReader(file)
+        return {row["endpoint"] for row in reader if row.get("endpoint")}
 
-    new_endpoints = endpoints - existing_endpoints
-    if not new_endpoints:
-        custom_logger("No new endpoints to save.", log_type="info")
-        return
 
-    with csv_file_path.open(mode="a", newline="", encoding="utf-8") as file:
-        writer = csv.writer(file)
-        if not existing_endpoints:  # Write header if file is new
-            writer.writerow(["endpoint"])
-        for endpoint in new_endpoints:
-            writer.writerow([endpoint])
+# *******************************************
+async def publish_endpoints(endpoint_queue, endpoints, published):
+    # Hand newly discovered endpoints to the product stage (streaming mode).
+    # The queue is bounded, so this also applies back-pressure to the crawl.
+    if endpoint_queue is None:
+        return
 
-    custom_logger(f"New endpoints saved to {csv_file_path}", log_type="info")
+    for endpoint in sorted(endpoints - published):
+        published.add(endpoint)
+        await endpoint_queue.put(endpoint)
+
+
+ENDPOINT_BASE_URL = SITE_BASE_URL
+ITEM_SELECTOR = "div.js-content-wrapper div.js-articles a.js-item"
+GRID_SELECTOR = "div.js-content-wrapper div div.js-articles"
+LOAD_MORE_SELECTOR = "button.fx-product-grid__button.js-button-more"
+LOAD_MORE_TIMEOUT = 15000
+
+# Items are appended to the grid, so everything from index `cursor` on is
+# new. Only those hrefs cross the page boundary; the DOM is not serialised.
+NEW_ITEM_HREFS_SCRIPT = """([selector, cursor]) => {
+    const items = document.querySelectorAll(selector);
+    const hrefs = [];
+    for (let i = cursor; i < items.length; i++) {
+        const href = items[i].getAttribute('href');
+        if (href) hrefs.push(href);
+    }
+    return {cursor: items.length, hrefs: hrefs};
+}"""
+ITEM_COUNT_SCRIPT = "selector => document.querySelectorAll(selector).length"
+GRID_GREW_SCRIPT = (
+    "([selector, count]) => document.querySelectorAll(selector).length > count"
+)
 
 
 # *******************************************
 @handle_exceptions
-async def click_button_with_retry(page, button_selector):
+async def click_button_with_retry(
+    page, button_selector, item_selector=ITEM_SELECTOR, item_count=None
+):
     try:
         button = await page.query_selector(button_selector)
         if button:
-            await page.evaluate(
-                """button => {
-                    button.scrollIntoView({
-                        behavior: 'smooth',
-                        block: 'center',
-                        inline: 'center'
-                    });
-                }""",
-                button,
-            )
-            timeout = random_small_timeout(700, 1000)
-            await page.wait_for_timeout(timeout)
+            if item_count is None:
+                item_count = await page.evaluate(ITEM_COUNT_SCRIPT, item_selector)
+            await button.scroll_into_view_if_needed()
 
+            await rate_limiter.wait(page.url)
             try:
                 await button.click()
             except PlaywrightError as e:
                 custom_logger(f"PlaywrightError: {e}", log_type="warn")
                 return False
 
-            await asyncio.sleep(2)
+            # Continue as soon as the grid has grown instead of sleeping
+            try:
+                await page.wait_for_function(
+                    GRID_GREW_SCRIPT,
+                    arg=[item_selector, item_count],
+                    timeout=LOAD_MORE_TIMEOUT,
+                )
+            except PlaywrightTimeoutError:
+                custom_logger(
+                    "No new items appeared after clicking 'load more'.", log_type="info"
+                )
             return True
         else:
             custom_logger("No 'load more' button found.", log_type="info")
@@ -124,143 +227,401 @@ async def click_button_with_retry(page, button_selector):
 
 
 # *******************************************
-@handle_exceptions
-async def download_category_endpoints(base_urls, output_dir, max_retries=2):
-    async with async_playwright() as p:
+def parse_listing_page(content):
+    endpoints = set()
+    parse_endpoints(content, endpoints)
+    return endpoints
+
+
+# *******************************************
+async def fetch_listing_page(url, http_fetcher, context, controller):
+    # Listing pages are server-rendered; the browser is only used when
+    # plain HTTP does not return the product grid
+    await rate_limiter.wait(url)
+    result = await http_fetcher.fetch(url, required_pattern=LISTING_ITEM_PATTERN)
+    if result.reason in ("timeout", "bot challenge"):
+        controller.record_throttle(result.reason)
+    if result.content is not None:
+        return result.content
+
+    page = await context.new_page()
+    try:
+        await rate_limiter.wait(url)
+        await page.goto(url, timeout=randomize_timeout(60000, 80000))
+        await page.wait_for_selector(
+            GRID_SELECTOR, state="visible", timeout=randomize_timeout(30000, 50000)
+        )
+        return await page.content()
+    except PlaywrightError as e:
+        custom_logger(f"Listing page {url} failed: {e}", log_type="warn")
+        return None
+    finally:
+        await page.close()
+
+
+# *******************************************
+async def read_new_endpoints(page, cursor):
+    result = await page.evaluate(NEW_ITEM_HREFS_SCRIPT, [ITEM_SELECTOR, cursor])
+    found = {urljoin(ENDPOINT_BASE_URL, href) for href in result["hrefs"]}
+    return result["cursor"], found
+
+
+# *******************************************
+async def click_through_listing(page, endpoints, on_new_endpoints, collector=None):
+    # Each click costs time in proportion to the items it adds. Products
+    # come from the grid's own XHR responses when the collector saw them;
+    # otherwise only the hrefs past the cursor are read back from the page.
+    cursor, found = await read_new_endpoints(page, 0)
+    if collector:
+        await collector.drain()
+        found |= set(collector.take_new())
+    if found - endpoints:
+        await on_new_endpoints(found - endpoints)
+
+    while True:
+        success = await click_button_with_retry(
+            page, LOAD_MORE_SELECTOR, item_count=cursor
+        )
+        if not success:
+            break
+
+        found = set()
+        if collector:
+            await collector.drain()
+            found = set(collector.take_new())
+        item_count = await page.evaluate(ITEM_COUNT_SCRIPT, ITEM_SELECTOR)
+        if len(found) < item_count - cursor:
+            # No grid response seen, or it did not cover every new item
+            cursor, dom_found = await read_new_endpoints(page, cursor)
+            metrics.incr("listing.items_from_dom", len(dom_found))
+            found |= dom_found
+        else:
+            metrics.incr("listing.items_from_network", len(found))
+            cursor = item_count
+        if not found:
+            custom_logger(
+                "No new elements added after button click.",
+                log_type="info",
+            )
+            break
+
+        new_endpoints = found - endpoints  # Exclude already collected endpoints
+        if not new_endpoints:
+            custom_logger(
+                "No new endpoints found after button click.",
+                log_type="info",
+            )
+            break
+        await on_new_endpoints(new_endpoints)
+
+
+# *******************************************
+class CategoryCrawler:
+    # Crawls categories concurrently, each in its own context on the shared
+    # browser. Listing loads share one AIMD controller and the rate limiter;
+    # each category's CSV goes through its own CsvEndpointWriter.
+    def __init__(
+        self,
+        pool,
+        output_dir,
+        fetcher,
+        controller,
+        max_retries=2,
+        endpoint_queue=None,
+        frontier=None,
+        parse_pool=None,
+        dead_letters=None,
+    ):
+        self.pool = pool
+        self.output_dir = output_dir
+        self.fetcher = fetcher
+        self.controller = controller
+        self.max_retries = max_retries
+        self.endpoint_queue = endpoint_queue
+        self.frontier = frontier
+        # Without a pool, listing pages are parsed in the event loop
+        self.parse_pool = parse_pool if parse_pool else ParsePool(workers=0)
+        self.retry_policy = RetryPolicy(
+            max_attempts=max_retries, base_delay=5.0, max_delay=60.0
+        )
+        self.dead_letters = dead_letters if dead_letters else DeadLetterLog()
+        self.published = set()
+        self.writers = {}
+        self.progress = {}
+
+    def writer_for(self, endpoint_name):
+        csv_file_path = self.output_dir / f"{endpoint_name}.csv"
+        if csv_file_path not in self.writers:
+            self.writers[csv_file_path] = CsvEndpointWriter(csv_file_path)
+        return self.writers[csv_file_path]
+
+    def report_progress(self, base_url, state, endpoints=None):
+        entry = self.progress.setdefault(base_url, {"state": None, "endpoints": 0})
+        entry["state"] = state
+        if endpoints is not None:
+            entry["endpoints"] = endpoints
+
+        finished = sum(
+            1 for item in self.progress.values() if item["state"] in ("done", "failed")
+        )
+        metrics.set_gauge("listing.categories_finished", finished)
+        custom_logger(
+            f"[{finished}/{len(self.progress)} categories] "
+            f"{extract_endpoint_name(base_url)}: {state}, "
+            f"{entry['endpoints']} endpoints",
+            log_type="info",
+        )
+
+    async def crawl(self, base_urls, concurrency=3, category_states=None):
+        category_states = category_states if category_states else {}
         for base_url in base_urls:
-            endpoint_name = extract_endpoint_name(base_url)
-            endpoints = set()
-            attempts = 0
-
-            while attempts < max_retries:
-                attempts += 1
-                try:
-                    custom_logger(
-                        f"> Extracting endpoints for {base_url} (Attempt {attempts})...",
-                        log_type="info",
-                    )
-                    browser = await p.chromium.launch(
-                        headless=True,
-                        args=[
-                            "--disable-web-security",
-                            "--disable-features=IsolateOrigins," "site-per-process",
-                        ],
-                    )
-                    page = await browser.new_page()
-                    # Log page load event
-                    page.on(
-                        "load",
-                        lambda page: custom_logger(
-                            f"Page loaded: {page.url}", log_type="info"
-                        ),
-                    )
-
-                    # Increase timeout for page load
-                    await page.goto(base_url, timeout=randomize_timeout(60000, 80000))
-
-                    # ================
-                    # ================
-                    # Look for consent button
-                    await click_consent_button(page)
-                    # ================
-                    # ================
-
-                    try:
-                        # Increase timeout for selector
-                        await page.wait_for_selector(
-                            "div.js-content-wrapper div div.js-articles",
-                            state="visible",
-                            timeout=randomize_timeout(30000, 50000),
-                        )
-                    except PlaywrightTimeoutError:
-                        custom_logger(
-                            f"TimeoutError: .js-content-wrapper not visible (Attempt {attempts}).",
-                            log_type="error",
-                        )
-                        continue
-
-                    # Parse initial page load
-                    parse_endpoints(await page.content(), endpoints)
-                    custom_logger(
-                        f"Initial endpoints collected: {len(endpoints)}",
-                        log_type="info",
-                    )
-                    save_endpoints_to_csv(
-                        endpoints, output_dir, endpoint_name
-                    )  # Save after initial collection
-
-                    button_selector = "button.fx-product-grid__button.js-button-more"
-                    initial_element_count = len(
-                        await page.query_selector_all(
-                            "div.js-content-wrapper div.js-articles a.js-item"
-                        )
-                    )
-
-                    while True:
-                        success = await click_button_with_retry(page, button_selector)
-                        if not success:
-                            break
-
-                        current_element_count = len(
-                            await page.query_selector_all(
-                                "div.js-content-wrapper div.js-articles a.js-item"
-                            )
-                        )
-                        if current_element_count > initial_element_count:
-                            new_endpoints = set()
-                            parse_endpoints(await page.content(), new_endpoints)
-                            new_endpoints -= (
-                                endpoints  # Exclude already collected endpoints
-                            )
-                            if new_endpoints:
-                                endpoints.update(new_endpoints)
-                                save_endpoints_to_csv(
-                                    endpoints, output_dir, endpoint_name
-                                )
-                                custom_logger(
-                                    f"Additional endpoints collected: {len(new_endpoints)}",
-                                    log_type="info",
-                                )
-                            else:
-                                custom_logger(
-                                    "No new endpoints found after button click.",
-                                    log_type="info",
-                                )
-                                break
-                            initial_element_count = (
-                                current_element_count  # Update initial count
-                            )
-                        else:
-                            custom_logger(
-                                "No new elements added after button click.",
-                                log_type="info",
-                            )
-                            break
-
-                except PlaywrightTimeoutError as e:
-                    custom_logger(
-                        f"TimeoutError: {e} (Attempt {attempts})", log_type="error"
-                    )
-                    continue
-                except Exception as e:
-                    custom_logger(
-                        f"PlaywrightError: {e} (Attempt {attempts})", log_type="error"
-                    )
-                    continue
-                finally:
-                    if "browser" in locals() and browser:
-                        await browser.close()
-
-            # Final save to ensure all endpoints are written
-            if endpoints:
-                save_endpoints_to_csv(endpoints, output_dir, endpoint_name)
-            else:
-                custom_logger(f"No endpoints found for {base_url}", log_type="info")
+            self.progress[base_url] = {"state": "queued", "endpoints": 0}
+
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def crawl_one(base_url):
+            async with semaphore:
+                if category_states.get(base_url) == DONE:
+                    await self.skip_category(base_url)
+                else:
+                    await self.crawl_category(base_url)
+
+        await asyncio.gather(*[crawl_one(base_url) for base_url in base_urls])
+
+    async def skip_category(self, base_url):
+        endpoint_name = extract_endpoint_name(base_url)
+        custom_logger(
+            f"> Skipping {base_url}, collected by an earlier run.",
+            log_type="info",
+        )
+        saved = load_saved_endpoints(self.output_dir, endpoint_name) or set()
+        await publish_endpoints(self.endpoint_queue, saved, self.published)
+        self.report_progress(base_url, "done", len(saved))
+
+    async def crawl_category(self, base_url):
+        endpoint_name = extract_endpoint_name(base_url)
+        writer = self.writer_for(endpoint_name)
+        endpoints = set()
+        attempts = 0
+        failure = None
+
+        if self.frontier:
+            self.frontier.mark_in_flight([base_url])
+
+        async def on_new_endpoints(new_endpoints):
+            endpoints.update(new_endpoints)
+            await writer.save(endpoints)
+            await publish_endpoints(self.endpoint_queue, new_endpoints, self.published)
+            self.report_progress(base_url, "collecting", len(endpoints))
+
+        while attempts < self.max_retries:
+            if failure is not None:
+                # Back off before trying a failed category again
+                await asyncio.sleep(self.retry_policy.delay(attempts))
+            attempts += 1
+            self.report_progress(base_url, f"attempt {attempts}")
+            failure = await self.load_category(
+                base_url, endpoint_name, endpoints, on_new_endpoints, attempts
+            )
+            if failure is None:
+                break
+
+        # Final save to ensure all endpoints are written
+        if endpoints:
+            await writer.save(endpoints)
+            if self.frontier:
+                self.frontier.mark_done(base_url)
+            self.report_progress(base_url, "done", len(endpoints))
+        else:
+            custom_logger(f"No endpoints found for {base_url}", log_type="info")
+            reason = failure.reason if failure is not None else "no_endpoints"
+            if self.frontier:
+                self.frontier.mark_failed(base_url, reason)
+            self.dead_letters.write(
+                base_url,
+                reason,
+                attempts,
+                failure.detail if failure is not None else None,
+                kind="category",
+            )
+            self.report_progress(base_url, "failed", 0)
+
+    async def load_category(
+        self, base_url, endpoint_name, endpoints, on_new_endpoints, attempts
+    ):
+        # One attempt at a category; returns a Failure or None when done
+        controller = self.controller
+        context = None
+        collector = ListingResponseCollector(base_url)
+        await controller.acquire()
+        holding_slot = True
+        started = time.monotonic()
+        try:
+            custom_logger(
+                f"> Extracting endpoints for {base_url} (Attempt {attempts})...",
+                log_type="info",
+            )
+            context = await self.pool.new_context()
+            page = await context.new_page()
+            collector.attach(page)
+            # Log page load event
+            page.on(
+                "load",
+                lambda page: custom_logger(f"Page loaded: {page.url}", log_type="info"),
+            )
+
+            # Increase timeout for page load
+            await rate_limiter.wait(base_url)
+            response = await page.goto(
+                base_url, timeout=randomize_timeout(60000, 80000)
+            )
+            if response and response.status in BOT_CHALLENGE_STATUSES:
+                controller.record_throttle(f"status {response.status}")
+
+            # ================
+            # ================
+            # Look for consent button
+            await ensure_consent(page)
+            # ================
+            # ================
+
+            try:
+                # Increase timeout for selector
+                await page.wait_for_selector(
+                    GRID_SELECTOR,
+                    state="visible",
+                    timeout=randomize_timeout(30000, 50000),
+                )
+            except PlaywrightTimeoutError:
+                controller.record_throttle("timeout")
+                custom_logger(
+                    f"TimeoutError: .js-content-wrapper not visible (Attempt {attempts}).",
+                    log_type="error",
+                )
+                return Failure(MISSING_CONTAINER, "product grid not visible")
+            controller.record(time.monotonic() - started)
+            # The remaining listing pages take their own slots
+            controller.release()
+            holding_slot = False
+
+            # Parse initial page load
+            content = await page.content()
+            initial_endpoints = await self.parse_pool.run(parse_listing_page, content)
+            custom_logger(
+                f"Initial endpoints collected: {len(initial_endpoints)}",
+                log_type="info",
+            )
+            if initial_endpoints - endpoints:
+                await on_new_endpoints(initial_endpoints - endpoints)
+
+            async def fetch_page(url):
+                return await fetch_listing_page(url, self.fetcher, context, controller)
+
+            async def parse_page(content):
+                return await self.parse_pool.run(parse_listing_page, content)
+
+            # Fetch the remaining listing pages by URL when the grid
+            # exposes its page parameter; click "load more" otherwise
+            paginated = None
+            pagination = await self.parse_pool.run(detect_pagination, content, page.url)
+            if pagination:
+                paginated = await fetch_listing_pages(
+                    pagination,
+                    page.url,
+                    fetch_page,
+                    parse_page,
+                    on_new_endpoints,
+                    endpoints,
+                    controller,
+                )
+            if paginated is None:
+                await click_through_listing(
+                    page, endpoints, on_new_endpoints, collector
+                )
+
+            await collector.drain()
+            if collector.items:
+                save_listing_items(collector.items, self.output_dir, endpoint_name)
+            return None
+
+        except PlaywrightTimeoutError as e:
+            controller.record_throttle("timeout")
+            custom_logger(f"TimeoutError: {e} (Attempt {attempts})", log_type="error")
+            return Failure(TIMEOUT, str(e))
+        except Exception as e:
+            controller.record(time.monotonic() - started, ok=False)
+            custom_logger(
+                f"PlaywrightError: {e} (Attempt {attempts})", log_type="error"
+            )
+            return Failure(NAVIGATION_ERROR, str(e))
+        finally:
+            if holding_slot:
+                controller.release()
+            if context:
+                await self.pool.release(context)
 
 
 # *******************************************
 @handle_exceptions
-async def collect_product_endpoints(can_run=False) -> bool:
+async def download_category_endpoints(
+    base_urls,
+    output_dir,
+    max_retries=2,
+    endpoint_queue=None,
+    frontier=None,
+    browser_pool=None,
+    controller=None,
+    http_fetcher=None,
+    category_concurrency=3,
+    parse_pool=None,
+    recrawl_after=None,
+    dead_letters=None,
+):
+    # Listing loads report their latency and throttling signals here, so
+    # the listing stage is paced by the same rules as the product stage
+    controller = controller if controller else AimdController("listing", initial=4)
+    fetcher = http_fetcher if http_fetcher else HttpFetcher()
+    category_states = {}
+    if frontier:
+        frontier.add(base_urls, kind="category")
+        if recrawl_after is not None:
+            # Listings gain new products, so finished categories are revisited
+            frontier.requeue_older_than(recrawl_after * 3600, kind="category")
+        frontier.resume(kind="category")
+        category_states = frontier.states(base_urls)
+
+    try:
+        async with use_browser_pool(browser_pool, async_playwright) as pool:
+            crawler = CategoryCrawler(
+                pool,
+                output_dir,
+                fetcher,
+                controller,
+                max_retries=max_retries,
+                endpoint_queue=endpoint_queue,
+                frontier=frontier,
+                parse_pool=parse_pool,
+                dead_letters=dead_letters,
+            )
+            await crawler.crawl(base_urls, category_concurrency, category_states)
+    finally:
+        if not http_fetcher:
+            await fetcher.close()
+
+
+# *******************************************
+@handle_exceptions
+async def collect_product_endpoints(
+    can_run=False,
+    endpoint_queue=None,
+    frontier=None,
+    browser_pool=None,
+    http_fetcher=None,
+    category_concurrency=3,
+    parse_pool=None,
+    recrawl_after=None,
+    dead_letters=None,
+) -> bool:
     if not can_run:
         custom_logger("Product endpoint collection disabled!.", log_type="info")
         return False
@@ -271,7 +632,18 @@ async def collect_product_endpoints(can_run=False) -> bool:
 
     base_urls = load_base_urls(base_urls_file)
     if base_urls:
-        await download_category_endpoints(base_urls, output_dir)
+        await download_category_endpoints(
+            base_urls,
+            output_dir,
+            endpoint_queue=endpoint_queue,
+            frontier=frontier,
+            browser_pool=browser_pool,
+            http_fetcher=http_fetcher,
+            category_concurrency=category_concurrency,
+            parse_pool=parse_pool,
+            recrawl_after=recrawl_after,
+            dead_letters=dead_letters,
+        )
         custom_logger("Endpoints extraction complete.")
         return True
     else:
@@ -0,0 +1,38 @@
+import hashlib
+from middlewares.errors.error_handler import handle_exceptions
+from middlewares.logger.logger import custom_logger, initialize_logging
+
+initialize_logging()
+
+
+def shard_of(url, shard_count):
+    # Stable across processes and runs, unlike the salted built-in hash()
+    digest = hashlib.blake2b(url.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % shard_count
+
+
+def shard_endpoints(endpoints, shard_count):
+    shards = [[] for _ in range(shard_count)]
+    for url in endpoints:
+        shards[shard_of(url, shard_count)].append(url)
+    return shards
+
+
+@handle_exceptions
+def merge_shard_outputs(shard_files, target_file, unique_products):
+    merged = 0
+    with target_file.open(mode="a", encoding="utf-8") as target:
+        for shard_file in shard_files:
+            if not shard_file.exists():
+                continue
+            with shard_file.open(mode="r", encoding="utf-8") as source:
+                for line in source:
+                    line = line.strip()
+                    if line and line not in unique_products:
+                        unique_products.add(line)
+                        target.write(line + "\n")
+                        merged += 1
+            shard_file.unlink()
+
+    custom_logger(f"Merged {merged} products from shard outputs.", log_type="info")
+    return merged
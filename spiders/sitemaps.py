@@ -0,0 +1,240 @@
+import os
+import csv
+import zlib
+from pathlib import Path
+from collections import namedtuple
+from datetime import datetime, timezone
+from xml.etree.ElementTree import XMLPullParser, ParseError
+from urllib.parse import urljoin, urlsplit
+import httpx
+from utils.headers.headers_handler import Headers
+from utils.config.site import START_URL
+from spiders.listing_responses import PRODUCT_PATH_PATTERN
+from middlewares.metrics.metrics import metrics
+from middlewares.rate_limit.rate_limiter import rate_limiter
+from middlewares.errors.error_handler import handle_exceptions
+from middlewares.logger.logger import custom_logger, initialize_logging
+
+initialize_logging()
+
+root_dir = Path(__file__).resolve().parent.parent
+ENDPOINTS_DIR = root_dir / "product_endpoints"
+SITEMAP_ENDPOINTS_FILE = "sitemap_products.csv"
+
+GZIP_MAGIC = b"\x1f\x8b"
+MAX_SITEMAPS = 1000
+
+# kind is "url" for a page and "sitemap" for an entry of a sitemap index
+SitemapEntry = namedtuple("SitemapEntry", ["kind", "loc", "lastmod"])
+
+
+def local_name(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+def parse_lastmod(value):
+    # W3C datetime: a date, or a date and time with a zone
+    if not value:
+        return None
+    value = value.strip().replace("Z", "+00:00")
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+def sitemaps_from_robots(robots_txt, robots_url):
+    sitemaps = []
+    for line in robots_txt.splitlines():
+        field, _, value = line.partition(":")
+        if field.strip().lower() == "sitemap" and value.strip():
+            sitemaps.append(urljoin(robots_url, value.strip()))
+    return sitemaps
+
+
+class SitemapParser:
+    # Incremental: fed the response body chunk by chunk (gzipped or not),
+    # returns entries as their closing tags arrive and drops them from the
+    # tree, so memory stays flat however large the sitemap is
+    def __init__(self):
+        self.parser = XMLPullParser(events=("end",))
+        self.decompressor = None
+        self.started = False
+        self.loc = None
+        self.lastmod = None
+
+    def feed(self, chunk):
+        if not self.started:
+            self.started = True
+            if chunk.startswith(GZIP_MAGIC):
+                self.decompressor = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+        if self.decompressor:
+            chunk = self.decompressor.decompress(chunk)
+        self.parser.feed(chunk)
+        return list(self.read_events())
+
+    def close(self):
+        if self.decompressor:
+            self.parser.feed(self.decompressor.flush())
+        self.parser.close()
+        return list(self.read_events())
+
+    def read_events(self):
+        for _, element in self.parser.read_events():
+            tag = local_name(element.tag)
+            if tag == "loc":
+                self.loc = (element.text or "").strip()
+            elif tag == "lastmod":
+                self.lastmod = (element.text or "").strip()
+            elif tag in ("url", "sitemap"):
+                if self.loc:
+                    kind = "url" if tag == "url" else "sitemap"
+                    yield SitemapEntry(kind, self.loc, self.lastmod)
+                self.loc = None
+                self.lastmod = None
+                element.clear()
+
+
+async def stream_sitemap(client, url):
+    await rate_limiter.wait(url)
+    async with client.stream("GET", url) as response:
+        if response.status_code != 200:
+            custom_logger(
+                f"Sitemap {url} returned status {response.status_code}.",
+                log_type="warn",
+            )
+            return
+        parser = SitemapParser()
+        async for chunk in response.aiter_bytes():
+            for entry in parser.feed(chunk):
+                yield entry
+        for entry in parser.close():
+            yield entry
+    metrics.incr("sitemaps.fetched")
+
+
+async def discover_sitemap_endpoints(
+    client, start_url=START_URL, max_sitemaps=MAX_SITEMAPS
+):
+    # robots.txt -> sitemap indexes -> sitemaps. Returns {product url: lastmod}.
+    parts = urlsplit(start_url)
+    robots_url = f"{parts.scheme}://{parts.netloc}/robots.txt"
+    sitemaps = []
+    try:
+        await rate_limiter.wait(robots_url)
+        response = await client.get(robots_url)
+        if response.status_code == 200:
+            sitemaps = sitemaps_from_robots(response.text, robots_url)
+    except httpx.HTTPError as e:
+        custom_logger(f"Could not load {robots_url}: {e!r}", log_type="warn")
+    if not sitemaps:
+        sitemaps = [f"{parts.scheme}://{parts.netloc}/sitemap.xml"]
+
+    endpoints = {}
+    seen = set(sitemaps)
+    while sitemaps:
+        sitemap_url = sitemaps.pop(0)
+        try:
+            async for entry in stream_sitemap(client, sitemap_url):
+                if entry.kind == "sitemap":
+                    if entry.loc not in seen and len(seen) < max_sitemaps:
+                        seen.add(entry.loc)
+                        sitemaps.append(entry.loc)
+                elif urlsplit(entry.loc).netloc == parts.netloc and (
+                    PRODUCT_PATH_PATTERN.search(entry.loc)
+                ):
+                    endpoints[entry.loc] = entry.lastmod or ""
+        except (httpx.HTTPError, ParseError, zlib.error) as e:
+            metrics.incr("sitemaps.failed")
+            custom_logger(
+                f"Could not read sitemap {sitemap_url}: {e!r}", log_type="warn"
+            )
+
+    metrics.set_gauge("sitemaps.products", len(endpoints))
+    return endpoints
+
+
+def changed_endpoints(previous, current):
+    # URLs seen before whose lastmod moved forward. Without a lastmod on
+    # either side there is nothing to compare, so the page counts as unchanged.
+    changed = []
+    for url, lastmod in current.items():
+        if url not in previous:
+            continue
+        old, new = parse_lastmod(previous[url]), parse_lastmod(lastmod)
+        if old and new and new > old:
+            changed.append(url)
+    return changed
+
+
+@handle_exceptions
+def load_sitemap_endpoints(csv_file_path):
+    if not csv_file_path.exists():
+        return {}
+    with csv_file_path.open(mode="r", newline="", encoding="utf-8") as file:
+        return {
+            row["endpoint"]: row.get("lastmod") or ""
+            for row in csv.DictReader(file)
+            if row.get("endpoint")
+        }
+
+
+@handle_exceptions
+def save_sitemap_endpoints(endpoints, csv_file_path):
+    # Same "endpoint" column as the category CSVs, plus lastmod
+    csv_file_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = csv_file_path.with_suffix(".csv.tmp")
+    try:
+        with tmp_path.open(mode="w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerow(["endpoint", "lastmod"])
+            for url in sorted(endpoints):
+                writer.writerow([url, endpoints[url]])
+        os.replace(tmp_path, csv_file_path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+# ===================================================
+@handle_exceptions
+async def collect_sitemap_endpoints(
+    can_run=False,
+    frontier=None,
+    start_url=START_URL,
+    output_dir=ENDPOINTS_DIR,
+    transport=None,
+):
+    if not can_run:
+        custom_logger("Sitemap discovery disabled!", log_type="info")
+        return False
+
+    headers = dict(Headers().get_headers())
+    headers.pop("accept-encoding", None)
+    async with httpx.AsyncClient(
+        headers=headers, timeout=60, follow_redirects=True, transport=transport
+    ) as client:
+        endpoints = await discover_sitemap_endpoints(client, start_url)
+
+    if not endpoints:
+        custom_logger("No product URLs found in the sitemaps.", log_type="warn")
+        return False
+
+    csv_file_path = output_dir / SITEMAP_ENDPOINTS_FILE
+    previous = load_sitemap_endpoints(csv_file_path) or {}
+    changed = changed_endpoints(previous, endpoints)
+    save_sitemap_endpoints(endpoints, csv_file_path)
+
+    # Finished pages stay finished unless the sitemap says they changed
+    if frontier and changed:
+        frontier.requeue(changed)
+    metrics.set_gauge("sitemaps.changed", len(changed))
+    new = endpoints.keys() - previous.keys()
+    custom_logger(
+        f"Sitemaps: {len(endpoints)} products, {len(new)} new, "
+        f"{len(changed)} changed since the last run.",
+        log_type="info",
+    )
+    return True
@@ -0,0 +1,85 @@
+import asyncio
+import pytest
+from middlewares.metrics.metrics import metrics
+from middlewares.concurrency.aimd import AimdController
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def test_limit_grows_additively_while_healthy():
+    controller = AimdController("test", initial=2, max_limit=4, window=5)
+    for _ in range(15):
+        controller.record(1.0)
+
+    assert controller.limit == 4
+    assert metrics.counters["aimd.test.increase"] == 2
+    assert metrics.gauges["aimd.test.limit"] == 4
+
+
+def test_throttle_cuts_limit_once_per_cooldown():
+    clock = FakeClock()
+    controller = AimdController("test", initial=8, window=5, cooldown=10, clock=clock)
+
+    controller.record_throttle("status 429")
+    controller.record_throttle("timeout")
+    assert controller.limit == 4
+
+    clock.now = 11
+    controller.record_throttle("bot challenge")
+    assert controller.limit == 2
+    assert metrics.counters["aimd.test.throttled"] == 3
+    assert metrics.counters["aimd.test.decrease"] == 2
+    assert controller.decisions[-1] == ("decrease", 4, 2, "bot challenge")
+
+
+def test_slow_or_failing_window_decreases_limit():
+    controller = AimdController("test", initial=6, window=4, target_p95=5.0)
+    for _ in range(4):
+        controller.record(9.0)
+    assert controller.limit == 3
+
+    for ok in (True, False, False, True):
+        controller.record(1.0, ok=ok)
+    assert controller.limit == 1
+
+
+def test_limit_stays_within_bounds():
+    controller = AimdController("test", initial=50, min_limit=2, max_limit=6)
+    assert controller.limit == 6
+
+    controller.record_throttle("timeout")
+    controller.last_decrease = None
+    controller.record_throttle("timeout")
+    assert controller.limit == 2
+
+
+@pytest.mark.asyncio
+async def test_acquire_waits_for_a_free_slot():
+    controller = AimdController("test", initial=1, max_limit=2, window=1)
+    await controller.acquire()
+
+    waiter = asyncio.create_task(controller.acquire())
+    await asyncio.sleep(0)
+    assert not waiter.done()
+
+    # A healthy sample raises the limit, which lets the waiter in
+    controller.record(0.5)
+    await asyncio.wait_for(waiter, 1)
+    assert controller.in_flight == 2
+
+    controller.release()
+    controller.release()
+    assert controller.in_flight == 0
@@ -0,0 +1,216 @@
+import json
+import pytest
+from utils.browser.browser_pool import BrowserPool, use_browser_pool
+
+
+class FakePage:
+    def __init__(self, context):
+        self.context = context
+        self.closed = False
+        self.handlers = []
+
+    def on(self, event, handler):
+        self.handlers.append(handler)
+
+    def load(self):
+        for handler in self.handlers:
+            handler(self)
+
+    async def close(self):
+        self.closed = True
+        self.context.pages.remove(self)
+
+
+class FakeContext:
+    def __init__(self, **options):
+        self.options = options
+        self.pages = []
+        self.handlers = []
+        self.closed = False
+        self.cookies_cleared = 0
+        self.routes = []
+        self.cookies = []
+
+    async def add_cookies(self, cookies):
+        self.cookies.extend(cookies)
+
+    async def route(self, pattern, handler):
+        self.routes.append((pattern, handler))
+
+    def on(self, event, handler):
+        if event == "page":
+            self.handlers.append(handler)
+
+    async def new_page(self):
+        page = FakePage(self)
+        self.pages.append(page)
+        for handler in self.handlers:
+            handler(page)
+        return page
+
+    async def clear_cookies(self):
+        self.cookies_cleared += 1
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.contexts = []
+        self.closed = False
+
+    async def new_context(self, **options):
+        context = FakeContext(**options)
+        self.contexts.append(context)
+        return context
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeChromium:
+    def __init__(self):
+        self.browsers = []
+
+    async def launch(self, **kwargs):
+        browser = FakeBrowser()
+        self.browsers.append(browser)
+        return browser
+
+
+class FakePlaywright:
+    def __init__(self):
+        self.chromium = FakeChromium()
+
+
+@pytest.fixture
+def playwright():
+    return FakePlaywright()
+
+
+@pytest.mark.asyncio
+async def test_pool_launches_one_browser(playwright):
+    pool = BrowserPool(playwright, session_state_path=None)
+    for _ in range(3):
+        async with pool.context() as context:
+            await context.new_page()
+
+    assert len(playwright.chromium.browsers) == 1
+    await pool.close()
+    assert playwright.chromium.browsers[0].closed
+
+
+@pytest.mark.asyncio
+async def test_pool_recycles_contexts(playwright):
+    pool = BrowserPool(playwright, session_state_path=None)
+    async with pool.context() as first:
+        await first.new_page()
+    assert first.pages == []
+    assert first.cookies_cleared == 1
+
+    async with pool.context() as second:
+        pass
+    assert first is second
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_pool_keeps_context_options_apart(playwright):
+    pool = BrowserPool(playwright, session_state_path=None)
+    async with pool.context() as plain:
+        pass
+    async with pool.context(extra_http_headers={"x": "1"}) as with_headers:
+        pass
+
+    assert plain is not with_headers
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_pool_restarts_browser_after_page_limit(playwright):
+    pool = BrowserPool(playwright, session_state_path=None, max_pages_per_browser=2)
+    context = await pool.new_context()
+    page = await context.new_page()
+    page.load()
+    assert await pool.renew(context) is context
+    page.load()
+
+    context = await pool.renew(context)
+    first_browser, second_browser = playwright.chromium.browsers
+
+    assert first_browser.closed
+    assert not second_browser.closed
+    assert second_browser.contexts == [context]
+    await pool.release(context)
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_retired_browser_waits_for_open_contexts(playwright):
+    pool = BrowserPool(playwright, session_state_path=None, max_pages_per_browser=1)
+    busy = await pool.new_context()
+    page = await busy.new_page()
+    page.load()
+
+    other = await pool.new_context()
+    first_browser = playwright.chromium.browsers[0]
+    assert not first_browser.closed
+
+    await pool.release(busy)
+    assert first_browser.closed
+    await pool.release(other)
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_use_browser_pool_reuses_given_pool(playwright):
+    pool = BrowserPool(playwright, session_state_path=None)
+    async with use_browser_pool(pool) as shared:
+        assert shared is pool
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_use_browser_pool_builds_pool_from_options(playwright):
+    class Factory:
+        async def __aenter__(self):
+            return playwright
+
+        async def __aexit__(self, *exc_info):
+            return False
+
+    async with use_browser_pool(
+        None, Factory, block_resources=False, session_state_path=None
+    ) as pool:
+        assert pool.resource_blocker is None
+        assert pool.session_state_path is None
+        async with pool.context() as context:
+            assert context.routes == []
+
+
+@pytest.mark.asyncio
+async def test_pool_applies_resource_blocking(playwright):
+    pool = BrowserPool(playwright, session_state_path=None)
+    async with pool.context() as context:
+        assert len(context.routes) == 1
+    await pool.close()
+
+    pool = BrowserPool(playwright, session_state_path=None, block_resources=False)
+    async with pool.context() as context:
+        assert context.routes == []
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_pool_starts_contexts_from_saved_session(playwright, tmp_path):
+    state_path = tmp_path / "storage_state.json"
+    cookie = {"name": "consent", "value": "1", "domain": ".thomann.de", "path": "/"}
+    state_path.write_text(json.dumps({"cookies": [cookie], "origins": []}))
+
+    pool = BrowserPool(playwright, session_state_path=state_path)
+    async with pool.context() as context:
+        assert context.options["storage_state"] == str(state_path)
+    # Recycling clears cookies but puts the session cookies back
+    assert context.cookies == [cookie]
+    await pool.close()
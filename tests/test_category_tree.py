@@ -0,0 +1,129 @@
+import pytest
+from spiders.category_tree import (
+    canonicalize_url,
+    parse_category_page,
+    discover_categories,
+    save_category_tree,
+)
+from middlewares.concurrency.aimd import AimdController
+
+ROOT = "https://www.thomann.de/gb/index.html"
+
+
+def category_page(links, listing=False, sidebar=()):
+    anchors = "".join(f'<a href="{href}">x</a>' for href in links)
+    side = "".join(f'<a href="{href}">x</a>' for href in sidebar)
+    items = '<a class="js-item" href="some_product.htm"></a>' if listing else ""
+    return (
+        '<html><body><header><a href="drums.html">Drums</a></header>'
+        '<div class="thomann-page-content-wrapper">'
+        f'<div class="fx-breadcrumb"><a href="index.html">Home</a>{side}</div>'
+        f"{anchors}{items}</div>"
+        '<footer><a href="helpdesk.html">Help</a></footer></body></html>'
+    )
+
+
+@pytest.mark.parametrize(
+    "url, expected",
+    [
+        ("guitars.html", "https://www.thomann.de/gb/guitars.html"),
+        (
+            "HTTPS://WWW.THOMANN.DE/gb/guitars.html?ls=25&pg=2#top",
+            "https://www.thomann.de/gb/guitars.html",
+        ),
+        ("/gb//guitars.html", "https://www.thomann.de/gb/guitars.html"),
+        ("fender_player_strat.htm", None),
+        ("https://www.example.com/gb/guitars.html", None),
+        ("/de/gitarren.html", None),
+        ("hotdeals.html", None),
+        ("javascript:void(0)", None),
+    ],
+)
+def test_canonicalize_url(url, expected):
+    assert canonicalize_url(url, ROOT) == expected
+
+
+def test_parse_category_page_ignores_site_chrome():
+    html = category_page(["guitars.html", "guitars.html?pg=2"], listing=True)
+    links, listing = parse_category_page(html, ROOT)
+
+    assert links == {"https://www.thomann.de/gb/guitars.html"}
+    assert listing is True
+
+
+@pytest.mark.asyncio
+async def test_discover_categories_returns_leaves():
+    base = "https://www.thomann.de/gb/"
+    site = {
+        ROOT: category_page(["guitars.html", "drums.html"]),
+        base + "guitars.html": category_page(
+            ["electric_guitars.html", "acoustic_guitars.html", "drums.html"]
+        ),
+        # Leaves link to their siblings and parents in the sidebar
+        base + "electric_guitars.html": category_page(
+            ["acoustic_guitars.html", "guitars.html"], listing=True
+        ),
+        base + "acoustic_guitars.html": category_page(
+            ["electric_guitars.html"], listing=True
+        ),
+        base + "drums.html": category_page([], listing=True),
+    }
+    fetched = []
+
+    async def fetch_page(url):
+        fetched.append(url)
+        return site.get(url)
+
+    tree = await discover_categories([ROOT], fetch_page, AimdController("test"))
+
+    assert tree.leaves == [
+        base + "acoustic_guitars.html",
+        base + "drums.html",
+        base + "electric_guitars.html",
+    ]
+    # Every page is fetched once, however many pages link to it
+    assert sorted(fetched) == sorted(site)
+    assert tree.pages[base + "electric_guitars.html"].depth == 2
+    assert tree.pages[base + "electric_guitars.html"].parent == base + "guitars.html"
+
+
+@pytest.mark.asyncio
+async def test_discover_categories_depth_limit():
+    base = "https://www.thomann.de/gb/"
+    site = {
+        ROOT: category_page(["guitars.html"]),
+        base + "guitars.html": category_page(["electric_guitars.html"], listing=True),
+        base + "electric_guitars.html": category_page([], listing=True),
+    }
+
+    async def fetch_page(url):
+        return site.get(url)
+
+    tree = await discover_categories(
+        [ROOT], fetch_page, AimdController("test"), max_depth=1
+    )
+
+    # A listing page at the depth limit stands in for its subtree
+    assert tree.leaves == [base + "guitars.html"]
+    assert base + "electric_guitars.html" not in tree.pages
+
+
+@pytest.mark.asyncio
+async def test_discover_categories_skips_failed_pages(tmp_path):
+    base = "https://www.thomann.de/gb/"
+    site = {
+        ROOT: category_page(["guitars.html", "drums.html"]),
+        base + "drums.html": category_page([], listing=True),
+    }
+
+    async def fetch_page(url):
+        return site.get(url)
+
+    tree = await discover_categories([ROOT], fetch_page, AimdController("test"))
+    assert tree.leaves == [base + "drums.html"]
+
+    base_urls_file = tmp_path / "base_urls.txt"
+    tree_file = tmp_path / "category_tree.csv"
+    save_category_tree(tree, base_urls_file, tree_file)
+    assert base_urls_file.read_text().splitlines() == [base + "drums.html"]
+    assert len(tree_file.read_text().splitlines()) == 3
@@ -0,0 +1,107 @@
+import pytest
+from middlewares.frontier.frontier import Frontier, PENDING, IN_FLIGHT, DONE, FAILED
+
+
+@pytest.fixture
+def frontier(tmp_path):
+    frontier = Frontier(tmp_path / "frontier.db")
+    yield frontier
+    frontier.close()
+
+
+def test_add_is_idempotent(frontier):
+    assert frontier.add(["https://example.com/p1", "https://example.com/p2"]) == 2
+    assert frontier.add(["https://example.com/p1"]) == 0
+    assert frontier.counts()[PENDING] == 2
+
+
+def test_state_transitions(frontier):
+    frontier.add(["https://example.com/p1", "https://example.com/p2"])
+    frontier.mark_in_flight(["https://example.com/p1", "https://example.com/p2"])
+    frontier.mark_done("https://example.com/p1")
+    frontier.mark_failed("https://example.com/p2", "timeout")
+
+    assert frontier.states(["https://example.com/p1", "https://example.com/p2"]) == {
+        "https://example.com/p1": DONE,
+        "https://example.com/p2": FAILED,
+    }
+    assert frontier.urls_in_state(FAILED) == ["https://example.com/p2"]
+
+
+def test_resume_requeues_in_flight(tmp_path):
+    db_path = tmp_path / "frontier.db"
+    frontier = Frontier(db_path)
+    frontier.add(["https://example.com/p1", "https://example.com/p2"])
+    assert frontier.claim(1) == ["https://example.com/p1"]
+    frontier.conn.close()  # simulate a crash without a clean close
+
+    resumed = Frontier(db_path)
+    assert resumed.counts()[IN_FLIGHT] == 1
+    assert resumed.resume() == 1
+    assert resumed.pending() == ["https://example.com/p1", "https://example.com/p2"]
+    resumed.close()
+
+
+def test_admit_filters_finished_urls(frontier):
+    frontier.add(["https://example.com/p1"])
+    frontier.mark_done("https://example.com/p1")
+
+    admitted = frontier.admit(["https://example.com/p1", "https://example.com/p2"])
+    assert admitted == ["https://example.com/p2"]
+
+
+def test_kinds_are_tracked_separately(frontier):
+    frontier.add(["https://example.com/cat"], kind="category")
+    frontier.add(["https://example.com/p1"])
+
+    assert frontier.pending(kind="category") == ["https://example.com/cat"]
+    assert frontier.pending() == ["https://example.com/p1"]
+
+
+def test_requeue_older_than(frontier):
+    urls = [f"https://example.com/{name}" for name in ("old", "new", "bad", "open")]
+    frontier.add(urls)
+    frontier.add(["https://example.com/category"], kind="category")
+    frontier.mark_done(urls[0])
+    frontier.mark_failed(urls[2], "timeout")
+    frontier.mark_done("https://example.com/category")
+    frontier.conn.execute("UPDATE urls SET updated_at = updated_at - 7200")
+    frontier.mark_done(urls[1])
+
+    assert frontier.requeue_older_than(3600) == 2
+    assert frontier.states(urls) == {
+        urls[0]: PENDING,
+        urls[1]: DONE,
+        urls[2]: PENDING,
+        urls[3]: PENDING,
+    }
+    assert frontier.states(["https://example.com/category"]) == {
+        "https://example.com/category": DONE
+    }
+    # Zero requeues everything that finished, however recently
+    assert frontier.requeue_older_than(0) == 1
+    assert frontier.counts()[PENDING] == 4
+
+
+def test_set_states_copies_outcomes(frontier):
+    urls = ["https://example.com/a", "https://example.com/b"]
+    frontier.add(urls)
+    frontier.mark_in_flight(urls)
+
+    frontier.set_states({urls[0]: DONE, urls[1]: FAILED})
+
+    assert frontier.states(urls) == {urls[0]: DONE, urls[1]: FAILED}
+    assert frontier.counts()[IN_FLIGHT] == 0
+
+
+def test_requeue_changed_urls(frontier):
+    frontier.add(["https://example.com/a", "https://example.com/b"])
+    frontier.mark_done("https://example.com/a")
+    frontier.mark_in_flight(["https://example.com/b"])
+
+    frontier.requeue(["https://example.com/a", "https://example.com/b"])
+
+    assert frontier.states(["https://example.com/a", "https://example.com/b"]) == {
+        "https://example.com/a": PENDING,
+        "https://example.com/b": IN_FLIGHT,
+    }
@@ -0,0 +1,61 @@
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from utils.archive.html_archive import HtmlArchive, content_hash
+
+
+@pytest.fixture
+def archive(tmp_path):
+    archive = HtmlArchive(tmp_path / "archive")
+    yield archive
+    archive.close()
+
+
+def test_put_and_get_round_trip(archive):
+    digest = archive.put("https://example.com/a", "<html>a</html>")
+
+    assert digest == content_hash("<html>a</html>")
+    assert archive.get(digest) == "<html>a</html>"
+    assert archive.latest("https://example.com/a") == "<html>a</html>"
+    assert archive.get("missing") is None
+
+
+def test_identical_bodies_are_stored_once(archive):
+    archive.put("https://example.com/a", "<html>same</html>", fetched_at=1)
+    archive.put("https://example.com/b", "<html>same</html>", fetched_at=2)
+    archive.put("https://example.com/a", "<html>same</html>", fetched_at=3)
+
+    counts = archive.counts()
+    assert counts["urls"] == 2
+    assert counts["blobs"] == 1
+
+
+def test_iter_latest_yields_newest_copy_per_url(archive):
+    archive.put("https://example.com/a", "<html>old</html>", fetched_at=1)
+    archive.put("https://example.com/b", "<html>b</html>", fetched_at=2)
+    archive.put("https://example.com/a", "<html>new</html>", fetched_at=3)
+
+    assert dict(archive.iter_latest()) == {
+        "https://example.com/a": "<html>new</html>",
+        "https://example.com/b": "<html>b</html>",
+    }
+
+
+def test_segments_roll_over(tmp_path):
+    archive = HtmlArchive(tmp_path / "archive", segment_max_bytes=64)
+    pages = {f"https://example.com/{i}": f"<html>page {i} {'x' * i}</html>" for i in range(6)}
+    for url, html in pages.items():
+        archive.put(url, html)
+
+    assert len(list((tmp_path / "archive").glob("segment-*.zst"))) > 1
+    assert dict(archive.iter_latest()) == pages
+    archive.close()
+
+
+def test_puts_from_several_threads(archive):
+    pages = {f"https://example.com/{i}": f"<html>{i % 5}</html>" for i in range(40)}
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda item: archive.put(*item), pages.items()))
+
+    assert dict(archive.iter_latest()) == pages
+    assert archive.counts()["blobs"] == 5
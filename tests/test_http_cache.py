@@ -0,0 +1,78 @@
+import random
+import pytest
+from utils.cache.http_cache import HttpCache, canonical_url
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = HttpCache(tmp_path / "http_cache.db")
+    yield cache
+    cache.close()
+
+
+@pytest.mark.parametrize(
+    "url, expected",
+    [
+        (
+            "HTTPS://WWW.Thomann.de/gb/product.htm#reviews",
+            "https://www.thomann.de/gb/product.htm",
+        ),
+        (
+            "https://www.thomann.de/gb/cat.html?pg=2&ls=100&utm_source=x",
+            "https://www.thomann.de/gb/cat.html?ls=100&pg=2",
+        ),
+    ],
+)
+def test_canonical_url(url, expected):
+    assert canonical_url(url) == expected
+
+
+def test_store_and_get_round_trip(cache):
+    assert cache.store(
+        "https://www.thomann.de/gb/product.htm",
+        "<html>product</html>",
+        etag='"abc"',
+        last_modified="Mon, 01 Jul 2024 10:00:00 GMT",
+    )
+    cache.store_record("https://www.thomann.de/gb/product.htm", {"price": "£119"})
+
+    entry = cache.get("https://www.thomann.de/gb/product.htm#top")
+    assert entry.body == "<html>product</html>"
+    assert entry.record == {"price": "£119"}
+    assert HttpCache.conditional_headers(entry) == {
+        "if-none-match": '"abc"',
+        "if-modified-since": "Mon, 01 Jul 2024 10:00:00 GMT",
+    }
+
+
+def test_store_record_keeps_total_bytes(cache):
+    url = "https://www.thomann.de/gb/product.htm"
+    cache.store(url, "<html>product</html>", etag='"abc"')
+    cache.store_record(url, {"price": "£119", "product_title": "Guitar"})
+    cache.store_record(url, {"price": "£99"})
+
+    assert cache.total_bytes == cache._stored_bytes()
+    assert not cache.store_record("https://www.thomann.de/gb/missing.htm", {})
+
+
+def test_store_without_validators_is_skipped(cache):
+    assert not cache.store("https://www.thomann.de/gb/product.htm", "<html></html>")
+    assert cache.get("https://www.thomann.de/gb/product.htm") is None
+
+
+def test_lru_eviction_keeps_recently_used(tmp_path):
+    cache = HttpCache(tmp_path / "http_cache.db", max_bytes=10_000)
+    rng = random.Random(7)
+    body = "".join(chr(rng.randint(33, 122)) for _ in range(3000))
+
+    cache.store("https://example.com/a", body, etag="a")
+    cache.store("https://example.com/b", body, etag="b")
+    cache.get("https://example.com/a")
+    for name in "cdefgh":
+        cache.store(f"https://example.com/{name}", body, etag=name)
+        cache.get("https://example.com/a")
+
+    assert cache.total_bytes <= 10_000
+    assert cache.get("https://example.com/a") is not None
+    assert cache.get("https://example.com/b") is None
+    cache.close()
@@ -0,0 +1,158 @@
+import httpx
+import pytest
+from utils.fetchers.http_fetcher import HttpFetcher, is_bot_challenge
+
+PRODUCT_PAGE = """
+<html><body>
+    <div class="product-main-content fx-content-product-grid__col">product</div>
+</body></html>
+"""
+
+
+def make_fetcher(handler):
+    return HttpFetcher(transport=httpx.MockTransport(handler))
+
+
+@pytest.mark.asyncio
+async def test_fetch_returns_product_page():
+    fetcher = make_fetcher(lambda request: httpx.Response(200, text=PRODUCT_PAGE))
+    result = await fetcher.fetch("https://www.thomann.de/gb/product.htm")
+    await fetcher.close()
+
+    assert result.content == PRODUCT_PAGE
+    assert result.reason is None
+
+
+@pytest.mark.asyncio
+async def test_fetch_reuses_one_client():
+    fetcher = make_fetcher(lambda request: httpx.Response(200, text=PRODUCT_PAGE))
+    await fetcher.fetch("https://www.thomann.de/gb/product1.htm")
+    client = fetcher.client
+    await fetcher.fetch("https://www.thomann.de/gb/product2.htm")
+
+    assert fetcher.client is client
+    await fetcher.close()
+    assert fetcher.client is None
+
+
+@pytest.mark.asyncio
+async def test_fetch_sends_scraper_headers():
+    seen = {}
+
+    def handler(request):
+        seen.update(request.headers)
+        return httpx.Response(200, text=PRODUCT_PAGE)
+
+    fetcher = make_fetcher(handler)
+    await fetcher.fetch("https://www.thomann.de/gb/product.htm")
+    await fetcher.close()
+
+    assert "user-agent" in seen
+    assert seen["accept-language"] == "en-US,en;q=0.9"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "status, text, reason",
+    [
+        (403, "Forbidden", "bot challenge"),
+        (200, "<script src='/_Incapsula_Resource'></script>", "bot challenge"),
+        (404, "Not found", "status 404"),
+        (200, "<html><body>category page</body></html>", "missing container"),
+    ],
+)
+async def test_fetch_rejects_unusable_pages(status, text, reason):
+    fetcher = make_fetcher(lambda request: httpx.Response(status, text=text))
+    result = await fetcher.fetch("https://www.thomann.de/gb/product.htm")
+    await fetcher.close()
+
+    assert result.content is None
+    assert result.reason == reason
+
+
+@pytest.mark.asyncio
+async def test_fetch_reports_transport_errors():
+    def handler(request):
+        raise httpx.ConnectError("connection refused")
+
+    fetcher = make_fetcher(handler)
+    result = await fetcher.fetch("https://www.thomann.de/gb/product.htm")
+    await fetcher.close()
+
+    assert result.content is None
+    assert result.reason.startswith("http error")
+
+
+@pytest.mark.asyncio
+async def test_fetch_reports_timeouts():
+    def handler(request):
+        raise httpx.ConnectTimeout("timed out")
+
+    fetcher = make_fetcher(handler)
+    result = await fetcher.fetch("https://www.thomann.de/gb/product.htm")
+    await fetcher.close()
+
+    assert result.content is None
+    assert result.reason == "timeout"
+
+
+def test_is_bot_challenge():
+    assert is_bot_challenge(429, "")
+    assert not is_bot_challenge(200, PRODUCT_PAGE)
+
+
+@pytest.mark.parametrize(
+    "content, expected",
+    [
+        ("<html><head><title>Just a moment...</title></head></html>", True),
+        (
+            "<html><body><script src='/_Incapsula_Resource?x=1'></script>"
+            "<p>Request unsuccessful. Incapsula incident ID: 123</p></body></html>",
+            True,
+        ),
+        (
+            "<html><body><form><div class='g-recaptcha'></div></form></body></html>",
+            True,
+        ),
+        # A product page with a reCAPTCHA review form is not a challenge
+        (
+            PRODUCT_PAGE.replace(
+                "product</div>",
+                "product " + "Great keyboard, light and portable. " * 40 + "</div>"
+                "<form class='review'><div class='g-recaptcha'></div></form>",
+            ),
+            False,
+        ),
+    ],
+)
+def test_is_bot_challenge_reads_challenge_signals(content, expected):
+    assert is_bot_challenge(200, content) is expected
+
+
+@pytest.mark.asyncio
+async def test_fetch_revalidates_with_cache(tmp_path):
+    from utils.cache.http_cache import HttpCache
+
+    cache = HttpCache(tmp_path / "http_cache.db")
+    seen = []
+
+    def handler(request):
+        seen.append(request.headers.get("if-none-match"))
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, text=PRODUCT_PAGE, headers={"etag": '"v1"'})
+
+    fetcher = HttpFetcher(transport=httpx.MockTransport(handler), cache=cache)
+    url = "https://www.thomann.de/gb/product.htm"
+
+    first = await fetcher.fetch(url)
+    cache.store_record(url, {"product_url": url})
+    second = await fetcher.fetch(url)
+    await fetcher.close()
+    cache.close()
+
+    assert seen == [None, '"v1"']
+    assert not first.not_modified
+    assert second.not_modified
+    assert second.content == PRODUCT_PAGE
+    assert second.record == {"product_url": url}
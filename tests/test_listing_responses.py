@@ -0,0 +1,90 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from spiders.listing_responses import (
+    ListingResponseCollector,
+    items_from_html,
+    items_from_json,
+)
+
+BASE_URL = "https://www.thomann.de/gb/electric_guitars.html"
+FRAGMENT = (
+    '<div class="fx-product-list-entry">'
+    '<a class="js-item" href="fender_player_strat.htm" data-article-id="461234" '
+    'title="Fender Player Strat">Fender</a>'
+    "</div>"
+)
+
+
+def make_response(body, content_type, resource_type="xhr", url=None, status=200):
+    response = MagicMock()
+    response.url = url or "https://www.thomann.de/gb/electric_guitars.html?ajax=1"
+    response.status = status
+    response.headers = {"content-type": content_type}
+    response.request.resource_type = resource_type
+    response.json = AsyncMock(return_value=body)
+    response.text = AsyncMock(return_value=body)
+    return response
+
+
+def test_items_from_json_finds_nested_products():
+    data = {
+        "meta": {"total": 2, "next": "electric_guitars.html?pg=3"},
+        "articles": [
+            {
+                "url": "/gb/gibson_les_paul.htm",
+                "name": "Gibson Les Paul",
+                "price": 2399.0,
+                "images": ["a.jpg"],
+            },
+            {"product": {"link": "prs_se_custom.htm?ref=grid", "name": "PRS SE"}},
+        ],
+        "html": FRAGMENT,
+    }
+
+    items = items_from_json(data, BASE_URL)
+
+    assert set(items) == {
+        "https://www.thomann.de/gb/gibson_les_paul.htm",
+        "https://www.thomann.de/gb/prs_se_custom.htm?ref=grid",
+        "https://www.thomann.de/gb/fender_player_strat.htm",
+    }
+    assert items["https://www.thomann.de/gb/gibson_les_paul.htm"] == {
+        "url": "/gb/gibson_les_paul.htm",
+        "name": "Gibson Les Paul",
+        "price": 2399.0,
+    }
+
+
+def test_items_from_html_keeps_data_attributes():
+    items = items_from_html(FRAGMENT, BASE_URL)
+    assert items == {
+        "https://www.thomann.de/gb/fender_player_strat.htm": {
+            "data-article-id": "461234",
+            "title": "Fender Player Strat",
+        }
+    }
+
+
+@pytest.mark.asyncio
+async def test_collector_keeps_grid_responses_only():
+    collector = ListingResponseCollector(BASE_URL)
+    collector.on_response(make_response({"items": [{"url": "a.htm"}]}, "application/json"))
+    collector.on_response(make_response(FRAGMENT, "text/html; charset=utf-8"))
+    collector.on_response(make_response(FRAGMENT, "text/html", resource_type="document"))
+    collector.on_response(
+        make_response(FRAGMENT, "text/html", url="https://tracker.example/x")
+    )
+    collector.on_response(make_response("body {}", "text/css"))
+    await collector.drain()
+
+    new_items = collector.take_new()
+    assert set(new_items) == {
+        "https://www.thomann.de/gb/a.htm",
+        "https://www.thomann.de/gb/fender_player_strat.htm",
+    }
+    assert collector.responses_seen == 2
+    assert collector.take_new() == {}
+
+    collector.on_response(make_response({"items": [{"url": "a.htm"}]}, "application/json"))
+    await collector.drain()
+    assert collector.take_new() == {}
@@ -0,0 +1,33 @@
+import json
+from middlewares.metrics.metrics import MetricsRegistry
+
+
+def test_counters_gauges_and_timings():
+    registry = MetricsRegistry()
+    registry.incr("pages")
+    registry.incr("pages", 2)
+    registry.set_gauge("window", 4)
+    for value in range(1, 101):
+        registry.observe("latency", value / 100)
+
+    snapshot = registry.snapshot()
+    assert snapshot["counters"] == {"pages": 3}
+    assert snapshot["gauges"] == {"window": 4}
+    assert snapshot["timings"]["latency"]["count"] == 100
+    assert snapshot["timings"]["latency"]["p95"] == 0.95
+
+
+def test_merge_adds_counters():
+    registry = MetricsRegistry()
+    registry.incr("pages", 2)
+    registry.merge({"counters": {"pages": 3, "errors": 1}})
+    assert registry.counters == {"pages": 5, "errors": 1}
+
+
+def test_dump_writes_json(tmp_path):
+    registry = MetricsRegistry()
+    registry.incr("pages")
+    registry.dump(tmp_path / "metrics.json")
+
+    data = json.loads((tmp_path / "metrics.json").read_text())
+    assert data["counters"] == {"pages": 1}
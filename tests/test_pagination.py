@@ -0,0 +1,109 @@
+import pytest
+from middlewares.concurrency.aimd import AimdController
+from spiders.pagination import (
+    Pagination,
+    detect_pagination,
+    fetch_listing_pages,
+    page_url,
+)
+
+BASE_URL = "https://www.thomann.de/gb/electric_guitars.html"
+
+
+def listing(*links, button=None):
+    html = "<html><body><div class='js-articles'></div>"
+    for href in links:
+        html += f'<a class="fx-pagination__link" href="{href}">x</a>'
+    if button:
+        html += f'<button class="js-button-more" data-url="{button}">more</button>'
+    return html + "</body></html>"
+
+
+def test_detect_page_parameter_from_pagination_bar():
+    html = listing(
+        "electric_guitars.html?ls=25&pg=2",
+        "electric_guitars.html?ls=25&pg=3",
+        "electric_guitars.html?ls=25&pg=12",
+        "/gb/bass_guitars.html?pg=40",
+    )
+
+    assert detect_pagination(html, BASE_URL) == Pagination("pg", 1, 12, {"ls": "25"})
+
+
+def test_detect_offset_parameter_from_load_more_button():
+    html = listing(button="/gb/electric_guitars.html?offset=25")
+
+    pagination = detect_pagination(html, BASE_URL)
+    assert pagination == Pagination("offset", 25, 2, {})
+    assert page_url(pagination, BASE_URL, 3) == BASE_URL + "?offset=50"
+
+
+def test_detect_returns_none_without_page_links():
+    assert detect_pagination(listing("/gb/cart.html", "#top"), BASE_URL) is None
+
+
+def test_page_url_keeps_other_parameters():
+    pagination = Pagination("pg", 1, 5, {"ls": "100"})
+    assert page_url(pagination, BASE_URL, 4) == BASE_URL + "?ls=100&pg=4"
+
+
+def make_pages(page_count, per_page=3):
+    return {
+        page_url(Pagination("pg", 1, 1, {}), BASE_URL, number): {
+            f"https://www.thomann.de/gb/item_{number}_{i}.htm" for i in range(per_page)
+        }
+        for number in range(1, page_count + 1)
+    }
+
+
+@pytest.mark.asyncio
+async def test_fetch_listing_pages_fetches_linked_pages_then_probes_until_empty():
+    pages = make_pages(7)
+    requested, collected = [], []
+    seen = set(pages[BASE_URL + "?pg=1"])
+
+    async def fetch_page(url):
+        requested.append(url)
+        return url
+
+    async def parse_page(url):
+        # Past the last page the shop repeats the last page
+        return pages.get(url, pages[BASE_URL + "?pg=7"])
+
+    async def on_new(new_endpoints):
+        collected.append(new_endpoints)
+
+    fetched = await fetch_listing_pages(
+        Pagination("pg", 1, 4, {}),
+        BASE_URL,
+        fetch_page,
+        parse_page,
+        on_new,
+        seen,
+        AimdController("test", initial=2),
+    )
+
+    assert len(seen) == 21
+    assert len(collected) == 6
+    assert BASE_URL + "?pg=4" in requested[:3]
+    assert fetched == len(requested)
+
+
+@pytest.mark.asyncio
+async def test_fetch_listing_pages_reports_failure_when_nothing_loads():
+    async def fetch_page(url):
+        return None
+
+    async def on_new(new_endpoints):
+        raise AssertionError("nothing should be collected")
+
+    fetched = await fetch_listing_pages(
+        Pagination("pg", 1, 3, {}),
+        BASE_URL,
+        fetch_page,
+        lambda content: set(),
+        on_new,
+        set(),
+        AimdController("test", initial=2),
+    )
+    assert fetched is None
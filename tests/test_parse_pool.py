@@ -0,0 +1,79 @@
+import os
+import time
+import asyncio
+import multiprocessing
+import pytest
+from pathlib import Path
+from utils.parsers.parse_pool import ParsePool
+from utils.parsers.parse_products import extract_product_data
+from middlewares.metrics.metrics import metrics
+
+FIXTURE = Path(__file__).resolve().parent / "fixtures" / "products" / "yamaha_p_45.html"
+
+
+def slow_parse(content):
+    time.sleep(0.3)
+    return {"length": len(content)}
+
+
+def crash_in_worker(content):
+    if multiprocessing.parent_process() is not None:
+        os._exit(1)
+    return {"parsed_in": "loop"}
+
+
+@pytest.fixture
+def parse_pool():
+    pool = ParsePool(workers=1, name="test_parse")
+    yield pool
+    pool.close()
+
+
+@pytest.mark.asyncio
+async def test_parse_pool_matches_inline_parse(parse_pool):
+    html = FIXTURE.read_text(encoding="utf-8")
+    inline = await ParsePool(workers=0).run(extract_product_data, html, "soup")
+    offloaded = await parse_pool.run(extract_product_data, html, "soup")
+
+    assert offloaded == inline
+    assert offloaded["product_title"] == "Yamaha P-45 B"
+
+
+@pytest.mark.asyncio
+async def test_parse_pool_keeps_event_loop_free(parse_pool):
+    await parse_pool.run(slow_parse, "warm up")
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    task = asyncio.create_task(ticker())
+    result = await parse_pool.run(slow_parse, "<html></html>")
+    task.cancel()
+
+    assert result == {"length": 13}
+    assert ticks >= 10
+
+
+@pytest.mark.asyncio
+async def test_parse_pool_reports_queue_depth_and_latency(parse_pool):
+    metrics.reset()
+    await asyncio.gather(*[parse_pool.run(slow_parse, "x") for _ in range(3)])
+
+    assert metrics.gauges["test_parse.peak_queue_depth"] == 3
+    assert len(metrics.samples["test_parse.parse_time"]) == 3
+    # Queued parses wait for the single worker
+    assert max(metrics.samples["test_parse.latency"]) >= 0.6
+    assert parse_pool.queued == 0
+
+
+@pytest.mark.asyncio
+async def test_parse_pool_recovers_from_worker_crash(parse_pool):
+    result = await parse_pool.run(crash_in_worker, "<html></html>")
+
+    assert result == {"parsed_in": "loop"}
+    assert parse_pool.executor is None
+    assert await parse_pool.run(slow_parse, "abc") == {"length": 3}
@@ -0,0 +1,60 @@
+import pytest
+from pathlib import Path
+from utils.parsers.parse_products import extract_product_data
+from utils.parsers.engines import PARSER_ENGINES, get_engine
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures" / "products"
+CORPUS = sorted(FIXTURES.glob("*.html"))
+FAST_ENGINES = [name for name in PARSER_ENGINES if name != "soup"]
+
+
+@pytest.mark.parametrize("engine", FAST_ENGINES)
+@pytest.mark.parametrize("fixture", CORPUS, ids=lambda path: path.stem)
+def test_engines_match_reference(engine, fixture):
+    html = fixture.read_text(encoding="utf-8")
+    assert extract_product_data(html, engine) == extract_product_data(html, "soup")
+
+
+def test_reference_output():
+    html = (FIXTURES / "beyerdynamic_dt_770_pro.html").read_text(encoding="utf-8")
+    product_data = extract_product_data(html, "soup")
+
+    assert product_data["product_title"] == "beyerdynamic DT-770 Pro 80 Ohm"
+    assert product_data["price"] == "£115"
+    assert product_data["key_features"]["item_id"] == "172479"
+    assert "Show more" not in product_data["key_features"]
+    assert product_data["shipping_prediction"] == (
+        "Delivery, expected between: Tuesday, 21.10. and Wednesday, 22.10."
+    )
+
+
+def test_unparsable_pages_return_none():
+    html = (FIXTURES / "discontinued.html").read_text(encoding="utf-8")
+    assert extract_product_data(html, "soup") is None
+
+
+@pytest.mark.parametrize("engine", FAST_ENGINES)
+def test_engine_text_rules_match_reference(engine):
+    html = (
+        "<div id='a'> One <!-- note --><b>two &amp; <i>three</i></b>"
+        "<script>var x = 1;</script><style>p {}</style>"
+        "<ruby>kan<rt>kan</rt><rp>(</rp></ruby> four </div>"
+        "<div class='x' id='b'><div class='x' id='c'></div></div>"
+    )
+    reference, fast = get_engine("soup"), get_engine(engine)
+    soup, tree = reference.parse(html), fast.parse(html)
+
+    node, fast_node = reference.select_one(soup, "#a"), fast.select_one(tree, "#a")
+    assert fast.text(fast_node) == reference.text(node)
+    assert fast.text(fast_node, strip=True) == reference.text(node, strip=True)
+
+    # A node never matches its own selector
+    outer, fast_outer = reference.select_one(soup, "#b"), fast.select_one(tree, "#b")
+    assert reference.attr(reference.select_one(outer, ".x"), "id") == "c"
+    assert fast.attr(fast.select_one(fast_outer, ".x"), "id") == "c"
+    assert len(fast.select(fast_outer, ".x")) == len(reference.select(outer, ".x"))
+
+
+def test_unknown_engine():
+    with pytest.raises(ValueError):
+        get_engine("regex")
@@ -0,0 +1,65 @@
+import asyncio
+import pytest
+from spiders.pipeline import run_streaming_pipeline
+
+
+class FakeConsumer:
+    def __init__(self):
+        self.received = []
+
+    async def consume_endpoint_queue(self, endpoint_queue, concurrency=3):
+        while True:
+            url = await endpoint_queue.get()
+            if url is None:
+                break
+            self.received.append(url)
+        return bool(self.received)
+
+
+def fake_collect(count, done=None):
+    # Stands in for collect_product_endpoints: puts `count` endpoints on the
+    # queue, then sets `done` if every put went through
+    async def collect(endpoint_queue=None, **kwargs):
+        for i in range(count):
+            await endpoint_queue.put(f"https://example.com/product{i}")
+        if done is not None:
+            done.set()
+        return True
+
+    return collect
+
+
+@pytest.mark.asyncio
+async def test_run_streaming_pipeline_streams_endpoints(monkeypatch):
+    monkeypatch.setattr("spiders.pipeline.collect_product_endpoints", fake_collect(5))
+
+    consumer = FakeConsumer()
+    result = await run_streaming_pipeline(consumer, can_run=True, queue_size=2)
+
+    assert result is True
+    assert len(consumer.received) == 5
+
+
+@pytest.mark.asyncio
+async def test_run_streaming_pipeline_disabled():
+    result = await run_streaming_pipeline(FakeConsumer(), can_run=False)
+    assert result is False
+
+
+@pytest.mark.asyncio
+async def test_run_streaming_pipeline_consumer_failure_cancels_producer(monkeypatch):
+    producer_blocked = asyncio.Event()
+
+    class FailingConsumer:
+        async def consume_endpoint_queue(self, endpoint_queue, concurrency=3):
+            raise RuntimeError("browser crashed")
+
+    monkeypatch.setattr(
+        "spiders.pipeline.collect_product_endpoints",
+        fake_collect(10, done=producer_blocked),
+    )
+
+    with pytest.raises(RuntimeError):
+        await run_streaming_pipeline(FailingConsumer(), can_run=True, queue_size=1)
+
+    assert not producer_blocked.is_set()
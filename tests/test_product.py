@@ -1,7 +1,20 @@
 import asyncio
-from unittest.mock import MagicMock, patch
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock, patch
 import pytest
 from spiders.product import ProductProcessorApp
+from utils.fetchers.http_fetcher import FetchResult
+from middlewares.retry.retry import Failure, ERROR
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures" / "products"
+PRODUCT_HTML = (FIXTURES / "yamaha_p_45.html").read_text(encoding="utf-8")
+
+
+@pytest.fixture(autouse=True)
+def mock_emulator():
+    # The emulator's progress thread would keep the test process alive
+    with patch("spiders.product.emulator"):
+        yield
 
 
 @pytest.fixture
@@ -9,10 +22,18 @@ def mock_data_dir(tmp_path):
     return tmp_path / "data"
 
 
+def fake_fetcher(*results):
+    # Stands in for HttpFetcher; each fetch returns the next result
+    fetcher = MagicMock()
+    fetcher.fetch = AsyncMock(side_effect=list(results))
+    fetcher.close = AsyncMock()
+    return fetcher
+
+
 @pytest.fixture
 def mock_product_processor_app(mock_data_dir):
-    app = ProductProcessorApp()
-    app.data_dir = mock_data_dir
+    app = ProductProcessorApp(data_dir=mock_data_dir, parse_workers=0)
+    app.http_fetcher = fake_fetcher()
     return app
 
 
@@ -23,7 +44,11 @@ def mock_endpoints():
 
 @pytest.fixture
 def mock_page():
-    return MagicMock()
+    page = MagicMock()
+    page.goto = AsyncMock()
+    page.wait_for_selector = AsyncMock()
+    page.content = AsyncMock(return_value=PRODUCT_HTML)
+    return page
 
 
 @pytest.mark.asyncio
@@ -34,48 +59,88 @@ async def test_load_products_endpoints_csv_files(
     csv_content = (
         "endpoint\nhttps://example.com/product1\nhttps://example.com/product2\n"
     )
+    mock_data_dir.mkdir()
     csv_path = mock_data_dir / "test.csv"
     csv_path.write_text(csv_content)
 
     with patch("spiders.product.custom_logger") as mock_logger:
-        endpoints = await mock_product_processor_app.load_products_endpoints_csv_files()
+        endpoints = await mock_product_processor_app.load_products_endpoints_csv_files(
+            mock_data_dir
+        )
 
-        assert len(endpoints) == 2
-        assert (
-            mock_logger.call_count == 2
-        )  # Check how many times custom_logger was called
+        assert sorted(endpoints) == mock_endpoints
+        assert mock_logger.call_count == 1  # "Processing file: test.csv"
 
 
 @pytest.mark.asyncio
-async def test_download_and_process_page_success(
-    mock_product_processor_app, mock_page, mock_endpoints
+async def test_download_and_process_page_success(mock_product_processor_app):
+    app = mock_product_processor_app
+    app.http_fetcher = fake_fetcher(FetchResult(PRODUCT_HTML, 200, None))
+    open_page = AsyncMock()
+
+    product_data = await app.download_and_process_page(
+        open_page, "https://example.com/product1"
+    )
+
+    assert product_data["product_title"] == "Yamaha P-45 B"
+    # Fetched over HTTP, so no browser page was opened
+    open_page.assert_not_called()
+    assert app.fetch_stats["http"] == 1
+
+
+@pytest.mark.asyncio
+async def test_download_and_process_page_archives_off_the_event_loop(
+    mock_product_processor_app,
 ):
-    mock_page.goto.return_value = asyncio.Future()
-    mock_page.goto.return_value.set_result(None)  # Simulate successful navigation
+    import threading
 
-    with patch("spiders.product.custom_logger") as mock_logger:
-        product_data = await mock_product_processor_app.download_and_process_page(
-            mock_page, "https://example.com/product1"
-        )
+    app = mock_product_processor_app
+    app.http_fetcher = fake_fetcher(FetchResult(PRODUCT_HTML, 200, None))
+    put = app.archive.put
+    threads = []
 
-        assert product_data
-        assert (
-            mock_logger.call_count >= 2
-        )  # Check how many times custom_logger was called
+    def recording_put(url, content):
+        threads.append(threading.get_ident())
+        return put(url, content)
+
+    app.archive.put = recording_put
+    await app.download_and_process_page(AsyncMock(), "https://example.com/product1")
+
+    assert threads and threads[0] != threading.get_ident()
+    assert app.archive.latest("https://example.com/product1") == PRODUCT_HTML
+    app.archive.close()
 
 
 @pytest.mark.asyncio
-async def test_download_and_process_page_error(
-    mock_product_processor_app, mock_page, mock_endpoints
+async def test_download_and_process_page_falls_back_to_browser(
+    mock_product_processor_app, mock_page
 ):
+    app = mock_product_processor_app
+    app.http_fetcher = fake_fetcher(FetchResult(None, 403, "bot challenge"))
+
+    with patch("spiders.product.ensure_consent", AsyncMock()):
+        product_data = await app.download_and_process_page(
+            AsyncMock(return_value=mock_page), "https://example.com/product1"
+        )
+
+    assert product_data["product_title"] == "Yamaha P-45 B"
+    mock_page.goto.assert_awaited_once()
+    assert app.fetch_stats["browser"] == 1
+
+
+@pytest.mark.asyncio
+async def test_download_and_process_page_error(mock_product_processor_app, mock_page):
+    app = mock_product_processor_app
+    app.http_fetcher = fake_fetcher(FetchResult(None, None, "timeout"))
     mock_page.goto.side_effect = Exception("Page navigation failed")
 
     with patch("spiders.product.custom_logger") as mock_logger:
-        product_data = await mock_product_processor_app.download_and_process_page(
-            mock_page, "https://example.com/product1"
+        product_data = await app.download_and_process_page(
+            AsyncMock(return_value=mock_page), "https://example.com/product1"
         )
 
-        assert not product_data
+        assert isinstance(product_data, Failure)
+        assert product_data.reason == ERROR
         assert (
             mock_logger.call_count >= 2
         )  # Check how many times custom_logger was called
@@ -83,20 +148,40 @@ async def test_download_and_process_page_error(
 
 @pytest.mark.asyncio
 async def test_process_product_endpoints(mock_product_processor_app, mock_endpoints):
-    with patch("spiders.product.async_playwright") as mock_playwright:
-        mock_browser = MagicMock()
-        mock_context = MagicMock()
-        mock_page = MagicMock()
-        mock_context.new_page.return_value = mock_page
-        mock_playwright.return_value.chromium.launch.return_value = mock_browser
-        mock_playwright.return_value.chromium.launch.return_value.new_context.return_value = mock_context
-
-        await mock_product_processor_app.process_product_endpoints(
-            mock_endpoints, concurrency=3
-        )
+    app = mock_product_processor_app
+    app.browser_pool = FakeBrowserPool()
+    app.save_product_data = MagicMock()
+    # The first page is fetched over HTTP, the second needs the browser
+    app.http_fetcher = fake_fetcher(
+        FetchResult(PRODUCT_HTML, 200, None), FetchResult(None, 403, "bot challenge")
+    )
+    app.frontier.add(mock_endpoints)
+
+    with patch("spiders.product.ensure_consent", AsyncMock()):
+        result = await app.process_product_endpoints(mock_endpoints, concurrency=1)
 
-        assert mock_browser.close.called
-        assert mock_context.close.called
+    assert result is True
+    assert app.success_count == 2
+    assert app.fetch_stats == {"http": 1, "not_modified": 0, "browser": 1}
+    assert app.browser_pool.contexts_created == 1
+    assert app.browser_pool.pages_created == 1
+
+
+@pytest.mark.asyncio
+async def test_pages_fetched_over_http_open_no_context(
+    mock_product_processor_app, mock_endpoints
+):
+    app = mock_product_processor_app
+    app.browser_pool = FakeBrowserPool()
+    app.save_product_data = MagicMock()
+    app.http_fetcher = fake_fetcher(
+        *[FetchResult(PRODUCT_HTML, 200, None) for _ in mock_endpoints]
+    )
+    app.frontier.add(mock_endpoints)
+
+    assert await app.process_product_endpoints(mock_endpoints, concurrency=2)
+    assert app.browser_pool.contexts_created == 0
+    assert app.browser_pool.released == 0
 
 
 @pytest.mark.asyncio
@@ -104,12 +189,377 @@ async def test_get_prod_data(mock_product_processor_app):
     with patch.object(
         ProductProcessorApp,
         "load_products_endpoints_csv_files",
+        new_callable=AsyncMock,
         return_value=["https://example.com/product1", "https://example.com/product2"],
     ) as mock_load_endpoints:
         with patch.object(
-            ProductProcessorApp, "process_product_endpoints", return_value=True
+            ProductProcessorApp,
+            "process_product_endpoints",
+            new_callable=AsyncMock,
+            return_value=True,
         ) as mock_process_endpoints:
             await mock_product_processor_app.get_prod_data()
 
             assert mock_load_endpoints.called
             assert mock_process_endpoints.called
+
+
+class FakeBrowserPool:
+    def __init__(self):
+        self.contexts_created = 0
+        self.pages_created = 0
+        self.released = 0
+
+    async def new_context(self, **options):
+        pool = self
+        self.contexts_created += 1
+
+        class Context:
+            async def new_page(self):
+                pool.pages_created += 1
+                page = MagicMock()
+                page.is_closed.return_value = False
+                page.goto = AsyncMock()
+                page.wait_for_selector = AsyncMock()
+                page.content = AsyncMock(return_value=PRODUCT_HTML)
+                return page
+
+        return Context()
+
+    async def renew(self, context):
+        return context
+
+    async def release(self, context):
+        self.released += 1
+
+
+@pytest.mark.asyncio
+async def test_process_product_endpoints_sliding_window(mock_product_processor_app):
+    app = mock_product_processor_app
+    app.browser_pool = FakeBrowserPool()
+    app.save_product_data = MagicMock()
+    endpoints = [f"https://example.com/product{i}" for i in range(6)]
+    finished = []
+
+    async def mock_download(open_page, url):
+        await open_page()
+        # The first URL is slow; the other workers must keep going meanwhile
+        await asyncio.sleep(0.2 if url == endpoints[0] else 0.01)
+        finished.append(url)
+        return {"product_url": url}
+
+    app.download_and_process_page = mock_download
+    app.frontier.add(endpoints)
+
+    result = await app.process_product_endpoints(endpoints, concurrency=2)
+
+    assert result is True
+    assert app.success_count == 6
+    assert finished[-1] == endpoints[0]
+    assert app.browser_pool.pages_created == 2
+    assert app.browser_pool.released == 2
+
+
+def test_reparse_archive_rebuilds_products_file(tmp_path):
+    from utils.archive.html_archive import HtmlArchive
+
+    archive = HtmlArchive(tmp_path / "archive")
+    archive.put("https://example.com/product1", "<html>1</html>")
+    archive.put("https://example.com/product2", "<html>broken</html>")
+
+    app = ProductProcessorApp(data_dir=tmp_path, http_cache=False, archive=False)
+    (tmp_path / "products_data.txt").write_text('{"stale": true}\n')
+
+    def fake_extract(content, engine=None, structured=False):
+        if "broken" in content:
+            return None
+        return {"product_title": "Guitar", "product_url": "https://example.com/product1"}
+
+    with patch("spiders.product.extract_product_data", side_effect=fake_extract), patch(
+        "spiders.product.emulator"
+    ):
+        assert app.reparse_archive(archive) is True
+
+    lines = (tmp_path / "products_data.txt").read_text().splitlines()
+    assert len(lines) == 1
+    assert '"product_title": "Guitar"' in lines[0]
+    assert app.products_file == "products_data.txt"
+    archive.close()
+
+
+def test_save_product_data_blanks_missing_fields(tmp_path):
+    app = ProductProcessorApp(data_dir=tmp_path, http_cache=False, archive=False)
+    rank_details = {"rank_value": None, "rank_link": None}
+
+    with patch("spiders.product.emulator"):
+        app.save_product_data({"product_title": "Kit", "rank_details": rank_details})
+
+    line = (tmp_path / "products_data.txt").read_text()
+    assert '"ranking": {"rank_link": "", "rank_value": ""}' in line
+
+
+def test_save_product_data_keeps_structured_records_flat(tmp_path):
+    app = ProductProcessorApp(
+        data_dir=tmp_path, http_cache=False, archive=False, structured_data=True
+    )
+
+    with patch("spiders.product.emulator"):
+        app.save_product_data({"product_title": " Kit ", "sku": "1", "rating": None})
+
+    line = (tmp_path / "products_data.txt").read_text()
+    assert line == '{"product_title": "Kit", "rating": "", "sku": "1"}\n'
+
+
+@pytest.mark.asyncio
+async def test_failed_pages_are_retried_then_dead_lettered(mock_product_processor_app):
+    from middlewares.frontier.frontier import DONE, FAILED
+    from middlewares.retry.retry import (
+        Failure,
+        RetryPolicy,
+        TIMEOUT,
+        PARSE_MISS,
+    )
+
+    app = mock_product_processor_app
+    app.browser_pool = FakeBrowserPool()
+    app.save_product_data = MagicMock()
+    app.retry_policy = RetryPolicy(max_attempts=3, base_delay=0.01, max_delay=0.01)
+    flaky, broken, hopeless, fine = [
+        f"https://example.com/{name}" for name in ("flaky", "broken", "hopeless", "fine")
+    ]
+    calls = []
+
+    async def mock_download(open_page, url):
+        await open_page()
+        calls.append(url)
+        if url == flaky and calls.count(flaky) < 3:
+            return Failure(TIMEOUT, "timed out")
+        if url == broken:
+            return Failure(PARSE_MISS, "parser returned no data")
+        if url == hopeless:
+            return Failure(TIMEOUT, "timed out")
+        return {"product_url": url}
+
+    app.download_and_process_page = mock_download
+    endpoints = [flaky, broken, hopeless, fine]
+    app.frontier.add(endpoints)
+
+    await app.process_product_endpoints(endpoints, concurrency=1)
+
+    # Fresh work is not held up behind the retries
+    assert calls.index(fine) < calls.index(flaky, 1)
+    assert calls.count(flaky) == 3
+    assert calls.count(broken) == 1
+    assert calls.count(hopeless) == 3
+    states = app.frontier.states(endpoints)
+    assert states[flaky] == DONE and states[fine] == DONE
+    assert states[broken] == FAILED and states[hopeless] == FAILED
+    assert sorted(app.retries) == sorted([broken, hopeless])
+    dead = {entry["url"]: entry for entry in app.dead_letters.read()}
+    assert dead[broken]["reason"] == PARSE_MISS and dead[broken]["attempts"] == 1
+    assert dead[hopeless]["attempts"] == 3
+
+
+def test_finished_urls_are_requeued_after_recrawl_after(tmp_path):
+    from middlewares.frontier.frontier import PENDING, DONE
+
+    url = "https://example.com/product1"
+    app = ProductProcessorApp(data_dir=tmp_path, recrawl_after=12)
+    app.frontier.add([url])
+    app.frontier.mark_done(url)
+
+    assert app.requeue_finished() == 0
+    app.recrawl_after = 0
+    assert app.requeue_finished() == 1
+    assert app.frontier.states([url]) == {url: PENDING}
+
+    app.frontier.mark_done(url)
+    app.recrawl_after = None
+    assert app.requeue_finished() == 0
+    assert app.frontier.states([url]) == {url: DONE}
+
+
+@pytest.mark.asyncio
+async def test_shards_get_their_own_stores_and_every_option(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+    from middlewares.frontier.frontier import DONE
+
+    shard_apps = []
+
+    async def fake_process(self, endpoints, concurrency=3):
+        shard_apps.append(self)
+        for url in endpoints:
+            self.save_product_data({"product_url": url})
+            self.frontier.mark_done(url)
+        self.success_count = len(endpoints)
+        return True
+
+    def thread_pool(max_workers, mp_context):
+        return ThreadPoolExecutor(max_workers)
+
+    app = ProductProcessorApp(
+        data_dir=tmp_path, http_first=False, parse_workers=0, block_resources=False
+    )
+    endpoints = [f"https://example.com/product{i}" for i in range(8)]
+    app.frontier.add(endpoints)
+
+    with patch("spiders.product.ProcessPoolExecutor", thread_pool), patch.object(
+        ProductProcessorApp, "process_product_endpoints", fake_process
+    ), patch("spiders.product.rate_limiter") as limiter, patch(
+        "spiders.product.emulator"
+    ):
+        limiter.settings.return_value = None
+        assert await app.process_sharded_endpoints(endpoints, workers=2) is True
+
+    frontier_paths = {shard.frontier.db_path for shard in shard_apps}
+    assert len(frontier_paths) == 2 and app.frontier.db_path not in frontier_paths
+    for shard in shard_apps:
+        assert shard.block_resources is False and shard.http_first is False
+        assert shard.archive_dir == app.archive_dir
+        assert shard.dead_letter_path == app.dead_letter_path
+    assert set(app.frontier.states(endpoints).values()) == {DONE}
+    assert len((tmp_path / "products_data.txt").read_text().splitlines()) == 8
+
+
+@pytest.mark.asyncio
+async def test_second_run_revalidates_against_the_http_cache(tmp_path):
+    import httpx
+    from utils.fetchers.http_fetcher import HttpFetcher
+    from middlewares.frontier.frontier import DONE
+
+    url = "https://example.com/product1"
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, text=PRODUCT_HTML, headers={"etag": '"v1"'})
+
+    async def run_once():
+        app = ProductProcessorApp(data_dir=tmp_path, parse_workers=0, recrawl_after=0)
+        app.http_fetcher = HttpFetcher(
+            transport=httpx.MockTransport(handler), cache=app.http_cache
+        )
+        app.browser_pool = FakeBrowserPool()
+        app.save_product_data = MagicMock()
+        with patch.object(
+            ProductProcessorApp,
+            "load_products_endpoints_csv_files",
+            new_callable=AsyncMock,
+            return_value=[url],
+        ):
+            assert await app.get_prod_data() is True
+        assert app.frontier.states([url]) == {url: DONE}
+        return app
+
+    first = await run_once()
+    second = await run_once()
+
+    assert first.fetch_stats["http"] == 1
+    # The finished URL was crawled again and answered from the cache
+    assert second.fetch_stats["not_modified"] == 1
+    assert requests[1].headers["if-none-match"] == '"v1"'
+    record = second.save_product_data.call_args.args[0]
+    assert record["product_title"] == "Yamaha P-45 B"
+    assert second.http_cache.total_bytes == second.http_cache._stored_bytes()
+
+
+@pytest.mark.asyncio
+async def test_sitemap_run_skips_products_with_unchanged_lastmod(
+    tmp_path, monkeypatch
+):
+    import gzip
+    import httpx
+    from main import parse_args, recrawl_hours
+    from spiders.sitemaps import (
+        collect_sitemap_endpoints,
+        load_sitemap_endpoints,
+        SITEMAP_ENDPOINTS_FILE,
+    )
+    from utils.fetchers.http_fetcher import HttpFetcher
+    from middlewares.rate_limit.rate_limiter import rate_limiter
+
+    monkeypatch.setattr(rate_limiter, "wait", AsyncMock(return_value=0))
+    sitemaps = Path(__file__).resolve().parent / "fixtures" / "sitemaps"
+    product_requests = []
+
+    def handler(request):
+        name = request.url.path.rsplit("/", 1)[-1]
+        if name.endswith(".htm"):
+            product_requests.append(str(request.url))
+            return httpx.Response(200, text=PRODUCT_HTML)
+        if name.endswith(".gz"):
+            body = gzip.compress((sitemaps / name[: -len(".gz")]).read_bytes())
+            return httpx.Response(200, content=body)
+        path = sitemaps / name
+        if not path.exists():
+            return httpx.Response(404)
+        return httpx.Response(200, content=path.read_bytes())
+
+    args = parse_args(["--sitemaps", "--data-dir", str(tmp_path)])
+
+    async def run_once():
+        app = ProductProcessorApp(
+            data_dir=tmp_path, parse_workers=0, recrawl_after=recrawl_hours(args)
+        )
+        # Everything finished long before --recrawl-after would requeue it
+        app.frontier.conn.execute("UPDATE urls SET updated_at = 0")
+        assert await collect_sitemap_endpoints(
+            can_run=True,
+            frontier=app.frontier,
+            output_dir=tmp_path,
+            transport=httpx.MockTransport(handler),
+        )
+        app.http_fetcher = HttpFetcher(transport=httpx.MockTransport(handler))
+        app.browser_pool = FakeBrowserPool()
+        app.save_product_data = MagicMock()
+        urls = list(load_sitemap_endpoints(tmp_path / SITEMAP_ENDPOINTS_FILE))
+        with patch.object(
+            ProductProcessorApp,
+            "load_products_endpoints_csv_files",
+            new_callable=AsyncMock,
+            return_value=urls,
+        ):
+            processed = await app.get_prod_data()
+        app.frontier.close()
+        return processed, urls
+
+    processed, urls = await run_once()
+    assert processed is True
+    assert sorted(product_requests) == sorted(urls)
+
+    product_requests.clear()
+    processed, _ = await run_once()
+    # Same lastmod, so nothing is pending however old the finished pages are
+    assert processed is False
+    assert product_requests == []
+
+
+@pytest.mark.asyncio
+async def test_process_work_queue_leases_in_batches(tmp_path):
+    from middlewares.frontier.frontier import DONE
+    from middlewares.work_queue.work_queue import SQLiteWorkQueue
+
+    urls = [f"https://example.com/product{i}" for i in range(9)]
+    app = ProductProcessorApp(data_dir=tmp_path, parse_workers=0, archive=False)
+    app.browser_pool = FakeBrowserPool()
+    app.save_product_data = MagicMock()
+    app.download_and_process_page = AsyncMock(return_value={"product_title": "X"})
+    work_queue = SQLiteWorkQueue(app.frontier, worker_id="node-1")
+    await work_queue.add(urls)
+    lease = work_queue.lease
+    limits = []
+
+    async def recording_lease(limit):
+        limits.append(limit)
+        return await lease(limit)
+
+    work_queue.lease = recording_lease
+    assert await app.process_work_queue(work_queue, concurrency=3) is True
+
+    assert app.frontier.states(urls) == {url: DONE for url in urls}
+    # Batches of three and one empty lease, not one round-trip per page
+    assert set(limits) == {3}
+    assert len(limits) == 4
+    assert not app.leased_urls
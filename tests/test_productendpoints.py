@@ -1,13 +1,26 @@
+import asyncio
 import pytest
 import tempfile
 from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock
 
 from spiders.product_endpoints import (
     load_base_urls,
     is_valid_url,
     parse_endpoints,
     extract_endpoint_name,
+    publish_endpoints,
+    fetch_listing_page,
+    click_through_listing,
+    CsvEndpointWriter,
+    CategoryCrawler,
+    download_category_endpoints,
+    NEW_ITEM_HREFS_SCRIPT,
 )
+from middlewares.concurrency.aimd import AimdController
+from middlewares.rate_limit.rate_limiter import rate_limiter
+from middlewares.retry.retry import DeadLetterLog, Failure, MISSING_CONTAINER
+from utils.fetchers.http_fetcher import FetchResult
 
 
 @pytest.fixture
@@ -70,3 +83,235 @@ def test_parse_endpoints(mock_page_content):
 )
 def test_extract_endpoint_name(url, expected):
     assert extract_endpoint_name(url) == expected
+
+
+@pytest.mark.asyncio
+async def test_publish_endpoints_skips_already_published():
+    endpoint_queue = asyncio.Queue()
+    published = {"https://www.thomann.de/gb/product/1"}
+
+    await publish_endpoints(
+        endpoint_queue,
+        {"https://www.thomann.de/gb/product/1", "https://www.thomann.de/gb/product/2"},
+        published,
+    )
+
+    assert endpoint_queue.qsize() == 1
+    assert endpoint_queue.get_nowait() == "https://www.thomann.de/gb/product/2"
+    assert len(published) == 2
+
+
+@pytest.mark.asyncio
+async def test_publish_endpoints_without_queue():
+    published = set()
+    await publish_endpoints(None, {"https://www.thomann.de/gb/product/1"}, published)
+    assert not published
+
+
+@pytest.fixture
+def no_rate_limit(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "wait", AsyncMock(return_value=0))
+
+
+@pytest.mark.asyncio
+async def test_fetch_listing_page_over_http(no_rate_limit):
+    fetcher = MagicMock()
+    fetcher.fetch = AsyncMock(return_value=FetchResult("<a class='js-item'>", 200, None))
+    context = MagicMock()
+    context.new_page = AsyncMock()
+
+    content = await fetch_listing_page(
+        "https://www.thomann.de/gb/guitars.html?pg=2",
+        fetcher,
+        context,
+        AimdController("test"),
+    )
+
+    assert content == "<a class='js-item'>"
+    context.new_page.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_fetch_listing_page_falls_back_to_browser(no_rate_limit):
+    fetcher = MagicMock()
+    fetcher.fetch = AsyncMock(return_value=FetchResult(None, 429, "bot challenge"))
+    page = AsyncMock()
+    page.content.return_value = "<html>rendered</html>"
+    context = MagicMock()
+    context.new_page = AsyncMock(return_value=page)
+    controller = AimdController("test", initial=4)
+
+    content = await fetch_listing_page(
+        "https://www.thomann.de/gb/guitars.html?pg=2", fetcher, context, controller
+    )
+
+    assert content == "<html>rendered</html>"
+    page.goto.assert_awaited_once()
+    page.close.assert_awaited_once()
+    assert controller.limit == 2
+
+
+class FakeListingPage:
+    # A product grid that appends one batch of items per "load more" click
+    def __init__(self, batches):
+        self.url = "https://www.thomann.de/gb/guitars.html"
+        self.items = list(batches[0])
+        self.pending = [list(batch) for batch in batches[1:]]
+        self.hrefs_read = 0
+
+    async def evaluate(self, script, arg):
+        if script == NEW_ITEM_HREFS_SCRIPT:
+            selector, cursor = arg
+            self.hrefs_read += len(self.items) - cursor
+            return {"cursor": len(self.items), "hrefs": self.items[cursor:]}
+        return len(self.items)
+
+    async def query_selector(self, selector):
+        if not self.pending:
+            return None
+        button = MagicMock()
+        button.scroll_into_view_if_needed = AsyncMock()
+        button.click = AsyncMock(side_effect=self.load_more)
+        return button
+
+    def load_more(self):
+        self.items.extend(self.pending.pop(0))
+
+    async def wait_for_function(self, script, arg=None, timeout=None):
+        return True
+
+    async def content(self):
+        raise AssertionError("the grown DOM must not be serialised")
+
+
+@pytest.mark.asyncio
+async def test_click_through_listing_reads_only_new_items(no_rate_limit):
+    batches = [[f"item_{b}_{i}.htm" for i in range(25)] for b in range(4)]
+    page = FakeListingPage(batches)
+    endpoints = {"https://www.thomann.de/gb/item_0_0.htm"}
+    collected = []
+
+    async def on_new_endpoints(new_endpoints):
+        endpoints.update(new_endpoints)
+        collected.append(len(new_endpoints))
+
+    await click_through_listing(page, endpoints, on_new_endpoints)
+
+    assert len(endpoints) == 100
+    assert collected == [24, 25, 25, 25]
+    # Every item crossed the page boundary exactly once
+    assert page.hrefs_read == 100
+    # Each "load more" click is a request to the origin
+    assert rate_limiter.wait.await_count == 3
+    rate_limiter.wait.assert_awaited_with(page.url)
+
+
+class FakeCollector:
+    # Stands in for ListingResponseCollector: every click's batch arrives
+    # as a grid response
+    def __init__(self, page):
+        self.page = page
+        self.new_items = {}
+        original = page.load_more
+
+        def load_more():
+            batch = page.pending[0]
+            original()
+            for href in batch:
+                self.new_items["https://www.thomann.de/gb/" + href] = {}
+
+        page.load_more = load_more
+
+    async def drain(self):
+        pass
+
+    def take_new(self):
+        new_items, self.new_items = self.new_items, {}
+        return new_items
+
+
+@pytest.mark.asyncio
+async def test_click_through_listing_prefers_grid_responses(no_rate_limit):
+    batches = [[f"item_{b}_{i}.htm" for i in range(25)] for b in range(3)]
+    page = FakeListingPage(batches)
+    endpoints = set()
+
+    async def on_new_endpoints(new_endpoints):
+        endpoints.update(new_endpoints)
+
+    await click_through_listing(page, endpoints, on_new_endpoints, FakeCollector(page))
+
+    assert len(endpoints) == 75
+    # Only the server-rendered first batch was read from the DOM
+    assert page.hrefs_read == 25
+
+
+@pytest.mark.asyncio
+async def test_csv_endpoint_writer_concurrent_saves(mock_temporary_directory):
+    csv_file_path = Path(mock_temporary_directory) / "guitars.csv"
+    csv_file_path.write_text("endpoint\nhttps://example.com/old\n", encoding="utf-8")
+    writer = CsvEndpointWriter(csv_file_path)
+    batches = [
+        {f"https://example.com/p{i}" for i in range(b * 5, b * 5 + 10)}
+        for b in range(4)
+    ]
+    batches.append({"https://example.com/old"})
+
+    await asyncio.gather(*[writer.save(batch) for batch in batches])
+
+    rows = csv_file_path.read_text(encoding="utf-8").splitlines()
+    assert rows[0] == "endpoint"
+    assert rows.count("endpoint") == 1
+    assert len(rows[1:]) == len(set(rows[1:])) == 26
+
+
+@pytest.mark.asyncio
+async def test_category_crawler_limits_concurrent_categories(mock_temporary_directory):
+    crawler = CategoryCrawler(
+        MagicMock(), Path(mock_temporary_directory), MagicMock(), AimdController("t")
+    )
+    running = 0
+    peak = 0
+
+    async def crawl_category(base_url):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        crawler.report_progress(base_url, "done", 1)
+
+    crawler.crawl_category = crawl_category
+    base_urls = [f"https://example.com/gb/cat_{i}.html" for i in range(7)]
+    await crawler.crawl(base_urls, concurrency=3)
+
+    assert peak == 3
+    assert all(entry["state"] == "done" for entry in crawler.progress.values())
+
+
+@pytest.mark.asyncio
+async def test_failed_category_goes_to_the_given_dead_letter_log(
+    tmp_path, monkeypatch
+):
+    monkeypatch.setattr(
+        CategoryCrawler,
+        "load_category",
+        AsyncMock(return_value=Failure(MISSING_CONTAINER, "product grid not visible")),
+    )
+    dead_letters = DeadLetterLog(tmp_path / "run" / "dead_letter.jsonl")
+    base_url = "https://www.thomann.de/gb/guitars.html"
+
+    await download_category_endpoints(
+        [base_url],
+        tmp_path,
+        max_retries=1,
+        browser_pool=MagicMock(),
+        http_fetcher=MagicMock(),
+        dead_letters=dead_letters,
+    )
+
+    entries = dead_letters.read()
+    assert [(entry["url"], entry["kind"]) for entry in entries] == [
+        (base_url, "category")
+    ]
+    assert entries[0]["reason"] == MISSING_CONTAINER
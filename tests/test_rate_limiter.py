@@ -0,0 +1,87 @@
+import httpx
+import pytest
+from middlewares.rate_limit.rate_limiter import RateLimiter, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    async def sleep(self, delay):
+        self.now += delay
+
+
+def make_limiter(**kwargs):
+    clock = FakeClock()
+    limiter = RateLimiter(clock=clock, sleep=clock.sleep, jitter=0, **kwargs)
+    return limiter, clock
+
+
+def test_bucket_allows_burst_then_spaces_requests():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2.0, burst=3, clock=clock)
+
+    assert [bucket.reserve() for _ in range(3)] == [0, 0, 0]
+    assert bucket.reserve() == pytest.approx(0.5)
+    assert bucket.reserve() == pytest.approx(1.0)
+
+    clock.now = 10
+    assert bucket.reserve() == 0
+
+
+@pytest.mark.asyncio
+async def test_wait_runs_at_the_configured_rate():
+    limiter, clock = make_limiter(rate=4.0, burst=1)
+    for _ in range(9):
+        await limiter.wait("https://www.thomann.de/gb/product.htm")
+
+    assert clock.now == pytest.approx(2.0)
+
+
+@pytest.mark.asyncio
+async def test_hosts_have_separate_buckets():
+    limiter, clock = make_limiter(rate=1.0, burst=1)
+    await limiter.wait("https://www.thomann.de/gb/a.htm")
+    await limiter.wait("https://images.thomann.de/pics/a.jpg")
+
+    assert clock.now == 0
+
+
+def test_robots_crawl_delay_lowers_host_rate():
+    limiter, _ = make_limiter(rate=5.0)
+    delay = limiter.apply_robots(
+        "www.thomann.de", "User-agent: *\nCrawl-delay: 2\nDisallow: /cgi-bin/\n"
+    )
+
+    assert delay == 2
+    assert limiter.bucket("www.thomann.de").rate == pytest.approx(0.5)
+    assert limiter.bucket("other.example").rate == 5.0
+
+
+def test_settings_split_the_budget_between_processes():
+    limiter, _ = make_limiter(rate=4.0, burst=8, host_rates={"www.thomann.de": 1.0})
+
+    assert limiter.settings(share=4) == {
+        "rate": 1.0,
+        "burst": 2,
+        "jitter": 0,
+        "host_rates": {"www.thomann.de": 0.25},
+    }
+
+
+@pytest.mark.asyncio
+async def test_load_robots_over_http():
+    def handler(request):
+        assert request.url.path == "/robots.txt"
+        return httpx.Response(200, text="User-agent: *\nCrawl-delay: 4\n")
+
+    limiter, _ = make_limiter()
+    delay = await limiter.load_robots(
+        "https://www.thomann.de/gb/index.html", transport=httpx.MockTransport(handler)
+    )
+
+    assert delay == 4
+    assert limiter.host_rates == {"www.thomann.de": 0.25}
@@ -0,0 +1,68 @@
+import pytest
+from pathlib import Path
+from unittest.mock import MagicMock
+from utils.parsers.engines import PARSER_ENGINES, get_engine
+from utils.parsers.region import element_source, parse_region
+from utils.parsers.schema import PRODUCT_PLAN, PRODUCT_REGION
+from middlewares.metrics.metrics import metrics
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures" / "products"
+CORPUS = sorted(FIXTURES.glob("*.html"))
+
+PAGE = """
+<style>.card.main { color: red }</style>
+<nav class="card-menu main"><div>Menu</div></nav>
+<!-- <div class="card main"> -->
+<section data-note="a > b" class='main card'>
+  <div><div class="inner">One</div></div>
+  <script>var html = "</section><section>";</script>
+  <section>Nested</section>
+</section>
+<footer><div class="card main">Footer</div></footer>
+"""
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def test_element_source_stops_when_the_element_closes():
+    source = element_source(PAGE, ("card", "main"))
+
+    assert source.startswith("<section data-note=\"a > b\" class='main card'>")
+    assert source.endswith("<section>Nested</section>\n</section>")
+    assert "footer" not in source
+
+
+def test_element_source_without_a_closed_element():
+    assert element_source(PAGE, ("card", "missing")) is None
+    assert element_source("<div class='card main'><p>open", ("card", "main")) is None
+
+
+def test_parse_region_falls_back_to_the_page():
+    engine = MagicMock()
+    parse_region(engine, "<p>no product</p>", PRODUCT_REGION)
+
+    engine.parse.assert_called_once_with("<p>no product</p>")
+    assert metrics.counters["parse.region_misses"] == 1
+
+
+@pytest.mark.parametrize("engine", sorted(PARSER_ENGINES))
+@pytest.mark.parametrize("fixture", CORPUS, ids=lambda path: path.stem)
+def test_region_matches_the_full_page(engine, fixture):
+    html = fixture.read_text(encoding="utf-8")
+    engine = get_engine(engine)
+    try:
+        expected = PRODUCT_PLAN.extract(engine, engine.parse(html))
+    except ValueError:
+        expected = None
+
+    source = element_source(html, PRODUCT_REGION)
+    if expected is None:
+        assert source is None
+    else:
+        assert len(source) < len(html)
+        assert PRODUCT_PLAN.extract(engine, engine.parse(source)) == expected
@@ -0,0 +1,80 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from middlewares.metrics.metrics import metrics
+from utils.browser.resource_blocker import ResourceBlocker, TYPICAL_BYTES
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def mock_route(resource_type, url):
+    route = MagicMock()
+    route.request.resource_type = resource_type
+    route.request.url = url
+    route.continue_ = AsyncMock()
+    route.abort = AsyncMock()
+    return route
+
+
+@pytest.mark.parametrize(
+    "resource_type, url, expected",
+    [
+        ("image", "https://images.thomann.de/pics/prod/174334.jpg", "type"),
+        ("font", "https://www.thomann.de/static/font.woff2", "type"),
+        ("script", "https://www.googletagmanager.com/gtm.js", "domain"),
+        ("script", "https://www.thomann.de/static/app.js", None),
+        ("document", "https://www.thomann.de/gb/product.htm", None),
+        ("stylesheet", "https://www.thomann.de/static/app.css", None),
+    ],
+)
+def test_block_reason_defaults(resource_type, url, expected):
+    assert ResourceBlocker().block_reason(resource_type, url) == expected
+
+
+def test_allowed_types_override_blocked_types():
+    blocker = ResourceBlocker(allowed_types={"image"})
+    assert blocker.block_reason("image", "https://images.thomann.de/a.jpg") is None
+
+
+def test_allowed_domains_act_as_allow_list():
+    blocker = ResourceBlocker(allowed_domains={"thomann.de"})
+    assert blocker.block_reason("script", "https://www.thomann.de/app.js") is None
+    assert blocker.block_reason("script", "https://cdn.example.com/x.js") == "domain"
+
+
+@pytest.mark.asyncio
+async def test_handle_route_aborts_and_estimates_bytes():
+    blocker = ResourceBlocker()
+    blocked = mock_route("image", "https://images.thomann.de/pics/prod/1.jpg")
+    allowed = mock_route("document", "https://www.thomann.de/gb/product.htm")
+
+    await blocker.handle_route(blocked)
+    await blocker.handle_route(allowed)
+
+    blocked.abort.assert_called_once()
+    allowed.continue_.assert_called_once()
+    assert metrics.counters["resources.blocked"] == 1
+    assert metrics.counters["resources.blocked_bytes_estimated"] == TYPICAL_BYTES["image"]
+
+
+@pytest.mark.asyncio
+async def test_downloaded_bytes_are_measured():
+    blocker = ResourceBlocker()
+    context = MagicMock()
+    context.route = AsyncMock()
+    await blocker.attach(context)
+    event, handler = context.on.call_args.args
+    request = MagicMock(resource_type="script")
+    request.sizes = AsyncMock(
+        return_value={"responseHeadersSize": 300, "responseBodySize": 12_000}
+    )
+
+    await handler(request)
+
+    assert event == "requestfinished"
+    assert metrics.counters["resources.downloaded_bytes"] == 12_300
+    assert metrics.counters["resources.downloaded_bytes.script"] == 12_300
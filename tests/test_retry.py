@@ -0,0 +1,71 @@
+from middlewares.retry.retry import (
+    Failure,
+    RetryPolicy,
+    RetryQueue,
+    DeadLetterLog,
+    TIMEOUT,
+    PARSE_MISS,
+    MISSING_CONTAINER,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_failure_is_falsy():
+    failure = Failure(TIMEOUT, "page.goto: Timeout 30000ms exceeded")
+    assert not failure
+    assert failure.reason == TIMEOUT
+
+
+def test_policy_retries_only_transient_failures():
+    policy = RetryPolicy(max_attempts=3)
+
+    assert policy.should_retry(TIMEOUT, 1)
+    assert policy.should_retry(MISSING_CONTAINER, 2)
+    assert not policy.should_retry(TIMEOUT, 3)
+    assert not policy.should_retry(PARSE_MISS, 1)
+
+
+def test_policy_backs_off_exponentially_with_jitter():
+    policy = RetryPolicy(base_delay=10, max_delay=60, jitter=0.5)
+
+    for attempts, base in [(1, 10), (2, 20), (3, 40), (4, 60), (8, 60)]:
+        delay = policy.delay(attempts)
+        assert base * 0.5 <= delay <= base * 1.5
+
+
+def test_retry_queue_hands_out_urls_when_due():
+    clock = FakeClock()
+    queue = RetryQueue(clock=clock)
+    queue.schedule("https://example.com/b", 20)
+    queue.schedule("https://example.com/a", 10)
+
+    assert queue.pop_due() is None
+    assert queue.seconds_until_next() == 10
+
+    clock.now = 25
+    assert queue.pop_due() == "https://example.com/a"
+    assert queue.pop_due() == "https://example.com/b"
+    assert len(queue) == 0
+    assert queue.seconds_until_next() is None
+
+
+def test_dead_letter_log_appends_json_lines(tmp_path):
+    log = DeadLetterLog(tmp_path / "dead_letter.jsonl")
+    log.write("https://example.com/a", TIMEOUT, 4, "Timeout 30000ms exceeded")
+    log.write("https://example.com/c", PARSE_MISS, 1, kind="category")
+
+    entries = log.read()
+    assert [entry["url"] for entry in entries] == [
+        "https://example.com/a",
+        "https://example.com/c",
+    ]
+    assert entries[0]["reason"] == TIMEOUT
+    assert entries[0]["attempts"] == 4
+    assert entries[1]["kind"] == "category"
@@ -0,0 +1,124 @@
+import pytest
+from pathlib import Path
+from unittest.mock import MagicMock
+from utils.parsers.engines import get_engine
+from utils.parsers.parse_products import extract_product_data
+from utils.parsers.parse_pool import ParsePool
+from utils.parsers.schema import Scope, Field, SelectorPlan, PRODUCT_PLAN
+from middlewares.metrics.metrics import metrics
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures" / "products"
+
+HTML = (
+    "<div id='card'><h2 class='name'>Mic</h2><a class='link' href='/mic'>Mic</a>"
+    "<ul><li>One</li><li>Two</li></ul></div>"
+)
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def card_plan(*extra_fields, required=False):
+    scopes = (Scope("card", None, "#card", required), Scope("tail", "card", "ul"))
+    fields = (
+        Field("name", "card", "h2.name"),
+        Field("link.text", "card", "a.link"),
+        Field("link.href", "card", "a.link", attr="href"),
+        Field("items", "tail", "li", many=True),
+    ) + extra_fields
+    return SelectorPlan(scopes, fields, name="card")
+
+
+def test_plan_looks_up_shared_selectors_once():
+    plan = card_plan()
+    engine = MagicMock(wraps=get_engine("soup"))
+
+    record = plan.extract(engine, engine.parse(HTML))
+
+    assert record == {
+        "name": "Mic",
+        "link": {"text": "Mic", "href": "/mic"},
+        "items": ["One", "Two"],
+    }
+    selectors = [call.args[1] for call in engine.select_one.call_args_list]
+    assert selectors.count("a.link") == 1
+    assert plan.scopes[0].name == "card"
+
+
+def test_plan_counts_hits_and_misses():
+    plan = card_plan(Field("price", "card", ".price"))
+    engine = get_engine("soup")
+    plan.extract(engine, engine.parse(HTML))
+    plan.extract(engine, engine.parse("<div id='card'><h2 class='name'>X</h2></div>"))
+
+    assert metrics.counters["card.name.hit"] == 2
+    assert metrics.counters["card.price.miss"] == 2
+    assert metrics.counters["card.items.miss"] == 1
+    assert plan.hit_rates()["items"] == 0.5
+    assert plan.hit_rates()["price"] == 0
+
+
+def test_plan_requires_scopes_and_fields():
+    engine = get_engine("soup")
+    with pytest.raises(ValueError):
+        card_plan(required=True).extract(engine, engine.parse("<p></p>"))
+    with pytest.raises(ValueError):
+        card_plan(Field("sku", "card", ".sku", required=True)).extract(
+            engine, engine.parse(HTML)
+        )
+
+
+def test_plan_rejects_unknown_scope():
+    with pytest.raises(ValueError):
+        SelectorPlan((Scope("card", None, "#card"),), (Field("x", "page", "p"),))
+    with pytest.raises(ValueError):
+        SelectorPlan((Scope("card", "page", "#card"),), ())
+
+
+def test_subset_only_locates_the_scopes_it_reads():
+    plan = PRODUCT_PLAN.subset(["price"])
+
+    assert [scope.name for scope in plan.scopes] == [
+        "main",
+        "grid",
+        "right",
+        "sticky",
+        "price_box",
+        "price_wrapper",
+    ]
+    assert PRODUCT_PLAN.subset(("price",)) is plan
+
+    html = (FIXTURES / "yamaha_p_45.html").read_text(encoding="utf-8")
+    engine = get_engine("soup")
+    assert PRODUCT_PLAN.extract(engine, engine.parse(html), names=["price"]) == {
+        "price": "£349"
+    }
+
+
+def test_missing_price_box_keeps_the_record():
+    html = (FIXTURES / "roland_td_07kv.html").read_text(encoding="utf-8")
+    product_data = extract_product_data(html, "soup")
+
+    assert product_data["product_title"] == "Roland TD-07KV"
+    assert product_data["price"] is None
+    assert product_data["shipping_prediction"] is None
+    assert product_data["rank_details"]["rank_value"] == "48"
+    assert metrics.counters["product_schema.price.miss"] == 1
+
+
+@pytest.mark.asyncio
+async def test_worker_hit_rates_reach_the_parent():
+    html = (FIXTURES / "yamaha_p_45.html").read_text(encoding="utf-8")
+    pool = ParsePool(workers=1, name="test_schema")
+    try:
+        await pool.run(extract_product_data, html, "soup")
+        await pool.run(extract_product_data, html, "soup")
+    finally:
+        pool.close()
+
+    assert metrics.counters["product_schema.product_title.hit"] == 2
+    assert PRODUCT_PLAN.hit_rates()["review_count"] == 0
@@ -0,0 +1,38 @@
+import json
+import pytest
+from spiders.sharding import shard_of, shard_endpoints, merge_shard_outputs
+
+
+@pytest.fixture
+def mock_endpoints():
+    return [f"https://www.thomann.de/gb/product_{i}.htm" for i in range(100)]
+
+
+def test_shard_of_is_stable():
+    url = "https://www.thomann.de/gb/beyerdynamic_dt770_pro80_ohm.htm"
+    assert shard_of(url, 16) == shard_of(url, 16)
+    assert 0 <= shard_of(url, 16) < 16
+
+
+def test_shard_endpoints_covers_every_endpoint_once(mock_endpoints):
+    shards = shard_endpoints(mock_endpoints, 4)
+
+    assert len(shards) == 4
+    assert sorted(url for shard in shards for url in shard) == sorted(mock_endpoints)
+    assert all(shard for shard in shards)
+
+
+def test_merge_shard_outputs_dedupes(tmp_path):
+    record_a = json.dumps({"product_url": "a"}, sort_keys=True)
+    record_b = json.dumps({"product_url": "b"}, sort_keys=True)
+    shard_0 = tmp_path / "shard-0.txt"
+    shard_1 = tmp_path / "shard-1.txt"
+    shard_0.write_text(record_a + "\n" + record_b + "\n")
+    shard_1.write_text(record_b + "\n")
+    target = tmp_path / "products_data.txt"
+
+    merged = merge_shard_outputs([shard_0, shard_1], target, set())
+
+    assert merged == 2
+    assert target.read_text().splitlines() == [record_a, record_b]
+    assert not shard_0.exists() and not shard_1.exists()
@@ -0,0 +1,124 @@
+import gzip
+import httpx
+import pytest
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock
+from spiders.sitemaps import (
+    SitemapParser,
+    sitemaps_from_robots,
+    changed_endpoints,
+    collect_sitemap_endpoints,
+    load_sitemap_endpoints,
+    SITEMAP_ENDPOINTS_FILE,
+)
+from middlewares.rate_limit.rate_limiter import rate_limiter
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures" / "sitemaps"
+
+
+@pytest.fixture
+def no_rate_limit(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "wait", AsyncMock(return_value=0))
+
+
+def serve_fixtures(request):
+    name = request.url.path.lstrip("/")
+    if name.endswith(".gz"):
+        body = gzip.compress((FIXTURES / name[: -len(".gz")]).read_bytes())
+        return httpx.Response(
+            200, content=body, headers={"content-type": "application/x-gzip"}
+        )
+    path = FIXTURES / name
+    if not path.exists():
+        return httpx.Response(404)
+    return httpx.Response(200, content=path.read_bytes())
+
+
+def test_sitemaps_from_robots():
+    robots_url = "https://www.thomann.de/robots.txt"
+    robots_txt = (FIXTURES / "robots.txt").read_text()
+    assert sitemaps_from_robots(robots_txt, robots_url) == [
+        "https://www.thomann.de/sitemap_index.xml"
+    ]
+
+
+@pytest.mark.parametrize("chunk_size", [7, 64, 100000])
+@pytest.mark.parametrize("compressed", [False, True])
+def test_sitemap_parser_is_incremental(chunk_size, compressed):
+    body = (FIXTURES / "sitemap_products_1.xml").read_bytes()
+    if compressed:
+        body = gzip.compress(body)
+
+    parser = SitemapParser()
+    entries = []
+    for i in range(0, len(body), chunk_size):
+        entries.extend(parser.feed(body[i : i + chunk_size]))
+    entries.extend(parser.close())
+
+    assert [entry.kind for entry in entries] == ["url", "url", "url"]
+    assert entries[0].loc == "https://www.thomann.de/gb/fender_player_strat.htm"
+    assert entries[0].lastmod == "2026-09-14T08:30:00+02:00"
+    assert entries[2].lastmod is None
+
+
+def test_changed_endpoints_compares_lastmod():
+    previous = {
+        "a.htm": "2026-09-14T08:30:00+02:00",
+        "b.htm": "2026-09-20",
+        "c.htm": "",
+    }
+    current = {
+        # Same instant in another zone
+        "a.htm": "2026-09-14T06:30:00Z",
+        "b.htm": "2026-09-21",
+        "c.htm": "2026-09-21",
+        "d.htm": "2026-09-21",
+    }
+    assert changed_endpoints(previous, current) == ["b.htm"]
+
+
+@pytest.mark.asyncio
+async def test_collect_sitemap_endpoints_from_fixtures(tmp_path, no_rate_limit):
+    frontier = MagicMock()
+    result = await collect_sitemap_endpoints(
+        can_run=True,
+        frontier=frontier,
+        output_dir=tmp_path,
+        transport=httpx.MockTransport(serve_fixtures),
+    )
+
+    assert result is True
+    endpoints = load_sitemap_endpoints(tmp_path / SITEMAP_ENDPOINTS_FILE)
+    # Category pages are not products
+    assert sorted(endpoints) == [
+        "https://www.thomann.de/gb/beyerdynamic_dt_770_pro.htm",
+        "https://www.thomann.de/gb/fender_player_strat.htm",
+        "https://www.thomann.de/gb/gibson_les_paul_standard.htm",
+        "https://www.thomann.de/gb/roland_td_07kv.htm",
+        "https://www.thomann.de/gb/yamaha_p_45.htm",
+    ]
+    assert endpoints["https://www.thomann.de/gb/yamaha_p_45.htm"] == (
+        "2026-10-02T12:00:00Z"
+    )
+    frontier.requeue.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_collect_sitemap_endpoints_requeues_changed(tmp_path, no_rate_limit):
+    changed_url = "https://www.thomann.de/gb/gibson_les_paul_standard.htm"
+    (tmp_path / SITEMAP_ENDPOINTS_FILE).write_text(
+        "endpoint,lastmod\n"
+        f"{changed_url},2026-09-01\n"
+        "https://www.thomann.de/gb/yamaha_p_45.htm,2026-10-02T12:00:00Z\n",
+        encoding="utf-8",
+    )
+    frontier = MagicMock()
+
+    await collect_sitemap_endpoints(
+        can_run=True,
+        frontier=frontier,
+        output_dir=tmp_path,
+        transport=httpx.MockTransport(serve_fixtures),
+    )
+
+    frontier.requeue.assert_called_once_with([changed_url])
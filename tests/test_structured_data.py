@@ -0,0 +1,92 @@
+import re
+import pytest
+from pathlib import Path
+from unittest.mock import MagicMock
+from utils.parsers.engines import PARSER_ENGINES, get_engine
+from utils.parsers.parse_products import extract_product_data
+from utils.parsers.structured_data import (
+    scan_structured_data,
+    extract_structured_data,
+)
+from middlewares.metrics.metrics import metrics
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures" / "products"
+LD_JSON = re.compile(r"<script type=\"application/ld\+json\">.*?</script>", re.S)
+
+
+def read_fixture(name):
+    return (FIXTURES / f"{name}.html").read_text(encoding="utf-8")
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def test_structured_record_skips_the_dom():
+    engine = MagicMock(wraps=get_engine("soup"))
+    record = extract_structured_data(read_fixture("beyerdynamic_dt_770_pro"), engine)
+
+    assert record == {
+        "product_title": "beyerdynamic DT-770 Pro 80 Ohm",
+        "sku": "172479",
+        "price": "115.00",
+        "currency": "GBP",
+        "availability": "InStock",
+        "rating": "4.7",
+        "review_count": "3830",
+        "product_url": "https://www.thomann.de/gb/beyerdynamic_dt_770_pro_80_ohm.htm",
+        "reviews_url": "https://www.thomann.de/gb/beyerdynamic_dt_770_pro_80_ohm"
+        "_reviews.htm?page=1&order=latest&reviewlang%5B%5D=all",
+    }
+    engine.parse.assert_not_called()
+    assert metrics.counters["structured_data.pages"] == 1
+    assert "structured_data.dom_fallbacks" not in metrics.counters
+
+
+@pytest.mark.parametrize("engine", sorted(PARSER_ENGINES))
+def test_missing_fields_fall_back_to_the_dom(engine):
+    html = LD_JSON.sub("", read_fixture("yamaha_p_45"))
+    record = extract_product_data(html, engine, structured=True)
+
+    assert record["product_title"] == "Yamaha P-45 B"
+    assert record["price"] == "349"
+    # Still read from the microdata in the price box
+    assert record["currency"] == "GBP"
+    assert record["sku"] is None
+    assert metrics.counters["structured_data.dom_fallbacks"] == 1
+    assert metrics.counters["structured_fallback.price.hit"] == 1
+
+
+def test_pages_without_structured_data_or_product_are_dropped():
+    assert extract_product_data(read_fixture("discontinued"), structured=True) is None
+
+
+def test_scan_reads_graphs_offer_lists_and_microdata():
+    html = """
+    <meta itemprop='name' content='Breadcrumb &amp; co'>
+    <script type="application/ld+json">not json</script>
+    <script type='application/ld+json'>
+      {"@graph": [
+        {"@type": "BreadcrumbList", "name": "Home"},
+        {"@type": ["Product"], "name": "Mic", "sku": 42,
+         "offers": [{"@type": "AggregateOffer", "lowPrice": 99.5,
+                     "availability": "http://schema.org/OutOfStock"}]}
+      ]}
+    </script>
+    <link itemprop="availability" href="https://schema.org/InStock">
+    <meta content=GBP itemprop=priceCurrency>
+    <meta itemprop="ratingValue" content="4.5">
+    """
+    assert scan_structured_data(html) == {
+        "product_title": "Mic",
+        "sku": "42",
+        "price": "99.5",
+        "currency": "GBP",
+        "availability": "OutOfStock",
+        "rating": "4.5",
+        "review_count": None,
+        "product_url": None,
+    }
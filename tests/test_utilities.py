@@ -1,11 +1,20 @@
+import json
 import pytest
-from unittest.mock import AsyncMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
 from utils.utilities.utilities import (
     randomize_timeout,
     random_small_timeout,
     click_consent_button,
+    ensure_consent,
+    CONSENT_BUTTON_SELECTOR,
+    CONSENT_TIMEOUT,
+    LATE_CONSENT_TIMEOUT,
 )
+from middlewares.rate_limit.rate_limiter import rate_limiter
+
+PAGE_URL = "https://www.thomann.de/gb/index.html"
 
 
 def test_randomize_timeout():
@@ -25,19 +34,21 @@ def test_random_small_timeout():
 
 
 @pytest.mark.asyncio
-async def test_click_consent_button():
+async def test_click_consent_button(no_rate_limit):
     # Mocking the page object and its methods
     mock_page = AsyncMock()
+    mock_page.url = PAGE_URL
     mock_button = AsyncMock()
     mock_page.wait_for_selector.return_value = mock_button
 
     # Mock the logger
-    with patch("middlewares.logger.logger.custom_logger") as mock_logger:
+    with patch("utils.utilities.utilities.custom_logger") as mock_logger:
         result = await click_consent_button(mock_page)
         mock_page.wait_for_selector.assert_called_once_with(
             ".consent-button:has-text('Alright')", timeout=5000
         )
         mock_button.click.assert_called_once()
+        no_rate_limit.assert_awaited_once_with(PAGE_URL)
         mock_logger.assert_called_with(message="cookies accepted", log_type="info")
         assert result is True
 
@@ -49,7 +60,7 @@ async def test_click_consent_button_no_button():
     mock_page.wait_for_selector.return_value = None
 
     # Mock the logger
-    with patch("middlewares.logger.logger.custom_logger") as mock_logger:
+    with patch("utils.utilities.utilities.custom_logger") as mock_logger:
         result = await click_consent_button(mock_page)
         mock_page.wait_for_selector.assert_called_once_with(
             ".consent-button:has-text('Alright')", timeout=5000
@@ -59,13 +70,13 @@ async def test_click_consent_button_no_button():
 
 
 @pytest.mark.asyncio
-async def test_click_consent_button_exception():
+async def test_click_consent_button_exception(no_rate_limit):
     # Mocking the page object and its methods
     mock_page = AsyncMock()
     mock_page.wait_for_selector.side_effect = Exception("Test exception")
 
     # Mock the logger
-    with patch("middlewares.logger.logger.custom_logger") as mock_logger:
+    with patch("utils.utilities.utilities.custom_logger") as mock_logger:
         result = await click_consent_button(mock_page)
         mock_page.wait_for_selector.assert_called_once_with(
             ".consent-button:has-text('Alright')", timeout=5000
@@ -74,4 +85,85 @@ async def test_click_consent_button_exception():
             message="Error occured in <click_consent_button>: Test exception",
             log_type="warn",
         )
+        no_rate_limit.assert_not_awaited()
         assert result is False
+
+
+@pytest.fixture
+def no_rate_limit(monkeypatch):
+    wait = AsyncMock(return_value=0)
+    monkeypatch.setattr(rate_limiter, "wait", wait)
+    return wait
+
+
+@pytest.fixture
+def mock_consent_page(no_rate_limit):
+    mock_page = AsyncMock()
+    mock_page.url = PAGE_URL
+    mock_page.context = MagicMock()
+    mock_page.context.storage_state = AsyncMock(
+        return_value={"cookies": [{"name": "consent"}], "origins": []}
+    )
+    return mock_page
+
+
+@pytest.mark.asyncio
+async def test_ensure_consent_first_time_saves_state(
+    mock_consent_page, no_rate_limit, tmp_path
+):
+    state_path = tmp_path / "storage_state.json"
+    mock_consent_page.wait_for_selector.return_value = AsyncMock()
+
+    result = await ensure_consent(mock_consent_page, state_path)
+
+    assert result is True
+    # The accept click is spent from the same token bucket as page loads
+    no_rate_limit.assert_awaited_once_with(PAGE_URL)
+    mock_consent_page.wait_for_selector.assert_called_once_with(
+        CONSENT_BUTTON_SELECTOR, timeout=CONSENT_TIMEOUT
+    )
+    assert json.loads(state_path.read_text())["cookies"] == [{"name": "consent"}]
+
+
+@pytest.mark.asyncio
+async def test_ensure_consent_without_banner_still_saves_state(
+    mock_consent_page, no_rate_limit, tmp_path
+):
+    state_path = tmp_path / "storage_state.json"
+    mock_consent_page.wait_for_selector.side_effect = PlaywrightTimeoutError("timeout")
+
+    assert await ensure_consent(mock_consent_page, state_path) is True
+    no_rate_limit.assert_not_awaited()
+    # Later pages see the saved state and only wait briefly
+    assert state_path.exists()
+
+
+@pytest.mark.asyncio
+async def test_ensure_consent_waits_briefly_with_saved_state(
+    mock_consent_page, tmp_path
+):
+    state_path = tmp_path / "storage_state.json"
+    state_path.write_text(json.dumps({"cookies": [], "origins": []}))
+    mock_consent_page.wait_for_selector.side_effect = PlaywrightTimeoutError("timeout")
+
+    result = await ensure_consent(mock_consent_page, state_path)
+
+    assert result is True
+    mock_consent_page.wait_for_selector.assert_called_once_with(
+        CONSENT_BUTTON_SELECTOR, timeout=LATE_CONSENT_TIMEOUT
+    )
+    mock_consent_page.context.storage_state.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_ensure_consent_clicks_late_banner(mock_consent_page, tmp_path):
+    state_path = tmp_path / "storage_state.json"
+    state_path.write_text(json.dumps({"cookies": [], "origins": []}))
+    mock_button = AsyncMock()
+    mock_consent_page.wait_for_selector.return_value = mock_button
+
+    result = await ensure_consent(mock_consent_page, state_path)
+
+    assert result is True
+    mock_button.click.assert_called_once()
+    assert json.loads(state_path.read_text())["cookies"] == [{"name": "consent"}]
@@ -0,0 +1,188 @@
+import asyncio
+import pytest
+from middlewares.frontier.frontier import Frontier, PENDING, DONE, FAILED
+from middlewares.work_queue.work_queue import (
+    WorkQueue,
+    SQLiteWorkQueue,
+    WorkQueueServer,
+    RemoteWorkQueue,
+    build_work_queue,
+)
+
+
+@pytest.fixture
+def frontier(tmp_path):
+    frontier = Frontier(tmp_path / "frontier.db")
+    yield frontier
+    frontier.close()
+
+
+@pytest.fixture
+def mock_endpoints():
+    return ["https://example.com/product1", "https://example.com/product2"]
+
+
+@pytest.mark.asyncio
+async def test_sqlite_queue_leases_are_exclusive(frontier, mock_endpoints):
+    worker_a = SQLiteWorkQueue(frontier, worker_id="a", lease_seconds=60)
+    worker_b = SQLiteWorkQueue(frontier, worker_id="b", lease_seconds=60)
+    await worker_a.add(mock_endpoints)
+
+    leased_a = await worker_a.lease(1)
+    leased_b = await worker_b.lease(5)
+
+    assert len(leased_a) == 1
+    assert leased_b == [url for url in mock_endpoints if url not in leased_a]
+    assert await worker_a.lease(5) == []
+
+
+@pytest.mark.asyncio
+async def test_sqlite_queue_reassigns_expired_lease(frontier, mock_endpoints):
+    dead_worker = SQLiteWorkQueue(frontier, worker_id="dead", lease_seconds=0.05)
+    live_worker = SQLiteWorkQueue(frontier, worker_id="live", lease_seconds=60)
+    await dead_worker.add(mock_endpoints[:1])
+
+    assert await dead_worker.lease(1) == mock_endpoints[:1]
+    assert await live_worker.lease(1) == []
+
+    await asyncio.sleep(0.1)
+    assert await live_worker.lease(1) == mock_endpoints[:1]
+
+
+@pytest.mark.asyncio
+async def test_sqlite_queue_extend_keeps_lease(frontier, mock_endpoints):
+    worker = SQLiteWorkQueue(frontier, worker_id="a", lease_seconds=0.2)
+    other = SQLiteWorkQueue(frontier, worker_id="b", lease_seconds=60)
+    await worker.add(mock_endpoints[:1])
+    leased = await worker.lease(1)
+
+    worker.lease_seconds = 60
+    await worker.extend(leased)
+    await asyncio.sleep(0.3)
+
+    assert await other.lease(1) == []
+
+
+@pytest.mark.asyncio
+async def test_sqlite_queue_drains(frontier, mock_endpoints):
+    worker = SQLiteWorkQueue(frontier, worker_id="a")
+    await worker.add(mock_endpoints)
+    first, second = await worker.lease(2)
+
+    await worker.ack(first)
+    assert not await worker.is_drained()
+    await worker.fail(second, "timeout")
+
+    assert await worker.is_drained()
+    assert frontier.states(mock_endpoints) == {first: DONE, second: FAILED}
+
+
+@pytest.mark.asyncio
+async def test_expired_worker_cannot_finish_a_released_url(frontier, mock_endpoints):
+    dead_worker = SQLiteWorkQueue(frontier, worker_id="dead", lease_seconds=0.05)
+    live_worker = SQLiteWorkQueue(frontier, worker_id="live", lease_seconds=60)
+    url = mock_endpoints[0]
+    await dead_worker.add([url])
+    await dead_worker.lease(1)
+    await asyncio.sleep(0.1)
+
+    # Reclaimed, not yet leased again
+    await live_worker.counts()
+    assert await dead_worker.ack(url) is False
+    assert frontier.states([url]) == {url: PENDING}
+
+    assert await live_worker.lease(1) == [url]
+    assert await dead_worker.fail(url, "timeout") is False
+    assert await live_worker.ack(url) is True
+    assert frontier.states([url]) == {url: DONE}
+
+
+def test_work_queue_is_abstract():
+    class Incomplete(WorkQueue):
+        async def add(self, urls):
+            return 0
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+@pytest.mark.asyncio
+async def test_tcp_queue_round_trip(frontier, mock_endpoints):
+    server = await WorkQueueServer(frontier, "127.0.0.1", 0).start()
+    client = RemoteWorkQueue("127.0.0.1", server.port, worker_id="node-1")
+    try:
+        assert await client.add(mock_endpoints) == 2
+        leased = await client.lease(5)
+        assert sorted(leased) == sorted(mock_endpoints)
+
+        for url in leased:
+            await client.ack(url)
+        assert await client.is_drained()
+    finally:
+        await client.close()
+        await server.close()
+
+
+@pytest.mark.asyncio
+async def test_tcp_queue_reassigns_dead_node(frontier, mock_endpoints):
+    server = await WorkQueueServer(frontier, "127.0.0.1", 0).start()
+    dead_node = RemoteWorkQueue(
+        "127.0.0.1", server.port, worker_id="dead", lease_seconds=0.05
+    )
+    live_node = RemoteWorkQueue("127.0.0.1", server.port, worker_id="live")
+    try:
+        await dead_node.add(mock_endpoints[:1])
+        assert await dead_node.lease(1) == mock_endpoints[:1]
+        await dead_node.close()
+
+        await asyncio.sleep(0.1)
+        assert await live_node.lease(1) == mock_endpoints[:1]
+    finally:
+        await live_node.close()
+        await server.close()
+
+
+@pytest.mark.asyncio
+async def test_tcp_queue_checks_lease_owner(frontier, mock_endpoints):
+    server = await WorkQueueServer(frontier, "127.0.0.1", 0).start()
+    owner = RemoteWorkQueue("127.0.0.1", server.port, worker_id="owner")
+    other = RemoteWorkQueue("127.0.0.1", server.port, worker_id="other")
+    try:
+        await owner.add(mock_endpoints[:1])
+        assert await owner.lease(1) == mock_endpoints[:1]
+
+        assert await other.ack(mock_endpoints[0]) is False
+        assert await owner.ack(mock_endpoints[0]) is True
+    finally:
+        await owner.close()
+        await other.close()
+        await server.close()
+
+
+@pytest.mark.asyncio
+async def test_tcp_queue_requires_token(frontier, mock_endpoints):
+    with pytest.raises(ValueError):
+        await WorkQueueServer(frontier, "0.0.0.0", 0).start()
+
+    server = await WorkQueueServer(frontier, "127.0.0.1", 0, token="secret").start()
+    stranger = RemoteWorkQueue("127.0.0.1", server.port, token="guess")
+    worker = RemoteWorkQueue("127.0.0.1", server.port, token="secret")
+    try:
+        with pytest.raises(RuntimeError):
+            await stranger.add(mock_endpoints)
+        assert await worker.add(mock_endpoints) == 2
+    finally:
+        await stranger.close()
+        await worker.close()
+        await server.close()
+
+
+def test_build_work_queue(frontier):
+    assert isinstance(build_work_queue("sqlite", frontier), SQLiteWorkQueue)
+
+    remote = build_work_queue("tcp://10.0.0.5:9000", token="secret")
+    assert isinstance(remote, RemoteWorkQueue)
+    assert (remote.host, remote.port, remote.token) == ("10.0.0.5", 9000, "secret")
+
+    with pytest.raises(ValueError):
+        build_work_queue("redis://localhost")
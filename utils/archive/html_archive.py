@@ -0,0 +1,172 @@
+import time
+import sqlite3
+import threading
+import hashlib
+from pathlib import Path
+import zstandard
+from middlewares.metrics.metrics import metrics
+
+root_dir = Path(__file__).resolve().parent.parent.parent
+ARCHIVE_DIR = root_dir / "data" / "archive"
+SEGMENT_MAX_BYTES = 256 * 1024**2
+COMPRESSION_LEVEL = 10
+
+
+def content_hash(html):
+    return hashlib.blake2b(html.encode("utf-8"), digest_size=20).hexdigest()
+
+
+class HtmlArchive:
+    # Raw page HTML, kept so the parser can be re-run without the network.
+    # Each distinct page body is stored once as its own zstd frame, appended
+    # to packed segment files; a SQLite index maps hash -> (segment, offset)
+    # and (url, fetched_at) -> hash.
+    def __init__(self, archive_dir=ARCHIVE_DIR, segment_max_bytes=SEGMENT_MAX_BYTES):
+        self.archive_dir = Path(archive_dir)
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        self.segment_max_bytes = segment_max_bytes
+        self.compressor = zstandard.ZstdCompressor(level=COMPRESSION_LEVEL)
+        self.decompressor = zstandard.ZstdDecompressor()
+        # put() runs in worker threads, off the event loop; the lock keeps
+        # one transaction (and one compressor user) at a time
+        self.lock = threading.Lock()
+
+        self.conn = sqlite3.connect(
+            str(self.archive_dir / "index.db"),
+            timeout=30,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS blobs (
+                hash TEXT PRIMARY KEY,
+                segment INTEGER NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL,
+                raw_size INTEGER NOT NULL
+            )
+            """
+        )
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                hash TEXT NOT NULL,
+                PRIMARY KEY (url, fetched_at)
+            )
+            """
+        )
+
+    def segment_path(self, segment):
+        return self.archive_dir / f"segment-{segment:05d}.zst"
+
+    def put(self, url, html, fetched_at=None):
+        digest = content_hash(html)
+        fetched_at = fetched_at if fetched_at is not None else time.time()
+
+        # The write lock also serialises appends from other shard processes
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                known = self.conn.execute(
+                    "SELECT 1 FROM blobs WHERE hash = ?", (digest,)
+                ).fetchone()
+                if known:
+                    metrics.incr("archive.deduplicated")
+                else:
+                    self._append_blob(digest, html)
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO pages (url, fetched_at, hash) "
+                    "VALUES (?, ?, ?)",
+                    (url, fetched_at, digest),
+                )
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+        metrics.incr("archive.pages")
+        return digest
+
+    def _append_blob(self, digest, html):
+        raw = html.encode("utf-8")
+        frame = self.compressor.compress(raw)
+
+        row = self.conn.execute("SELECT MAX(segment) FROM blobs").fetchone()
+        segment = row[0] if row[0] is not None else 0
+        path = self.segment_path(segment)
+        if path.exists() and path.stat().st_size + len(frame) > self.segment_max_bytes:
+            segment += 1
+            path = self.segment_path(segment)
+
+        with path.open(mode="ab") as f:
+            offset = f.tell()
+            f.write(frame)
+        self.conn.execute(
+            "INSERT INTO blobs (hash, segment, offset, length, raw_size) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (digest, segment, offset, len(frame), len(raw)),
+        )
+        metrics.incr("archive.bytes_raw", len(raw))
+        metrics.incr("archive.bytes_stored", len(frame))
+
+    def get(self, digest):
+        row = self.conn.execute(
+            "SELECT segment, offset, length FROM blobs WHERE hash = ?", (digest,)
+        ).fetchone()
+        if row is None:
+            return None
+        segment, offset, length = row
+        with self.segment_path(segment).open(mode="rb") as f:
+            f.seek(offset)
+            return self.decompressor.decompress(f.read(length)).decode("utf-8")
+
+    def latest(self, url):
+        row = self.conn.execute(
+            "SELECT hash FROM pages WHERE url = ? ORDER BY fetched_at DESC LIMIT 1",
+            (url,),
+        ).fetchone()
+        return self.get(row[0]) if row else None
+
+    def iter_latest(self):
+        # Newest copy of every URL, in segment order so each segment file is
+        # read front to back once
+        rows = self.conn.execute(
+            """
+            SELECT p.url, b.segment, b.offset, b.length
+            FROM pages p
+            JOIN blobs b ON b.hash = p.hash
+            WHERE p.fetched_at = (
+                SELECT MAX(fetched_at) FROM pages WHERE url = p.url
+            )
+            ORDER BY b.segment, b.offset
+            """
+        ).fetchall()
+
+        current_segment, f = None, None
+        try:
+            for url, segment, offset, length in rows:
+                if segment != current_segment:
+                    if f:
+                        f.close()
+                    f = self.segment_path(segment).open(mode="rb")
+                    current_segment = segment
+                f.seek(offset)
+                yield url, self.decompressor.decompress(f.read(length)).decode("utf-8")
+        finally:
+            if f:
+                f.close()
+
+    def counts(self):
+        pages = self.conn.execute("SELECT COUNT(DISTINCT url) FROM pages").fetchone()[0]
+        blobs, raw, stored = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(raw_size), 0), COALESCE(SUM(length), 0) "
+            "FROM blobs"
+        ).fetchone()
+        return {"urls": pages, "blobs": blobs, "raw_bytes": raw, "stored_bytes": stored}
+
+    def close(self):
+        self.conn.close()
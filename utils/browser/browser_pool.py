@@ -0,0 +1,215 @@
+import asyncio
+from contextlib import asynccontextmanager
+from playwright.async_api import async_playwright, Error as PlaywrightError
+from utils.browser.resource_blocker import ResourceBlocker
+from utils.browser.session_state import (
+    SESSION_STATE_PATH,
+    has_session_state,
+    load_session_state,
+)
+from middlewares.logger.logger import custom_logger, initialize_logging
+
+initialize_logging()
+
+MAX_PAGES_PER_BROWSER = 200
+MAX_IDLE_CONTEXTS = 4
+DEFAULT_LAUNCH_ARGS = [
+    "--disable-web-security",
+    "--disable-features=IsolateOrigins,site-per-process",
+]
+
+
+class BrowserPool:
+    # One Chromium per run, shared by every stage. Contexts are handed out
+    # per unit of work and recycled; the browser is replaced once it has
+    # loaded max_pages_per_browser pages to cap memory growth. Loads are
+    # counted rather than tabs because workers reuse their pages.
+    def __init__(
+        self,
+        playwright,
+        max_pages_per_browser=MAX_PAGES_PER_BROWSER,
+        max_idle_contexts=MAX_IDLE_CONTEXTS,
+        headless=True,
+        launch_args=None,
+        block_resources=True,
+        resource_blocker=None,
+        session_state_path=SESSION_STATE_PATH,
+    ):
+        self.playwright = playwright
+        self.max_pages_per_browser = max_pages_per_browser
+        self.max_idle_contexts = max_idle_contexts
+        self.headless = headless
+        self.launch_args = launch_args if launch_args else DEFAULT_LAUNCH_ARGS
+        self.session_state_path = session_state_path
+        self.resource_blocker = None
+        if block_resources:
+            self.resource_blocker = (
+                resource_blocker if resource_blocker else ResourceBlocker()
+            )
+        self.browser = None
+        self.pages_served = {}
+        self.open_contexts = {}
+        self.context_browser = {}
+        self.context_options = {}
+        self.idle_contexts = []
+        self.lock = asyncio.Lock()
+        self.launch_count = 0
+
+    async def _current_browser(self):
+        async with self.lock:
+            if (
+                self.browser is not None
+                and self.pages_served[self.browser] >= self.max_pages_per_browser
+            ):
+                await self._retire_browser(self.browser)
+
+            if self.browser is None:
+                self.browser = await self.playwright.chromium.launch(
+                    headless=self.headless, args=self.launch_args
+                )
+                self.pages_served[self.browser] = 0
+                self.open_contexts[self.browser] = 0
+                self.launch_count += 1
+                custom_logger(
+                    f"Browser launched (#{self.launch_count}).", log_type="info"
+                )
+            return self.browser
+
+    async def _retire_browser(self, browser):
+        custom_logger(
+            f"Recycling browser after {self.pages_served[browser]} pages.",
+            log_type="info",
+        )
+        self.browser = None
+        for context in [c for c in self.idle_contexts if self.context_browser[c] is browser]:
+            self.idle_contexts.remove(context)
+            await self._close_context(context)
+        if self.open_contexts[browser] == 0:
+            await self._close_browser(browser)
+
+    def _watch_page(self, browser, page):
+        page.on("load", lambda _: self._count_page(browser))
+
+    def _count_page(self, browser):
+        if browser in self.pages_served:
+            self.pages_served[browser] += 1
+
+    async def new_context(self, **options):
+        browser = await self._current_browser()
+
+        for context in self.idle_contexts:
+            if (
+                self.context_browser[context] is browser
+                and self.context_options[context] == options
+            ):
+                self.idle_contexts.remove(context)
+                self.open_contexts[browser] += 1
+                return context
+
+        create_options = dict(options)
+        # Start from the saved session so consent is already given
+        if (
+            self.session_state_path
+            and "storage_state" not in create_options
+            and has_session_state(self.session_state_path)
+        ):
+            create_options["storage_state"] = str(self.session_state_path)
+
+        context = await browser.new_context(**create_options)
+        context.on("page", lambda page: self._watch_page(browser, page))
+        if self.resource_blocker:
+            await self.resource_blocker.attach(context)
+        self.context_browser[context] = browser
+        self.context_options[context] = options
+        self.open_contexts[browser] += 1
+        return context
+
+    async def release(self, context):
+        browser = self.context_browser.get(context)
+        if browser is None:
+            return
+        self.open_contexts[browser] -= 1
+
+        if browser is self.browser and len(self.idle_contexts) < self.max_idle_contexts:
+            try:
+                # Recycle: drop pages and cookies so the next user starts clean
+                for page in list(context.pages):
+                    await page.close()
+                await context.clear_cookies()
+                await self._restore_session(context)
+                self.idle_contexts.append(context)
+                return
+            except PlaywrightError as e:
+                custom_logger(f"Could not recycle context: {e}", log_type="warn")
+
+        await self._close_context(context)
+        if browser is not self.browser and self.open_contexts[browser] == 0:
+            await self._close_browser(browser)
+
+    async def _restore_session(self, context):
+        if not self.session_state_path:
+            return
+        state = load_session_state(self.session_state_path)
+        if state and state.get("cookies"):
+            await context.add_cookies(state["cookies"])
+
+    async def renew(self, context):
+        # Long-lived contexts call this between batches to move onto a fresh
+        # browser once the current one has been recycled
+        browser = self.context_browser.get(context)
+        current = await self._current_browser()
+        if browser is current:
+            return context
+        options = self.context_options[context]
+        await self.release(context)
+        return await self.new_context(**options)
+
+    @asynccontextmanager
+    async def context(self, **options):
+        context = await self.new_context(**options)
+        try:
+            yield context
+        finally:
+            await self.release(context)
+
+    async def _close_context(self, context):
+        self.context_browser.pop(context, None)
+        self.context_options.pop(context, None)
+        try:
+            await context.close()
+        except PlaywrightError:
+            pass
+
+    async def _close_browser(self, browser):
+        self.pages_served.pop(browser, None)
+        self.open_contexts.pop(browser, None)
+        try:
+            await browser.close()
+        except PlaywrightError:
+            pass
+
+    async def close(self):
+        for context in list(self.context_browser):
+            await self._close_context(context)
+        self.idle_contexts = []
+        for browser in list(self.pages_served):
+            await self._close_browser(browser)
+        self.browser = None
+
+
+@asynccontextmanager
+async def use_browser_pool(
+    browser_pool=None, playwright_factory=async_playwright, **pool_options
+):
+    # Reuse the run's pool when one is passed in, otherwise own one, built
+    # with pool_options, for the duration of the block
+    if browser_pool is not None:
+        yield browser_pool
+        return
+
+    async with playwright_factory() as p:
+        pool = BrowserPool(p, **pool_options)
+        try:
+            yield pool
+        finally:
+            await pool.close()
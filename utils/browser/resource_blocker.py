@@ -0,0 +1,102 @@
+from urllib.parse import urlparse
+from playwright.async_api import Error as PlaywrightError
+from middlewares.metrics.metrics import metrics
+
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font"}
+BLOCKED_DOMAINS = {
+    "google-analytics.com",
+    "googletagmanager.com",
+    "googleadservices.com",
+    "doubleclick.net",
+    "facebook.net",
+    "facebook.com",
+    "connect.facebook.net",
+    "bat.bing.com",
+    "hotjar.com",
+    "criteo.com",
+    "criteo.net",
+    "adnxs.com",
+    "trustpilot.com",
+}
+
+# Blocked requests are never downloaded, so their size cannot be measured.
+# These typical transfer sizes only give an estimate of what was avoided;
+# the bytes actually downloaded are measured separately.
+TYPICAL_BYTES = {
+    "image": 45_000,
+    "media": 400_000,
+    "font": 35_000,
+    "script": 30_000,
+    "stylesheet": 15_000,
+    "xhr": 3_000,
+    "fetch": 3_000,
+}
+DEFAULT_TYPICAL_BYTES = 5_000
+
+
+def domain_matches(host, domains):
+    return any(host == domain or host.endswith("." + domain) for domain in domains)
+
+
+class ResourceBlocker:
+    # Aborts requests the scraper never uses. A request is blocked when its
+    # host is denied (or not allowed, when an allow-list is set), or when
+    # its resource type is denied and not explicitly allowed.
+    def __init__(
+        self,
+        blocked_types=None,
+        blocked_domains=None,
+        allowed_types=None,
+        allowed_domains=None,
+    ):
+        self.blocked_types = set(
+            BLOCKED_RESOURCE_TYPES if blocked_types is None else blocked_types
+        )
+        self.blocked_domains = set(
+            BLOCKED_DOMAINS if blocked_domains is None else blocked_domains
+        )
+        self.allowed_types = set(allowed_types or ())
+        self.allowed_domains = set(allowed_domains or ())
+
+    def block_reason(self, resource_type, url):
+        host = (urlparse(url).hostname or "").lower()
+        if self.allowed_domains and not domain_matches(host, self.allowed_domains):
+            return "domain"
+        if domain_matches(host, self.blocked_domains):
+            return "domain"
+        if resource_type in self.blocked_types and resource_type not in self.allowed_types:
+            return "type"
+        return None
+
+    async def attach(self, context):
+        await context.route("**/*", self.handle_route)
+        context.on("requestfinished", self.count_download)
+
+    async def count_download(self, request):
+        # Measured transfer of every request that went through
+        try:
+            sizes = await request.sizes()
+        except PlaywrightError:
+            return
+        size = sizes["responseHeadersSize"] + sizes["responseBodySize"]
+        metrics.incr("resources.downloaded_bytes", size)
+        metrics.incr(f"resources.downloaded_bytes.{request.resource_type}", size)
+
+    async def handle_route(self, route):
+        request = route.request
+        reason = self.block_reason(request.resource_type, request.url)
+        try:
+            if reason is None:
+                await route.continue_()
+                return
+            await route.abort("blockedbyclient")
+        except PlaywrightError:
+            # The page was closed while the request was in flight
+            return
+
+        metrics.incr("resources.blocked")
+        metrics.incr(f"resources.blocked.{reason}.{request.resource_type}")
+        metrics.incr(
+            "resources.blocked_bytes_estimated",
+            TYPICAL_BYTES.get(request.resource_type, DEFAULT_TYPICAL_BYTES),
+        )
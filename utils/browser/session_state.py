@@ -0,0 +1,37 @@
+import os
+import json
+from pathlib import Path
+
+root_dir = Path(__file__).resolve().parent.parent.parent
+SESSION_STATE_PATH = root_dir / "data" / "session" / "storage_state.json"
+
+
+def has_session_state(state_path=SESSION_STATE_PATH):
+    return Path(state_path).exists()
+
+
+def load_session_state(state_path=SESSION_STATE_PATH):
+    state_path = Path(state_path)
+    if not state_path.exists():
+        return None
+    try:
+        with state_path.open(mode="r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+async def save_session_state(context, state_path=SESSION_STATE_PATH):
+    state_path = Path(state_path)
+    state_path.parent.mkdir(parents=True, exist_ok=True)
+    state = await context.storage_state()
+
+    # Several workers may save at once; replace the file atomically
+    tmp_path = state_path.with_suffix(f".{os.getpid()}.{id(context)}.tmp")
+    try:
+        with tmp_path.open(mode="w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, state_path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    return state
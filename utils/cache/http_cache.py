@@ -0,0 +1,165 @@
+import json
+import time
+import zlib
+import sqlite3
+from pathlib import Path
+from collections import namedtuple
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+root_dir = Path(__file__).resolve().parent.parent.parent
+HTTP_CACHE_PATH = root_dir / "data" / "http_cache.db"
+DEFAULT_MAX_BYTES = 2 * 1024**3
+TRACKING_PARAMS = {"gclid", "fbclid", "msclkid"}
+
+CacheEntry = namedtuple(
+    "CacheEntry", ["url", "etag", "last_modified", "body", "record"]
+)
+
+
+def canonical_url(url):
+    parts = urlsplit(url.strip())
+    query = sorted(
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key not in TRACKING_PARAMS and not key.startswith("utm_")
+    )
+    return urlunsplit(
+        (
+            parts.scheme.lower(),
+            parts.netloc.lower(),
+            parts.path or "/",
+            urlencode(query),
+            "",
+        )
+    )
+
+
+class HttpCache:
+    # On-disk cache of validated pages: ETag/Last-Modified, the compressed
+    # body and the record parsed from it. Least recently used entries are
+    # evicted once the cache grows past max_bytes.
+    def __init__(self, db_path=HTTP_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+        self.conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                body BLOB NOT NULL,
+                record TEXT,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_entries_last_access ON entries (last_access)"
+        )
+        self.total_bytes = self._stored_bytes()
+
+    def _stored_bytes(self):
+        row = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return row[0]
+
+    def get(self, url):
+        key = canonical_url(url)
+        row = self.conn.execute(
+            "SELECT etag, last_modified, body, record FROM entries WHERE url = ?",
+            (key,),
+        ).fetchone()
+        if row is None:
+            return None
+
+        self.conn.execute(
+            "UPDATE entries SET last_access = ? WHERE url = ?", (time.time(), key)
+        )
+        etag, last_modified, body, record = row
+        return CacheEntry(
+            key,
+            etag,
+            last_modified,
+            zlib.decompress(body).decode("utf-8"),
+            json.loads(record) if record else None,
+        )
+
+    @staticmethod
+    def conditional_headers(entry):
+        headers = {}
+        if entry is None:
+            return headers
+        if entry.etag:
+            headers["if-none-match"] = entry.etag
+        if entry.last_modified:
+            headers["if-modified-since"] = entry.last_modified
+        return headers
+
+    def store(self, url, body, etag=None, last_modified=None, record=None):
+        if not etag and not last_modified:
+            # Nothing to revalidate with, so caching would never pay off
+            return False
+
+        key = canonical_url(url)
+        compressed = zlib.compress(body.encode("utf-8"), 6)
+        record_json = json.dumps(record, sort_keys=True) if record else None
+        size = len(compressed) + len(record_json or "")
+
+        old = self.conn.execute("SELECT size FROM entries WHERE url = ?", (key,)).fetchone()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO entries "
+            "(url, etag, last_modified, body, record, size, last_access) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, etag, last_modified, compressed, record_json, size, time.time()),
+        )
+        self.total_bytes += size - (old[0] if old else 0)
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+        return True
+
+    def store_record(self, url, record):
+        key = canonical_url(url)
+        record_json = json.dumps(record, sort_keys=True)
+        old = self.conn.execute(
+            "SELECT size, LENGTH(body) FROM entries WHERE url = ?", (key,)
+        ).fetchone()
+        if old is None:
+            return False
+        size = old[1] + len(record_json)
+        self.conn.execute(
+            "UPDATE entries SET record = ?, size = ? WHERE url = ?",
+            (record_json, size, key),
+        )
+        self.total_bytes += size - old[0]
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+        return True
+
+    def evict(self):
+        # Other processes may share the file; start from the real total
+        self.total_bytes = self._stored_bytes()
+        target = int(self.max_bytes * 0.9)
+        evicted = 0
+        while self.total_bytes > target:
+            rows = self.conn.execute(
+                "SELECT url, size FROM entries ORDER BY last_access LIMIT 100"
+            ).fetchall()
+            if not rows:
+                break
+            self.conn.execute("BEGIN")
+            for url, size in rows:
+                self.conn.execute("DELETE FROM entries WHERE url = ?", (url,))
+                self.total_bytes -= size
+                evicted += 1
+                if self.total_bytes <= target:
+                    break
+            self.conn.execute("COMMIT")
+        return evicted
+
+    def close(self):
+        self.conn.close()
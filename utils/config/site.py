@@ -0,0 +1,14 @@
+import os
+import re
+
+# The shop and storefront being crawled; both can be set in the environment
+SITE_ORIGIN_ENV = "SITE_ORIGIN"
+SITE_REGION_ENV = "SITE_REGION"
+
+SITE_ORIGIN = os.getenv(SITE_ORIGIN_ENV, "https://www.thomann.de").rstrip("/")
+SITE_REGION = os.getenv(SITE_REGION_ENV, "gb").strip("/")
+
+SITE_BASE_URL = f"{SITE_ORIGIN}/{SITE_REGION}/"
+START_URL = f"{SITE_BASE_URL}index.html"
+# Category pages are "/<region>/<name>.html"; product pages end in ".htm"
+CATEGORY_PATH_PATTERN = re.compile(rf"^/{re.escape(SITE_REGION)}/[\w-]+\.html$")
@@ -0,0 +1,127 @@
+import re
+import httpx
+from collections import namedtuple
+from utils.headers.headers_handler import Headers
+
+PRODUCT_CONTAINER_PATTERN = re.compile(
+    r"class=[\"'][^\"']*\bproduct-main-content\b[^\"']*[\"']"
+)
+BOT_CHALLENGE_STATUSES = {403, 429, 503}
+# Markers only count on a page with next to no text of its own: product pages
+# carry reCAPTCHA in their review forms and load the challenge scripts too
+BOT_CHALLENGE_MARKERS = (
+    "_Incapsula_Resource",
+    "Incapsula incident ID",
+    "cf-browser-verification",
+    "challenge-platform",
+    "g-recaptcha",
+)
+BOT_CHALLENGE_TITLE_PATTERN = re.compile(
+    r"<title[^>]*>\s*(?:just a moment|attention required|access denied"
+    r"|pardon our interruption|are you a (?:human|robot)|security check)",
+    re.IGNORECASE,
+)
+HIDDEN_TEXT_PATTERN = re.compile(
+    r"<(script|style|noscript)\b.*?</\1\s*>|<!--.*?-->|<[^>]*>",
+    re.IGNORECASE | re.DOTALL,
+)
+CHALLENGE_MAX_TEXT = 500
+
+FetchResult = namedtuple(
+    "FetchResult",
+    ["content", "status", "reason", "not_modified", "record"],
+    defaults=(False, None),
+)
+
+
+def visible_text_length(content):
+    return len("".join(HIDDEN_TEXT_PATTERN.sub(" ", content).split()))
+
+
+def is_bot_challenge(status, content):
+    if status in BOT_CHALLENGE_STATUSES:
+        return True
+    if BOT_CHALLENGE_TITLE_PATTERN.search(content):
+        return True
+    return (
+        any(marker in content for marker in BOT_CHALLENGE_MARKERS)
+        and visible_text_length(content) < CHALLENGE_MAX_TEXT
+    )
+
+
+class HttpFetcher:
+    # Plain HTTP client for server-rendered pages: one pooled HTTP/2 client
+    # per run, so connections are kept alive between pages.
+    def __init__(
+        self,
+        headers=None,
+        max_connections=20,
+        timeout=30,
+        http2=True,
+        transport=None,
+        cache=None,
+    ):
+        self.headers = headers if headers else Headers()
+        self.cache = cache
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.http2 = http2
+        self.transport = transport
+        self.client = None
+
+    def _create_client(self):
+        headers = dict(self.headers.get_headers())
+        # Let httpx advertise only the encodings it can decode
+        headers.pop("accept-encoding", None)
+        return httpx.AsyncClient(
+            http2=self.http2,
+            headers=headers,
+            timeout=self.timeout,
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections,
+            ),
+            transport=self.transport,
+        )
+
+    async def fetch(self, url, required_pattern=PRODUCT_CONTAINER_PATTERN):
+        if self.client is None:
+            self.client = self._create_client()
+
+        cached = self.cache.get(url) if self.cache else None
+        try:
+            response = await self.client.get(
+                url, headers=self.cache.conditional_headers(cached) if cached else None
+            )
+        except httpx.TimeoutException:
+            return FetchResult(None, None, "timeout")
+        except httpx.HTTPError as e:
+            return FetchResult(None, None, f"http error: {e!r}")
+
+        if response.status_code == 304 and cached:
+            return FetchResult(cached.body, 304, None, True, cached.record)
+
+        content = response.text
+        if is_bot_challenge(response.status_code, content):
+            return FetchResult(None, response.status_code, "bot challenge")
+        if response.status_code != 200:
+            return FetchResult(
+                None, response.status_code, f"status {response.status_code}"
+            )
+        if required_pattern and not required_pattern.search(content):
+            return FetchResult(None, response.status_code, "missing container")
+
+        if self.cache:
+            self.cache.store(
+                url,
+                content,
+                etag=response.headers.get("etag"),
+                last_modified=response.headers.get("last-modified"),
+            )
+        return FetchResult(content, response.status_code, None)
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
@@ -89,3 +89,7 @@ class Headers:
     def get_headers(self):
         self.base_headers["user-agent"] = random.choice(user_agents)
         return self.base_headers
+
+    def get_product_headers(self):
+        self.profile_headers["user-agent"] = random.choice(user_agents)
+        return self.profile_headers
@@ -0,0 +1,89 @@
+from bs4 import BeautifulSoup
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+# BeautifulSoup leaves the text of these out of get_text()
+NON_TEXT_TAGS = ("script", "style", "template", "rt", "rp")
+NON_TEXT_SELECTOR = ", ".join(NON_TEXT_TAGS)
+
+
+class SoupEngine:
+    # The reference engine; every other engine must give the same output
+    name = "soup"
+
+    def parse(self, html):
+        return BeautifulSoup(html, "html.parser")
+
+    def select_one(self, node, selector):
+        return node.select_one(selector)
+
+    def select(self, node, selector):
+        return node.select(selector)
+
+    def text(self, node, strip=False):
+        return node.get_text(strip=strip)
+
+    def attr(self, node, name):
+        return node.get(name)
+
+
+class SelectolaxEngine:
+    # lexbor (C) tree and selectors, with BeautifulSoup's selection and text
+    # rules: matches never include the node itself, and script, style and
+    # ruby annotation text is left out
+    name = "selectolax"
+
+    def parse(self, html):
+        return LexborHTMLParser(html)
+
+    def select_one(self, node, selector):
+        found = node.css_first(selector)
+        if found is not None and found == node:
+            matches = node.css(selector)
+            return matches[1] if len(matches) > 1 else None
+        return found
+
+    def select(self, node, selector):
+        return [found for found in node.css(selector) if found != node]
+
+    def text(self, node, strip=False):
+        if node.css_first(NON_TEXT_SELECTOR) is None:
+            return node.text(deep=True, strip=strip)
+        strings = self.strings(node)
+        return "".join(s.strip() for s in strings) if strip else "".join(strings)
+
+    def strings(self, node):
+        strings = []
+        child = node.child
+        while child is not None:
+            if child.is_text_node:
+                strings.append(child.text_content)
+            elif child.tag not in NON_TEXT_TAGS:
+                strings.extend(self.strings(child))
+            child = child.next
+        return strings
+
+    def attr(self, node, name):
+        return node.attributes.get(name)
+
+
+PARSER_ENGINES = {"soup": SoupEngine}
+if LexborHTMLParser is not None:
+    PARSER_ENGINES["selectolax"] = SelectolaxEngine
+
+DEFAULT_ENGINE = "selectolax" if "selectolax" in PARSER_ENGINES else "soup"
+_engines = {}
+
+
+def get_engine(name=None):
+    name = name if name else DEFAULT_ENGINE
+    if name not in PARSER_ENGINES:
+        raise ValueError(
+            f"Unknown parser engine {name!r}; available: {', '.join(PARSER_ENGINES)}"
+        )
+    if name not in _engines:
+        _engines[name] = PARSER_ENGINES[name]()
+    return _engines[name]
@@ -0,0 +1,88 @@
+import os
+import time
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from middlewares.metrics.metrics import metrics
+from middlewares.logger.logger import custom_logger, initialize_logging
+
+initialize_logging()
+
+DEFAULT_PARSE_WORKERS = max(1, min(4, (os.cpu_count() or 2) // 2))
+
+
+def timed_call(func, args):
+    # Runs in the worker; the parse time excludes queueing and pickling
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+def worker_call(func, args):
+    # Counters bumped in the worker (e.g. schema hit rates) go back with the
+    # result and are cleared so the next page starts from zero
+    result, elapsed = timed_call(func, args)
+    counters = dict(metrics.counters)
+    metrics.counters.clear()
+    return result, elapsed, counters
+
+
+class ParsePool:
+    # Parses HTML in worker processes so the event loop keeps serving
+    # navigations and timers. The page goes over as one str argument and
+    # only the parsed result comes back. `workers=0` parses in the loop.
+    def __init__(self, workers=DEFAULT_PARSE_WORKERS, name="parse"):
+        self.workers = max(0, workers)
+        self.name = name
+        self.executor = None
+        self.queued = 0
+        self.peak_queued = 0
+
+    def start(self):
+        if self.executor is None and self.workers:
+            # Spawned, not forked: the parent holds browser and loop threads
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self.executor
+
+    async def run(self, func, *args):
+        started = time.perf_counter()
+        # Pages waiting for or being parsed, counting this one
+        self.queued += 1
+        self.peak_queued = max(self.peak_queued, self.queued)
+        metrics.observe(f"{self.name}.queue_depth", self.queued)
+        metrics.set_gauge(f"{self.name}.peak_queue_depth", self.peak_queued)
+        try:
+            executor = self.start()
+            if executor is None:
+                result, parse_time = timed_call(func, args)
+            else:
+                loop = asyncio.get_running_loop()
+                try:
+                    result, parse_time, counters = await loop.run_in_executor(
+                        executor, worker_call, func, args
+                    )
+                    metrics.merge({"counters": counters})
+                except BrokenProcessPool:
+                    # A worker died (e.g. out of memory); start a fresh pool
+                    # next time and parse this page here
+                    custom_logger(
+                        "Parse worker crashed, restarting the pool.", log_type="warn"
+                    )
+                    metrics.incr(f"{self.name}.pool_restarts")
+                    self.close(wait=False)
+                    result, parse_time = timed_call(func, args)
+        finally:
+            self.queued -= 1
+
+        metrics.observe(f"{self.name}.parse_time", parse_time)
+        metrics.observe(f"{self.name}.latency", time.perf_counter() - started)
+        return result
+
+    def close(self, wait=True):
+        if self.executor is not None:
+            self.executor.shutdown(wait=wait, cancel_futures=True)
+            self.executor = None
@@ -0,0 +1,77 @@
+import re
+from middlewares.metrics.metrics import metrics
+
+ATTRIBUTES = r"(?:\"[^\"]*\"|'[^']*'|[^'\">])*"
+START_TAG_PATTERN = re.compile(rf"<([a-zA-Z][\w:-]*)({ATTRIBUTES})>")
+CLASS_ATTRIBUTE_PATTERN = re.compile(
+    r"\bclass\s*=\s*(?:\"([^\"]*)\"|'([^']*)'|([^\s\"'>]+))", re.IGNORECASE
+)
+# Comments and raw-text elements are skipped whole, so tags inside them never
+# count towards the nesting depth
+TAG_PATTERN = re.compile(
+    rf"<!--.*?-->|<(script|style|textarea|title)\b{ATTRIBUTES}>.*?</\1\s*>"
+    rf"|<(/?)([a-zA-Z][\w:-]*){ATTRIBUTES}>",
+    re.IGNORECASE | re.DOTALL,
+)
+
+
+def class_names(attributes):
+    match = CLASS_ATTRIBUTE_PATTERN.search(attributes)
+    if match is None:
+        return set()
+    return set("".join(value or "" for value in match.groups()).split())
+
+
+def find_end(page_content, tag, position):
+    # Counts the open and close tags of the same name until the element the
+    # start tag opened is closed, and stops there
+    depth = 1
+    for match in TAG_PATTERN.finditer(page_content, position):
+        name = match.group(3)
+        if name is None or name.lower() != tag:
+            continue
+        depth += -1 if match.group(2) else 1
+        if not depth:
+            return match.end()
+    return None
+
+
+def is_hidden(page_content, position):
+    # Inside a comment or a script, where a parser sees no tags
+    for opener, closer in (("<!--", "-->"), ("<script", "</script")):
+        if page_content.rfind(opener, 0, position) > page_content.rfind(
+            closer, 0, position
+        ):
+            return True
+    return False
+
+
+def element_source(page_content, classes):
+    # The source of the first element carrying all of `classes`, found
+    # without building a tree; None when it is missing or never closed
+    position = page_content.find(classes[0])
+    while position >= 0:
+        # A plain substring search, then a check that it sits in a class
+        # attribute of the enclosing start tag
+        start = page_content.rfind("<", 0, position)
+        tag = START_TAG_PATTERN.match(page_content, start) if start >= 0 else None
+        if (
+            tag is not None
+            and tag.end() > position
+            and set(classes) <= class_names(tag.group(2))
+            and not is_hidden(page_content, start)
+        ):
+            end = find_end(page_content, tag.group(1).lower(), tag.end())
+            if end:
+                return page_content[start:end]
+        position = page_content.find(classes[0], position + 1)
+    return None
+
+
+def parse_region(engine, page_content, classes):
+    # Header, menus, footer and scripts outside the element are never parsed
+    source = element_source(page_content, classes)
+    if source is None:
+        metrics.incr("parse.region_misses")
+        source = page_content
+    return engine.parse(source)
@@ -0,0 +1,299 @@
+from collections import namedtuple
+from middlewares.metrics.metrics import metrics
+from middlewares.logger.logger import custom_logger, initialize_logging
+
+initialize_logging()
+
+# A region of the page the fields are read from. Scopes nest; a scope that
+# is missing skips every scope and field under it without a lookup.
+Scope = namedtuple("Scope", ["name", "parent", "selector", "required"])
+Scope.__new__.__defaults__ = (False,)
+
+# selector None reads the scope node itself. `many` reads every match (with
+# `item` picking one node inside each, and `pair` reading a label/value pair).
+# `strings` joins the stripped text pieces (get_text(strip=True)) instead of
+# stripping the whole text. `extract(engine, node)` replaces the text read for
+# fields that need more than one lookup. Dotted names nest in the record.
+Field = namedtuple(
+    "Field",
+    [
+        "name",
+        "scope",
+        "selector",
+        "attr",
+        "transform",
+        "required",
+        "many",
+        "item",
+        "pair",
+        "strings",
+        "extract",
+    ],
+)
+Field.__new__.__defaults__ = (None, None, False, False, None, None, False, None)
+
+
+def sentences(texts):
+    return "".join(f"{text}. " for text in texts)
+
+
+def key_features(pairs):
+    features = dict(pairs)
+    features.pop("Show more", None)
+    if "Item number" in features:
+        features["item_id"] = features.pop("Item number")
+    return features
+
+
+def reviews_url(url):
+    return url.replace(".htm", "_reviews.htm?page=1&order=latest&reviewlang%5B%5D=all")
+
+
+def shipping_prediction(engine, node):
+    text = ""
+    link = engine.select_one(node, "a")
+    if link is not None:
+        text += engine.text(link).strip()
+    strong = engine.select_one(node, "strong")
+    spans = engine.select(strong, "span") if strong is not None else []
+    dates = [engine.text(span).strip() for span in spans]
+    if len(dates) == 2:
+        text += f", expected between: {dates[0]} and {dates[1]}"
+    return text
+
+
+# Every scope sits inside this element, so only its source needs parsing
+PRODUCT_REGION = ("product-main-content", "fx-content-product-grid__col")
+
+PRODUCT_SCOPES = (
+    Scope("main", None, ".product-main-content.fx-content-product-grid__col", True),
+    Scope("grid", "main", ".fx-grid--prod", True),
+    Scope("left", "grid", ".fx-grid__col.fx-col--lg-8"),
+    Scope("description", "left", '.product-text[itemprop="description"]'),
+    Scope("badges", "description", "div.badges"),
+    Scope("keyfeatures", "description", "div.keyfeatures"),
+    Scope("right", "grid", ".fx-grid__col.fx-col--lg-4"),
+    Scope("sticky", "right", "div.fx-position-sticky"),
+    Scope("price_box", "sticky", ".product-price-box .price-and-availability"),
+    Scope("price_wrapper", "price_box", ".price-wrapper"),
+    Scope("meta", "price_box", ".meta"),
+    Scope(
+        "tooltip",
+        "price_box",
+        '.price-and-availability__tooltip-wrapper div[aria-label="tooltip"]',
+    ),
+    Scope("prediction", "price_box", ".shipping-prediction"),
+)
+
+PRODUCT_FIELDS = (
+    Field(
+        "product_title",
+        "left",
+        ".product-title h1.product-title__title",
+        required=True,
+    ),
+    Field(
+        "review_count", "left", "a .fx-rating-stars .product-title__rating-description"
+    ),
+    Field("description_title", "description", ".text-original h2.fx-headline"),
+    Field(
+        "description_text",
+        "description",
+        "ul.product-text__list li",
+        transform=sentences,
+        many=True,
+        item="span",
+    ),
+    Field("product_note", "description", "p.fx-text--plus"),
+    Field("badges_list", "badges", ".badges__item a", many=True, strings=True),
+    Field(
+        "key_features",
+        "keyfeatures",
+        ".keyfeature",
+        transform=key_features,
+        many=True,
+        pair=(".keyfeature__label", ".fx-text--bold"),
+        strings=True,
+    ),
+    Field("price", "price_wrapper", ".price"),
+    Field("product_url", "price_wrapper", 'meta[itemprop="url"]', attr="content"),
+    Field("disclaimer", "meta", ".meta__disclaimer"),
+    Field("shipping", "tooltip", "span span span.fx-availability"),
+    Field("shipping_prediction", "prediction", None, extract=shipping_prediction),
+    Field("rank_details.rank_value", "sticky", ".meta-box__value"),
+    Field(
+        "rank_details.rank_description",
+        "sticky",
+        ".meta-box__texts .meta-box__description",
+    ),
+    Field(
+        "rank_details.rank_category", "sticky", ".meta-box__texts .meta-box__subtext"
+    ),
+    Field(
+        "rank_details.rank_link",
+        "sticky",
+        ".product-rank-and-visitors a.meta-box--link",
+        attr="href",
+    ),
+    Field(
+        "reviews_url",
+        "price_wrapper",
+        'meta[itemprop="url"]',
+        attr="content",
+        transform=reviews_url,
+    ),
+)
+
+
+class SelectorPlan:
+    # A schema compiled once: scopes in dependency order, and one lookup per
+    # distinct (scope, selector) no matter how many fields read it
+    def __init__(self, scopes, fields, name="schema"):
+        self.name = name
+        self.fields = fields
+        self.subsets = {}
+        by_name = {scope.name: scope for scope in scopes}
+        for scope in scopes:
+            if scope.parent is not None and scope.parent not in by_name:
+                raise ValueError(f"Scope {scope.name!r} has unknown parent")
+        for field in fields:
+            if field.scope not in by_name:
+                raise ValueError(f"Field {field.name!r} has unknown scope")
+
+        # Only locate the scopes some field reads from (and their parents);
+        # required scopes stay as a check that the page is the right kind
+        used = set()
+        needed = [scope.name for scope in scopes if scope.required]
+        for name in needed + [field.scope for field in fields]:
+            while name is not None and name not in used:
+                used.add(name)
+                name = by_name[name].parent
+        self.all_scopes = scopes
+        scopes = [scope for scope in scopes if scope.name in used]
+
+        self.scopes = []
+        placed = set()
+        while len(self.scopes) < len(scopes):
+            ready = [
+                scope
+                for scope in scopes
+                if scope.name not in placed
+                and (scope.parent is None or scope.parent in placed)
+            ]
+            if not ready:
+                raise ValueError("Scopes form a cycle")
+            self.scopes.extend(ready)
+            placed.update(scope.name for scope in ready)
+
+        self.lookups = sorted(
+            {(field.scope, field.selector, field.many) for field in fields},
+            key=lambda lookup: (lookup[0], lookup[1] or "", lookup[2]),
+        )
+        self.paths = {field.name: field.name.split(".") for field in fields}
+
+    def find_scopes(self, engine, tree):
+        nodes = {None: tree}
+        for scope in self.scopes:
+            parent = nodes[scope.parent]
+            node = None
+            if parent is not None:
+                node = engine.select_one(parent, scope.selector)
+            if node is None and scope.required:
+                raise ValueError(f"{scope.name} container not found")
+            nodes[scope.name] = node
+        return nodes
+
+    def find_nodes(self, engine, nodes):
+        found = {}
+        for scope_name, selector, many in self.lookups:
+            node = nodes[scope_name]
+            if node is None:
+                found[(scope_name, selector, many)] = [] if many else None
+            elif selector is None:
+                found[(scope_name, selector, many)] = node
+            elif many:
+                found[(scope_name, selector, many)] = engine.select(node, selector)
+            else:
+                found[(scope_name, selector, many)] = engine.select_one(node, selector)
+        return found
+
+    def read(self, engine, field, node):
+        if field.extract:
+            return field.extract(engine, node)
+        if field.attr:
+            return engine.attr(node, field.attr)
+        if field.strings:
+            return engine.text(node, strip=True)
+        return engine.text(node).strip()
+
+    def read_many(self, engine, field, nodes):
+        values = []
+        for node in nodes:
+            if field.pair:
+                label = engine.select_one(node, field.pair[0])
+                value = engine.select_one(node, field.pair[1])
+                if label is not None and value is not None:
+                    label = self.read(engine, field, label)
+                    values.append((label, self.read(engine, field, value)))
+                continue
+            if field.item:
+                node = engine.select_one(node, field.item)
+                if node is None:
+                    continue
+            values.append(self.read(engine, field, node))
+        return values
+
+    def subset(self, names):
+        # A plan for some of the fields, compiled once per set of names
+        key = frozenset(names)
+        if key not in self.subsets:
+            fields = tuple(field for field in self.fields if field.name in key)
+            self.subsets[key] = SelectorPlan(self.all_scopes, fields, self.name)
+        return self.subsets[key]
+
+    def extract(self, engine, tree, names=None):
+        if names is not None:
+            return self.subset(names).extract(engine, tree)
+        found = self.find_nodes(engine, self.find_scopes(engine, tree))
+        record = {}
+        for field in self.fields:
+            node = found[(field.scope, field.selector, field.many)]
+            if field.many:
+                value = self.read_many(engine, field, node)
+                hit = bool(value)
+            else:
+                value = None if node is None else self.read(engine, field, node)
+                hit = value is not None
+            if value is not None and field.transform:
+                value = field.transform(value)
+
+            metrics.incr(f"{self.name}.{field.name}.{'hit' if hit else 'miss'}")
+            if field.required and not hit:
+                raise ValueError(f"Required field {field.name} not found")
+
+            *parents, key = self.paths[field.name]
+            target = record
+            for parent in parents:
+                target = target.setdefault(parent, {})
+            target[key] = value
+        return record
+
+    def hit_rates(self):
+        rates = {}
+        for field in self.fields:
+            hits = metrics.counters.get(f"{self.name}.{field.name}.hit", 0)
+            misses = metrics.counters.get(f"{self.name}.{field.name}.miss", 0)
+            if hits + misses:
+                rates[field.name] = hits / (hits + misses)
+        return rates
+
+    def report(self, threshold=0.9):
+        # Fields that stop matching usually mean the page layout changed
+        for name, rate in sorted(self.hit_rates().items()):
+            custom_logger(
+                f"[{self.name}] {name}: {rate:.0%} of pages",
+                log_type="info" if rate >= threshold else "warn",
+            )
+
+
+PRODUCT_PLAN = SelectorPlan(PRODUCT_SCOPES, PRODUCT_FIELDS, name="product_schema")
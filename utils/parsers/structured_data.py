@@ -0,0 +1,169 @@
+import re
+import json
+import html
+from utils.parsers.region import parse_region
+from utils.parsers.schema import (
+    Field,
+    SelectorPlan,
+    PRODUCT_REGION,
+    PRODUCT_SCOPES,
+    reviews_url,
+)
+from middlewares.metrics.metrics import metrics
+
+# Read with regular expressions straight from the page source, no tree built
+LD_JSON_PATTERN = re.compile(
+    r"<script\b[^>]*\btype\s*=\s*[\"']?application/ld\+json[\"']?[^>]*>"
+    r"(.*?)</script\s*>",
+    re.IGNORECASE | re.DOTALL,
+)
+ITEMPROP_TAG_PATTERN = re.compile(
+    r"<(?:meta|link)\b[^>]*\bitemprop\s*=[^>]*>", re.IGNORECASE
+)
+ATTRIBUTE_PATTERN = re.compile(
+    r"([\w:-]+)\s*=\s*(?:\"([^\"]*)\"|'([^']*)'|([^\s\"'>]+))"
+)
+SCHEMA_ORG_PREFIX = re.compile(r"^https?://schema\.org/", re.IGNORECASE)
+
+STRUCTURED_KEYS = (
+    "product_title",
+    "sku",
+    "price",
+    "currency",
+    "availability",
+    "rating",
+    "review_count",
+    "product_url",
+)
+
+# itemprop name -> record key
+MICRODATA_KEYS = {
+    "name": "product_title",
+    "sku": "sku",
+    "price": "price",
+    "priceCurrency": "currency",
+    "availability": "availability",
+    "ratingValue": "rating",
+    "reviewCount": "review_count",
+    "url": "product_url",
+}
+
+
+def price_amount(text):
+    # "£1,115.50" -> "1115.50", to match the offer price of the structured data
+    amount = re.sub(r"[^\d.]", "", text)
+    return amount if amount else None
+
+
+# The fields a record is not worth keeping without, read from the DOM when the
+# structured data lacks them
+FALLBACK_FIELDS = (
+    Field(
+        "product_title",
+        "left",
+        ".product-title h1.product-title__title",
+        required=True,
+    ),
+    Field("price", "price_wrapper", ".price", transform=price_amount),
+)
+FALLBACK_PLAN = SelectorPlan(
+    PRODUCT_SCOPES, FALLBACK_FIELDS, name="structured_fallback"
+)
+
+
+def as_text(value):
+    if value is None or isinstance(value, (dict, list)):
+        return None
+    return SCHEMA_ORG_PREFIX.sub("", str(value)).strip() or None
+
+
+def first(value):
+    return value[0] if isinstance(value, list) and value else value
+
+
+def iter_json_ld(page_content):
+    for match in LD_JSON_PATTERN.finditer(page_content):
+        try:
+            data = json.loads(match.group(1))
+        except ValueError:
+            continue
+        stack = data if isinstance(data, list) else [data]
+        while stack:
+            item = stack.pop(0)
+            if not isinstance(item, dict):
+                continue
+            stack.extend(item.get("@graph", []))
+            yield item
+
+
+def is_product(item):
+    types = item.get("@type")
+    return "Product" in (types if isinstance(types, list) else [types])
+
+
+def read_json_ld(page_content):
+    record = {}
+    for item in iter_json_ld(page_content):
+        if not is_product(item):
+            continue
+        offer = first(item.get("offers")) or {}
+        rating = item.get("aggregateRating") or {}
+        if not isinstance(offer, dict):
+            offer = {}
+        if not isinstance(rating, dict):
+            rating = {}
+        values = {
+            "product_title": item.get("name"),
+            "sku": item.get("sku"),
+            "price": offer.get("price", offer.get("lowPrice")),
+            "currency": offer.get("priceCurrency"),
+            "availability": offer.get("availability"),
+            "rating": rating.get("ratingValue"),
+            "review_count": rating.get("reviewCount", rating.get("ratingCount")),
+            "product_url": item.get("url", offer.get("url")),
+        }
+        for key, value in values.items():
+            if record.get(key) is None:
+                record[key] = as_text(value)
+    return record
+
+
+def read_microdata(page_content):
+    record = {}
+    for match in ITEMPROP_TAG_PATTERN.finditer(page_content):
+        attributes = {
+            # Only one of the quoted/unquoted value groups matches
+            name.lower(): html.unescape("".join(values))
+            for name, *values in ATTRIBUTE_PATTERN.findall(match.group(0))
+        }
+        key = MICRODATA_KEYS.get(attributes.get("itemprop"))
+        value = attributes.get("content", attributes.get("href"))
+        # The first match wins, like select_one
+        if key and record.get(key) is None:
+            record[key] = as_text(value)
+    return record
+
+
+def scan_structured_data(page_content):
+    # JSON-LD first, then microdata for whatever it left out
+    record = dict.fromkeys(STRUCTURED_KEYS)
+    for found in (read_json_ld(page_content), read_microdata(page_content)):
+        for key, value in found.items():
+            if record[key] is None:
+                record[key] = value
+    return record
+
+
+def extract_structured_data(page_content, engine):
+    record = scan_structured_data(page_content)
+    metrics.incr("structured_data.pages")
+    missing = [field.name for field in FALLBACK_FIELDS if record[field.name] is None]
+    if missing:
+        # Only now is the page parsed, and only for the missing fields
+        metrics.incr("structured_data.dom_fallbacks")
+        tree = parse_region(engine, page_content, PRODUCT_REGION)
+        record.update(FALLBACK_PLAN.extract(engine, tree, names=missing))
+    record["reviews_url"] = (
+        reviews_url(record["product_url"]) if record["product_url"] else None
+    )
+    return record
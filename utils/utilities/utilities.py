@@ -1,4 +1,11 @@
 import random
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from utils.browser.session_state import (
+    SESSION_STATE_PATH,
+    has_session_state,
+    save_session_state,
+)
+from middlewares.rate_limit.rate_limiter import rate_limiter
 from middlewares.errors.error_handler import handle_exceptions
 from middlewares.logger.logger import custom_logger, initialize_logging
 
@@ -19,15 +26,22 @@ def random_small_timeout(min_timeout, max_timeout):
     return random.choice(possible_timeouts)
 
 
+CONSENT_BUTTON_SELECTOR = ".consent-button:has-text('Alright')"
+CONSENT_TIMEOUT = 5000
+# Once consent is stored, a banner is rare and only gets a short wait
+LATE_CONSENT_TIMEOUT = 500
+
+
 @handle_exceptions
 async def click_consent_button(page):
-    consent_btn_selector = ".consent-button:has-text('Alright')"
+    consent_btn_selector = CONSENT_BUTTON_SELECTOR
 
     try:
         consent_button = await page.wait_for_selector(
             consent_btn_selector, timeout=5000
         )
         if consent_button:
+            await rate_limiter.wait(page.url)
             await consent_button.click()
             custom_logger(message="cookies accepted", log_type="info")
             return True
@@ -37,3 +51,31 @@ async def click_consent_button(page):
         err = f"Error occured in <click_consent_button>: {e}"
         custom_logger(message=err, log_type="warn")
         return False
+
+
+@handle_exceptions
+async def ensure_consent(page, state_path=SESSION_STATE_PATH):
+    # The first page waits up to 5 seconds for the banner. The storage state
+    # is saved after that attempt whether or not a banner showed up, so later
+    # pages only give a late banner a short wait.
+    has_state = has_session_state(state_path)
+    timeout = LATE_CONSENT_TIMEOUT if has_state else CONSENT_TIMEOUT
+    try:
+        consent_button = await page.wait_for_selector(
+            CONSENT_BUTTON_SELECTOR, timeout=timeout
+        )
+    except PlaywrightTimeoutError:
+        consent_button = None
+
+    if consent_button:
+        # Accepting posts to the origin like any other request
+        await rate_limiter.wait(page.url)
+        await consent_button.click()
+        custom_logger(message="cookies accepted", log_type="info")
+    elif has_state:
+        return True
+    else:
+        custom_logger(message="no consent banner shown", log_type="info")
+
+    await save_session_state(page.context, state_path)
+    return True